@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'norsklaer_backend.apps.authentication'
\ No newline at end of file
+    name = 'norsklaer_backend.apps.authentication'
+    
+    def ready(self):
+        post_migrate.connect(backfill_user_cefr_ranks, sender=self)
+
+def backfill_user_cefr_ranks(sender, **kwargs):
+    from django.contrib.auth import get_user_model
+    from norsklaer_backend.cefr import backfill_cefr_ranks
+    backfill_cefr_ranks(get_user_model(), 'current_cefr_level', using=kwargs.get('using', 'default'))
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from norsklaer_backend.cefr import sync_cefr_rank
 
 class User(AbstractUser):
     CEFR_LEVELS = [
@@ -14,6 +15,7 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     current_cefr_level = models.CharField(max_length=2, choices=CEFR_LEVELS, default='A1')
     target_cefr_level = models.CharField(max_length=2, choices=CEFR_LEVELS, default='B2')
+    cefr_rank = models.PositiveSmallIntegerField(default=1, editable=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -21,4 +23,8 @@ class User(AbstractUser):
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     
     class Meta:
-        db_table = 'users'
\ No newline at end of file
+        db_table = 'users'
+    
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = sync_cefr_rank(self, 'current_cefr_level', kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
\ No newline at end of file
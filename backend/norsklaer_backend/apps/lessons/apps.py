@@ -1,5 +1,27 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class LessonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'norsklaer_backend.apps.lessons'
\ No newline at end of file
+    name = 'norsklaer_backend.apps.lessons'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(backfill_lesson_cefr_ranks, sender=self)
+        post_migrate.connect(setup_lesson_search, sender=self)
+        post_migrate.connect(backfill_vocabulary, sender=self)
+
+def backfill_lesson_cefr_ranks(sender, **kwargs):
+    from norsklaer_backend.cefr import backfill_cefr_ranks
+    from .models import Lesson
+    backfill_cefr_ranks(Lesson, 'cefr_level', using=kwargs.get('using', 'default'))
+
+def setup_lesson_search(sender, **kwargs):
+    from .search import setup_search
+    setup_search(using=kwargs.get('using', 'default'))
+
+def backfill_vocabulary(sender, **kwargs):
+    from .models import Lesson, VocabularyItem
+    from .vocabulary import rebuild_all_vocabulary
+    if not VocabularyItem.objects.exists() and Lesson.objects.exists():
+        rebuild_all_vocabulary()
\ No newline at end of file
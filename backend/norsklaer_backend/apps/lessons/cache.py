@@ -0,0 +1,60 @@
+"""
+Versioned cache for lesson content payloads
+Each lesson has a content version token; any Lesson or Quiz write replaces it,
+so stale payloads are never read again and simply expire from the cache.
+Tokens are replaced only once the write commits: a reader that loads the old
+row meanwhile caches it under the old token, which the bump then retires.
+The tokens must live in a cache shared by every process (CACHE_BACKEND).
+"""
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CONTENT_TIMEOUT = getattr(settings, 'LESSON_CONTENT_CACHE_TIMEOUT', 60 * 60)
+VERSION_TIMEOUT = None
+
+def _version_key(lesson_id):
+    return f'lessons:content_version:{lesson_id}'
+
+CATALOG_VERSION_KEY = 'lessons:catalog_version'
+
+def _content_key(lesson_id, version, kind):
+    return f'lessons:{kind}:{lesson_id}:{version}'
+
+def get_content_version(lesson_id):
+    key = _version_key(lesson_id)
+    version = cache.get(key)
+    if version is None:
+        # add() keeps concurrent workers from overwriting each other's token
+        cache.add(key, uuid.uuid4().hex, VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+def bump_content_version(lesson_id):
+    transaction.on_commit(lambda: cache.set(_version_key(lesson_id), uuid.uuid4().hex, VERSION_TIMEOUT))
+
+def get_catalog_version():
+    """Token replaced on any lesson write, for whole-catalog derived structures"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, VERSION_TIMEOUT)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+def bump_catalog_version():
+    transaction.on_commit(lambda: cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, VERSION_TIMEOUT))
+
+def get_lesson_content(lesson_id, loader, kind='content'):
+    """
+    Return a cached payload for a lesson, building it with loader() on a miss.
+    loader returns None when the lesson does not exist. kind separates
+    payloads derived from the same content version, e.g. the section manifest.
+    """
+    key = _content_key(lesson_id, get_content_version(lesson_id), kind)
+    payload = cache.get(key)
+    if payload is None:
+        payload = loader()
+        if payload is not None:
+            cache.set(key, payload, CONTENT_TIMEOUT)
+    return payload
\ No newline at end of file
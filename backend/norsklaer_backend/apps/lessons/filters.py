@@ -0,0 +1,14 @@
+import django_filters
+from .models import Lesson
+from .graph import unlocked_filter
+
+class LessonFilter(django_filters.FilterSet):
+    unlocked = django_filters.BooleanFilter(method='filter_unlocked')
+    
+    class Meta:
+        model = Lesson
+        fields = ['cefr_level', 'lesson_type', 'unlocked']
+    
+    def filter_unlocked(self, queryset, name, value):
+        predicate = unlocked_filter(self.request.user)
+        return queryset.filter(predicate if value else ~predicate)
\ No newline at end of file
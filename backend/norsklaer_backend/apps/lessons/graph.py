@@ -0,0 +1,95 @@
+"""
+Prerequisite graph maintenance and unlock queries
+Lesson.prerequisites stays the source of truth for direct edges;
+LessonPrerequisiteClosure materializes every ancestor of every lesson so
+"what can this user start" is one anti-join instead of a graph walk
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from .models import Lesson, LessonPrerequisiteClosure
+from norsklaer_backend.apps.progress.models import UserProgress
+
+COMPLETED_STATUSES = ('completed', 'mastered')
+BATCH_SIZE = 1000
+
+def descendant_ids(lesson_ids):
+    return set(
+        LessonPrerequisiteClosure.objects.filter(ancestor_id__in=lesson_ids)
+        .values_list('descendant_id', flat=True)
+    )
+
+def dependent_ids(lesson_id):
+    """Lessons that list lesson_id directly in their prerequisites"""
+    return set(
+        LessonPrerequisiteClosure.objects.filter(ancestor_id=lesson_id, depth=1)
+        .values_list('descendant_id', flat=True)
+    )
+
+def detach_prerequisite(lesson_id, dependents):
+    """Remove a deleted lesson from its dependents' prerequisites so they validate again"""
+    lessons = list(Lesson.objects.filter(id__in=dependents).only('id', 'prerequisites'))
+    for lesson in lessons:
+        lesson.prerequisites = [prerequisite for prerequisite in lesson.prerequisites if prerequisite != lesson_id]
+    Lesson.objects.bulk_update(lessons, ['prerequisites'], batch_size=BATCH_SIZE)
+
+def refresh_closure(lesson_ids):
+    """
+    Recompute closure rows for the given lessons and everything below them
+    Rows for other lessons are untouched, since their ancestors cannot change
+    """
+    affected = set(lesson_ids) | descendant_ids(lesson_ids)
+    direct = dict(Lesson.objects.filter(id__in=affected).values_list('id', 'prerequisites'))
+    affected &= set(direct)
+
+    # Ancestors of unaffected prerequisites are already correct in the table
+    outside = {lesson_id for edges in direct.values() for lesson_id in edges} - affected
+    outside = set(Lesson.objects.filter(id__in=outside).values_list('id', flat=True))
+    ancestors = {lesson_id: {} for lesson_id in outside}
+    for descendant, ancestor, depth in LessonPrerequisiteClosure.objects.filter(
+        descendant_id__in=outside
+    ).values_list('descendant_id', 'ancestor_id', 'depth'):
+        ancestors[descendant][ancestor] = depth
+
+    visiting = set()
+
+    def resolve(lesson_id):
+        if lesson_id in ancestors:
+            return ancestors[lesson_id]
+        if lesson_id in visiting:
+            raise ValidationError(f'Prerequisite cycle through lesson {lesson_id}')
+        visiting.add(lesson_id)
+        found = {}
+        for prerequisite in direct[lesson_id]:
+            if prerequisite not in direct and prerequisite not in outside:
+                continue  # dangling reference to a deleted lesson
+            found[prerequisite] = 1
+            for ancestor, depth in resolve(prerequisite).items():
+                if depth + 1 < found.get(ancestor, depth + 2):
+                    found[ancestor] = depth + 1
+        visiting.discard(lesson_id)
+        ancestors[lesson_id] = found
+        return found
+
+    rows = [
+        LessonPrerequisiteClosure(ancestor_id=ancestor, descendant_id=lesson_id, depth=depth)
+        for lesson_id in affected
+        for ancestor, depth in resolve(lesson_id).items()
+    ]
+    with transaction.atomic():
+        LessonPrerequisiteClosure.objects.filter(descendant_id__in=affected).delete()
+        LessonPrerequisiteClosure.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+def rebuild_closure():
+    return refresh_closure(Lesson.objects.values_list('id', flat=True))
+
+def unlocked_filter(user):
+    """Lessons with no ancestor the user has yet to complete"""
+    completed = UserProgress.objects.filter(
+        user=user, status__in=COMPLETED_STATUSES
+    ).values('lesson_id')
+    blocking = LessonPrerequisiteClosure.objects.filter(
+        descendant_id=OuterRef('pk')
+    ).exclude(ancestor_id__in=completed)
+    return ~Exists(blocking)
\ No newline at end of file
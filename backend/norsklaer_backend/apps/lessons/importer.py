@@ -0,0 +1,282 @@
+"""
+Streaming lesson catalog import
+Bundles are read one at a time from NDJSON or a JSON array, validated and
+upserted in fixed-size batches keyed by external_key, so memory stays bounded
+by the batch size and re-running the same catalog is a no-op apart from
+updated_at. Quizzes carry their own external_key, unique within their
+lesson, so reordering or inserting questions never rebinds an existing quiz
+(and its attempts) to different content, and two lessons may reuse a key. Prerequisites reference other lessons by external_key and are
+resolved once every lesson in the run exists.
+"""
+import json
+import time
+from itertools import islice
+from django.db import transaction
+from rest_framework import serializers
+from norsklaer_backend.cefr import cefr_rank
+from .cache import bump_content_version, bump_catalog_version
+from .graph import refresh_closure
+from .models import Lesson, Quiz
+from .text import extract_search_text
+from .vocabulary import rebuild_vocabulary
+from norsklaer_backend.apps.progress.models import UserProgress
+from norsklaer_backend.apps.progress.summary import rebuild_summaries
+
+READ_SIZE = 64 * 1024
+LOOKUP_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+LESSON_UPDATE_FIELDS = [
+    'title', 'cefr_level', 'cefr_rank', 'lesson_type', 'content_json', 'search_document',
+    'difficulty_score', 'estimated_duration', 'updated_at',
+]
+QUIZ_UPDATE_FIELDS = [
+    'question_text', 'question_type', 'correct_answer', 'options_json',
+    'audio_file_url', 'difficulty_weight',
+]
+
+class QuizBundleSerializer(serializers.Serializer):
+    external_key = serializers.CharField(max_length=120)
+    question_text = serializers.CharField()
+    question_type = serializers.ChoiceField(choices=Quiz.QUESTION_TYPES)
+    correct_answer = serializers.CharField()
+    options_json = serializers.JSONField(required=False, allow_null=True, default=None)
+    audio_file_url = serializers.URLField(required=False, allow_null=True, default=None)
+    difficulty_weight = serializers.DecimalField(max_digits=3, decimal_places=2, default=1)
+
+class LessonBundleSerializer(serializers.Serializer):
+    external_key = serializers.CharField(max_length=100)
+    title = serializers.CharField(max_length=255)
+    cefr_level = serializers.ChoiceField(choices=Lesson.CEFR_LEVELS)
+    lesson_type = serializers.ChoiceField(choices=Lesson.LESSON_TYPES)
+    content_json = serializers.DictField()
+    difficulty_score = serializers.IntegerField(min_value=1, max_value=10, default=1)
+    estimated_duration = serializers.IntegerField(min_value=1)
+    prerequisites = serializers.ListField(child=serializers.CharField(max_length=100), default=list)
+    quizzes = QuizBundleSerializer(many=True, default=list)
+
+    def validate_quizzes(self, quizzes):
+        keys = [quiz['external_key'] for quiz in quizzes]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError('Quiz external_key values must be unique')
+        return quizzes
+
+def iter_json_documents(stream, read_size=READ_SIZE):
+    """
+    Yield (position, value) for each top-level item of a JSON array, or for
+    each value of a whitespace-separated stream such as NDJSON
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    in_array = None
+    position = 0
+    while True:
+        buffer = buffer.lstrip()
+        if in_array is None and buffer:
+            in_array = buffer.startswith('[')
+            if in_array:
+                buffer = buffer[1:]
+        if in_array:
+            buffer = buffer.lstrip(', \t\r\n')
+            if buffer.startswith(']'):
+                return
+        if buffer:
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                position += 1
+                yield position, value
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            if in_array:
+                raise ValueError('Unterminated JSON array')
+            return
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer += chunk
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.lessons = 0
+        self.quizzes = 0
+        self.invalid = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def add_error(self, position, detail):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((position, detail))
+
+    @property
+    def rate(self):
+        return self.lessons / self.elapsed if self.elapsed else 0.0
+
+class LessonImporter:
+    def __init__(self, batch_size=500, on_batch=None):
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        self.report = ImportReport()
+        self.lesson_ids = set()
+        # Existing lessons moved to another level; their learners' summaries count per level
+        self.relevelled_ids = set()
+        # Only keys are kept across batches: key -> prerequisite keys
+        self.prerequisite_keys = {}
+
+    def run(self, stream):
+        for batch in chunked(iter_json_documents(stream), self.batch_size):
+            self.import_batch(batch)
+            if self.on_batch:
+                self.on_batch(self.report)
+        try:
+            self.link_prerequisites()
+        finally:
+            self.invalidate_caches()
+        self.rebuild_progress_summaries()
+        self.report.elapsed = time.monotonic() - self.report.started
+        return self.report
+
+    def validate_batch(self, batch):
+        valid = {}
+        for position, document in batch:
+            self.report.read += 1
+            serializer = LessonBundleSerializer(data=document)
+            if not serializer.is_valid():
+                self.report.add_error(position, serializer.errors)
+                continue
+            bundle = serializer.validated_data
+            if bundle['external_key'] in valid:
+                self.report.add_error(position, {'external_key': ['Duplicate key within batch']})
+                continue
+            valid[bundle['external_key']] = bundle
+        return list(valid.values())
+
+    def import_batch(self, batch):
+        bundles = self.validate_batch(batch)
+        if not bundles:
+            return
+
+        lessons = [
+            Lesson(
+                external_key=bundle['external_key'],
+                title=bundle['title'],
+                cefr_level=bundle['cefr_level'],
+                cefr_rank=cefr_rank(bundle['cefr_level']),
+                lesson_type=bundle['lesson_type'],
+                content_json=bundle['content_json'],
+                search_document=extract_search_text(bundle['content_json']),
+                difficulty_score=bundle['difficulty_score'],
+                estimated_duration=bundle['estimated_duration'],
+            )
+            for bundle in bundles
+        ]
+        with transaction.atomic():
+            previous_levels = dict(Lesson.objects.filter(
+                external_key__in=[bundle['external_key'] for bundle in bundles]
+            ).values_list('external_key', 'cefr_level'))
+            Lesson.objects.bulk_create(
+                lessons, update_conflicts=True, unique_fields=['external_key'],
+                update_fields=LESSON_UPDATE_FIELDS,
+            )
+            ids = dict(Lesson.objects.filter(
+                external_key__in=[bundle['external_key'] for bundle in bundles]
+            ).values_list('external_key', 'id'))
+            for lesson in lessons:
+                lesson.id = ids[lesson.external_key]
+                if previous_levels.get(lesson.external_key, lesson.cefr_level) != lesson.cefr_level:
+                    self.relevelled_ids.add(lesson.id)
+            rebuild_vocabulary(lessons)
+
+            quizzes = [
+                Quiz(
+                    lesson_id=ids[bundle['external_key']],
+                    external_key=quiz['external_key'],
+                    question_text=quiz['question_text'],
+                    question_type=quiz['question_type'],
+                    correct_answer=quiz['correct_answer'],
+                    options_json=quiz['options_json'],
+                    audio_file_url=quiz['audio_file_url'],
+                    difficulty_weight=quiz['difficulty_weight'],
+                )
+                for bundle in bundles
+                for quiz in bundle['quizzes']
+            ]
+            if quizzes:
+                Quiz.objects.bulk_create(
+                    quizzes, update_conflicts=True, unique_fields=['lesson', 'external_key'],
+                    update_fields=QUIZ_UPDATE_FIELDS,
+                )
+
+        for bundle in bundles:
+            self.prerequisite_keys[bundle['external_key']] = bundle['prerequisites']
+        self.lesson_ids.update(ids.values())
+        self.report.lessons += len(bundles)
+        self.report.quizzes += len(quizzes)
+
+    def resolve_keys(self, keys):
+        resolved = {}
+        keys = list(keys)
+        for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            resolved.update(Lesson.objects.filter(
+                external_key__in=keys[start:start + LOOKUP_CHUNK_SIZE]
+            ).values_list('external_key', 'id'))
+        return resolved
+
+    def link_prerequisites(self):
+        """Point prerequisites at lesson ids and refresh the closure; rolls back on a cycle"""
+        wanted_keys = set(self.prerequisite_keys)
+        for keys in self.prerequisite_keys.values():
+            wanted_keys.update(keys)
+        ids = self.resolve_keys(wanted_keys)
+
+        changed = []
+        with transaction.atomic():
+            imported = list(self.prerequisite_keys.items())
+            for start in range(0, len(imported), LOOKUP_CHUNK_SIZE):
+                chunk = imported[start:start + LOOKUP_CHUNK_SIZE]
+                current = Lesson.objects.only('id', 'external_key', 'prerequisites').in_bulk(
+                    [key for key, _ in chunk], field_name='external_key'
+                )
+                for key, prerequisite_keys in chunk:
+                    unknown = [prerequisite for prerequisite in prerequisite_keys if prerequisite not in ids]
+                    if unknown:
+                        self.report.add_error(key, {'prerequisites': [f'Unknown lesson keys: {unknown}']})
+                    prerequisites = [ids[prerequisite] for prerequisite in prerequisite_keys if prerequisite in ids]
+                    lesson = current[key]
+                    if lesson.prerequisites != prerequisites:
+                        lesson.prerequisites = prerequisites
+                        changed.append(lesson)
+            Lesson.objects.bulk_update(changed, ['prerequisites'], batch_size=LOOKUP_CHUNK_SIZE)
+            refresh_closure(self.lesson_ids)
+
+    def rebuild_progress_summaries(self):
+        if not self.relevelled_ids:
+            return
+        lesson_ids = list(self.relevelled_ids)
+        user_ids = set()
+        for start in range(0, len(lesson_ids), LOOKUP_CHUNK_SIZE):
+            user_ids.update(UserProgress.objects.filter(
+                lesson_id__in=lesson_ids[start:start + LOOKUP_CHUNK_SIZE]
+            ).values_list('user_id', flat=True))
+        rebuild_summaries(sorted(user_ids))
+
+    def invalidate_caches(self):
+        # bulk writes skip the Lesson/Quiz signals that normally do this
+        for lesson_id in self.lesson_ids:
+            bump_content_version(lesson_id)
+        bump_catalog_version()
\ No newline at end of file
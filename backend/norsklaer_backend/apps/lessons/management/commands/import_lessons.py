@@ -0,0 +1,43 @@
+import sys
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from norsklaer_backend.apps.lessons.importer import LessonImporter
+
+class Command(BaseCommand):
+    help = 'Stream a lesson catalog (NDJSON or JSON array of lesson bundles) into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Catalog file, or '-' for stdin")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Lessons validated and written per transaction')
+        parser.add_argument('--strict', action='store_true',
+                            help='Exit with an error if any bundle was invalid')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        importer = LessonImporter(batch_size=options['batch_size'], on_batch=self.report_batch)
+        self.stdout.write(f"Importing lessons from {options['path']}...")
+        try:
+            if options['path'] == '-':
+                report = importer.run(sys.stdin)
+            else:
+                with open(options['path'], encoding='utf-8') as stream:
+                    report = importer.run(stream)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read catalog: {e}')
+        except ValidationError as e:
+            raise CommandError(f'Prerequisites not linked: {e.messages[0]}')
+
+        for position, detail in report.errors:
+            self.stderr.write(f'  item {position}: {detail}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.lessons} lessons and {report.quizzes} quizzes from {report.read} bundles '
+            f'in {report.elapsed:.2f}s ({report.rate:.0f} lessons/s), {report.invalid} invalid'
+        ))
+        if options['strict'] and report.invalid:
+            raise CommandError(f'{report.invalid} invalid bundles')
+
+    def report_batch(self, report):
+        self.stdout.write(f'  {report.lessons} lessons written, {report.invalid} invalid')
\ No newline at end of file
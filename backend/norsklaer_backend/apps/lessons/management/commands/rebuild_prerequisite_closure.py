@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.lessons.graph import rebuild_closure
+
+class Command(BaseCommand):
+    help = 'Rebuild the lesson prerequisite transitive closure from Lesson.prerequisites'
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding prerequisite closure...')
+        rows = rebuild_closure()
+        self.stdout.write(self.style.SUCCESS(f'Stored {rows} ancestor/descendant pairs'))
\ No newline at end of file
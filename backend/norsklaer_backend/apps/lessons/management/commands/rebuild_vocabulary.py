@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.lessons.vocabulary import rebuild_all_vocabulary
+
+class Command(BaseCommand):
+    help = 'Rebuild the vocabulary_items table from every lesson\'s content_json'
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding vocabulary items...')
+        items = rebuild_all_vocabulary()
+        self.stdout.write(self.style.SUCCESS(f'Stored {items} vocabulary items'))
\ No newline at end of file
@@ -1,5 +1,9 @@
+import copy
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth import get_user_model
+from norsklaer_backend.cefr import sync_cefr_rank
+from .text import extract_search_text
 
 User = get_user_model()
 
@@ -16,13 +20,17 @@ class Lesson(models.Model):
         ('speaking', 'Speaking'),
     ]
     
+    external_key = models.CharField(max_length=100, unique=True, null=True, blank=True,
+                                    help_text="Stable key used by catalog imports")
     title = models.CharField(max_length=255)
     cefr_level = models.CharField(max_length=2, choices=CEFR_LEVELS)
+    cefr_rank = models.PositiveSmallIntegerField(default=1, editable=False)
     lesson_type = models.CharField(max_length=50, choices=LESSON_TYPES)
     content_json = models.JSONField()
     difficulty_score = models.IntegerField(default=1)
     estimated_duration = models.IntegerField(help_text="Duration in minutes")
     prerequisites = models.JSONField(default=list, blank=True)
+    search_document = models.TextField(blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -31,6 +39,108 @@ class Lesson(models.Model):
         indexes = [
             models.Index(fields=['cefr_level']),
             models.Index(fields=['lesson_type']),
+            models.Index(fields=['cefr_rank', 'difficulty_score', 'id']),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_saved_state()
+        return instance
+    
+    def clean(self):
+        super().clean()
+        self.validate_prerequisites()
+    
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = sync_cefr_rank(self, 'cefr_level', kwargs.get('update_fields'))
+        kwargs['update_fields'] = self.sync_search_document(kwargs['update_fields'])
+        # Read by the post_save handler that refreshes the prerequisite closure
+        self._prerequisites_changed = self.prerequisites_changed(kwargs['update_fields'])
+        self._vocabulary_changed = self.vocabulary_changed(kwargs['update_fields'])
+        self._cefr_level_changed = self.cefr_level_changed(kwargs['update_fields'])
+        if self._prerequisites_changed:
+            self.validate_prerequisites()
+        super().save(*args, **kwargs)
+        self.remember_saved_state()
+    
+    def remember_saved_state(self):
+        # Copies, so in-place edits of the JSON values still register as changes
+        deferred = self.get_deferred_fields()
+        if 'cefr_level' not in deferred:
+            self._saved_cefr_level = self.cefr_level
+        if 'prerequisites' not in deferred:
+            self._saved_prerequisites = copy.deepcopy(self.prerequisites)
+        if 'content_json' not in deferred:
+            self._saved_vocabulary = copy.deepcopy(self.vocabulary_entries())
+    
+    def vocabulary_entries(self):
+        vocabulary = self.content_json.get('vocabulary') if isinstance(self.content_json, dict) else None
+        return vocabulary if isinstance(vocabulary, list) else []
+    
+    def vocabulary_changed(self, update_fields=None):
+        if 'content_json' in self.get_deferred_fields():
+            return False
+        if update_fields is not None and 'content_json' not in update_fields:
+            return False
+        return self._state.adding or self.vocabulary_entries() != getattr(self, '_saved_vocabulary', None)
+    
+    def cefr_level_changed(self, update_fields=None):
+        if self._state.adding or 'cefr_level' in self.get_deferred_fields():
+            return False
+        if update_fields is not None and 'cefr_level' not in update_fields:
+            return False
+        return self.cefr_level != getattr(self, '_saved_cefr_level', self.cefr_level)
+    
+    def sync_search_document(self, update_fields):
+        if 'content_json' in self.get_deferred_fields():
+            return update_fields
+        self.search_document = extract_search_text(self.content_json)
+        if update_fields is not None and 'content_json' in update_fields:
+            update_fields = set(update_fields) | {'search_document'}
+        return update_fields
+    
+    def prerequisites_changed(self, update_fields=None):
+        if 'prerequisites' in self.get_deferred_fields():
+            return False
+        if update_fields is not None and 'prerequisites' not in update_fields:
+            return False
+        return self._state.adding or self.prerequisites != getattr(self, '_saved_prerequisites', None)
+    
+    def validate_prerequisites(self):
+        prerequisites = self.prerequisites
+        if not isinstance(prerequisites, list) or not all(
+            isinstance(lesson_id, int) and not isinstance(lesson_id, bool) for lesson_id in prerequisites
+        ):
+            raise ValidationError({'prerequisites': 'Prerequisites must be a list of lesson ids'})
+        if self.pk is not None and self.pk in prerequisites:
+            raise ValidationError({'prerequisites': 'A lesson cannot be its own prerequisite'})
+        
+        existing = set(Lesson.objects.filter(id__in=prerequisites).values_list('id', flat=True))
+        missing = sorted(set(prerequisites) - existing)
+        if missing:
+            raise ValidationError({'prerequisites': f'Unknown lesson ids: {missing}'})
+        
+        # A prerequisite that already depends on this lesson would close a cycle
+        if self.pk is not None and LessonPrerequisiteClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id__in=prerequisites
+        ).exists():
+            raise ValidationError({'prerequisites': 'Prerequisites would create a cycle'})
+
+class LessonPrerequisiteClosure(models.Model):
+    """
+    Transitive closure of Lesson.prerequisites
+    One row per (ancestor, descendant) pair, depth being the shortest path length
+    """
+    ancestor = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='closure_descendants')
+    descendant = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='closure_ancestors')
+    depth = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        db_table = 'lesson_prerequisite_closure'
+        unique_together = ['descendant', 'ancestor']
+        indexes = [
+            models.Index(fields=['ancestor', 'descendant']),
         ]
 
 class Quiz(models.Model):
@@ -42,6 +152,8 @@ class Quiz(models.Model):
     ]
     
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='quizzes')
+    external_key = models.CharField(max_length=120, null=True, blank=True,
+                                    help_text="Catalog import key, unique within the lesson")
     question_text = models.TextField()
     question_type = models.CharField(max_length=20, choices=QUESTION_TYPES)
     correct_answer = models.TextField()
@@ -51,4 +163,31 @@ class Quiz(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        db_table = 'quizzes'
\ No newline at end of file
+        db_table = 'quizzes'
+        unique_together = ['lesson', 'external_key']
+
+class VocabularyItem(models.Model):
+    """
+    One row per content_json["vocabulary"] entry, derived from Lesson content
+    Rebuilt per lesson whenever its vocabulary changes; never edited directly
+    """
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='vocabulary_items')
+    position = models.PositiveIntegerField()
+    norwegian = models.CharField(max_length=255)
+    english = models.CharField(max_length=255, blank=True)
+    pronunciation = models.CharField(max_length=255, blank=True)
+    norwegian_normalized = models.CharField(max_length=255)
+    english_normalized = models.CharField(max_length=255, blank=True)
+    
+    class Meta:
+        db_table = 'vocabulary_items'
+        unique_together = ['lesson', 'position']
+        indexes = [
+            models.Index(fields=['norwegian_normalized']),
+            models.Index(fields=['english_normalized']),
+            # Prefix (LIKE 'term%') lookups cannot use the default opclass outside the C locale
+            models.Index(fields=['norwegian_normalized'], name='vocabulary_norwegian_prefix',
+                         opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['english_normalized'], name='vocabulary_english_prefix',
+                         opclasses=['varchar_pattern_ops']),
+        ]
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Ranked, CEFR-gated lesson search
+PostgreSQL uses a generated tsvector column (Norwegian stemming) with GIN
+indexes for full-text and trigram word similarity. Other databases fall back
+to a per-process inverted index rebuilt whenever the catalog version changes.
+"""
+import math
+import threading
+from collections import defaultdict
+from django.db import connection, connections
+from .cache import get_catalog_version
+from .models import Lesson
+from .text import extract_search_text, stem, tokenize, trigram_similarity, trigrams
+
+TITLE_WEIGHT = 2.0
+FUZZY_THRESHOLD = 0.4
+BACKFILL_BATCH_SIZE = 500
+
+POSTGRES_SETUP_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE lessons ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('norwegian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('norwegian', coalesce(search_document, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS lessons_search_vector_gin ON lessons USING gin (search_vector)",
+    """
+    CREATE INDEX IF NOT EXISTS lessons_search_trgm_gin
+    ON lessons USING gin ((title || ' ' || search_document) gin_trgm_ops)
+    """,
+]
+
+POSTGRES_SEARCH_SQL = """
+    SELECT id,
+           ts_rank_cd(search_vector, query)
+           + word_similarity(%(q)s, title || ' ' || search_document) AS rank
+    FROM lessons, websearch_to_tsquery('norwegian', %(q)s) AS query
+    WHERE cefr_rank <= %(max_rank)s
+      AND (search_vector @@ query OR %(q)s <%% (title || ' ' || search_document))
+    ORDER BY rank DESC, id
+    LIMIT %(limit)s
+"""
+
+def setup_search(using='default'):
+    """Backfill search documents and create the PostgreSQL search column and indexes"""
+    stale = []
+    for lesson in Lesson.objects.using(using).filter(search_document='').only('id', 'content_json').iterator():
+        lesson.search_document = extract_search_text(lesson.content_json)
+        if lesson.search_document:
+            stale.append(lesson)
+    Lesson.objects.using(using).bulk_update(stale, ['search_document'], batch_size=BACKFILL_BATCH_SIZE)
+
+    db = connections[using]
+    if db.vendor == 'postgresql':
+        with db.cursor() as cursor:
+            for statement in POSTGRES_SETUP_SQL:
+                cursor.execute(statement)
+
+class PostgresLessonSearch:
+    def search(self, query, max_rank, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_SEARCH_SQL, {'q': query, 'max_rank': max_rank, 'limit': limit})
+            return [(lesson_id, float(rank)) for lesson_id, rank in cursor.fetchall()]
+
+class InMemoryLessonIndex:
+    """Inverted index over stemmed title and content terms, with trigram typo matching"""
+
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        self.term_trigrams = defaultdict(set)
+        self.ranks = {}
+        for lesson_id, title, document, cefr_rank in rows:
+            self.ranks[lesson_id] = cefr_rank
+            for weight, text in ((TITLE_WEIGHT, title), (1.0, document)):
+                for token in tokenize(text):
+                    term = stem(token)
+                    self.postings[term][lesson_id] = self.postings[term].get(lesson_id, 0.0) + weight
+        for term in self.postings:
+            for gram in trigrams(term):
+                self.term_trigrams[gram].add(term)
+
+    def expand(self, term):
+        if term in self.postings:
+            return [(term, 1.0)]
+        candidates = set()
+        for gram in trigrams(term):
+            candidates |= self.term_trigrams.get(gram, set())
+        matches = []
+        for candidate in candidates:
+            similarity = trigram_similarity(term, candidate)
+            if similarity >= FUZZY_THRESHOLD:
+                matches.append((candidate, similarity))
+        return matches
+
+    def search(self, query, max_rank, limit):
+        total = len(self.ranks) or 1
+        scores = defaultdict(float)
+        for term in {stem(token) for token in tokenize(query)}:
+            for match, similarity in self.expand(term):
+                lessons = self.postings[match]
+                idf = math.log(1 + total / len(lessons))
+                for lesson_id, frequency in lessons.items():
+                    if self.ranks[lesson_id] <= max_rank:
+                        scores[lesson_id] += similarity * frequency * idf
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+class InMemoryLessonSearch:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+
+    def get_index(self):
+        version = get_catalog_version()
+        if self.index is None or self.version != version:
+            with self.lock:
+                if self.index is None or self.version != version:
+                    rows = Lesson.objects.values_list('id', 'title', 'search_document', 'cefr_rank')
+                    self.index = InMemoryLessonIndex(rows.iterator())
+                    self.version = version
+        return self.index
+
+    def search(self, query, max_rank, limit):
+        return self.get_index().search(query, max_rank, limit)
+
+_postgres_search = PostgresLessonSearch()
+_memory_search = InMemoryLessonSearch()
+
+def get_search_backend():
+    return _postgres_search if connection.vendor == 'postgresql' else _memory_search
+
+def search_lessons(query, user, limit):
+    """[(lesson_id, rank)] for lessons at or below the user's level, best first"""
+    return get_search_backend().search(query, user.cefr_rank, limit)
\ No newline at end of file
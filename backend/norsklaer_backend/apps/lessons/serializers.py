@@ -1,36 +1,74 @@
+import json
 from rest_framework import serializers
-from .models import Lesson, Quiz
+from .models import Lesson, Quiz, VocabularyItem
 from norsklaer_backend.apps.progress.models import UserProgress
 
+def build_progress_map(user, lessons):
+    """Load the user's progress rows for the given lessons in one query"""
+    lesson_ids = [lesson.id for lesson in lessons]
+    if not lesson_ids:
+        return {}
+    progress_rows = UserProgress.objects.filter(user=user, lesson_id__in=lesson_ids)
+    return {progress.lesson_id: progress for progress in progress_rows}
+
+def lookup_user_progress(context, user, lesson):
+    """Read progress from the view-supplied map, falling back to a single query"""
+    progress_map = context.get('progress_map')
+    if progress_map is not None:
+        return progress_map.get(lesson.id)
+    return UserProgress.objects.filter(user=user, lesson=lesson).first()
+
 class QuizSerializer(serializers.ModelSerializer):
     class Meta:
         model = Quiz
         fields = ('id', 'question_text', 'question_type', 'correct_answer', 
                  'options_json', 'audio_file_url', 'difficulty_weight')
 
-class LessonSerializer(serializers.ModelSerializer):
+def lesson_progress_block(progress):
+    """Per-user progress block merged into the shared lesson detail payload"""
+    if progress is None:
+        return {'status': 'not_started', 'score': None, 'attempts': 0}
+    return {
+        'status': progress.status,
+        'score': progress.score,
+        'attempts': progress.attempts,
+        'completed_at': progress.completed_at
+    }
+
+class LessonContentSerializer(serializers.ModelSerializer):
+    """User-independent lesson detail, safe to cache and share across users"""
     quizzes = QuizSerializer(many=True, read_only=True)
-    user_progress = serializers.SerializerMethodField()
     
     class Meta:
         model = Lesson
         fields = ('id', 'title', 'cefr_level', 'lesson_type', 'content_json',
                  'difficulty_score', 'estimated_duration', 'prerequisites', 
-                 'quizzes', 'user_progress')
+                 'quizzes')
+
+def content_section_manifest(content):
+    """Section names with their encoded size, so clients can fetch sections lazily"""
+    if not isinstance(content, dict):
+        # Legacy rows can hold a list or scalar; it has no named sections
+        return []
+    manifest = []
+    for name, section in content.items():
+        manifest.append({
+            'name': name,
+            'size': len(json.dumps(section, ensure_ascii=False).encode('utf-8')),
+            'items': len(section) if isinstance(section, list) else None,
+        })
+    return manifest
+
+class LessonSerializer(LessonContentSerializer):
+    user_progress = serializers.SerializerMethodField()
+    
+    class Meta(LessonContentSerializer.Meta):
+        fields = LessonContentSerializer.Meta.fields + ('user_progress',)
     
     def get_user_progress(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            try:
-                progress = UserProgress.objects.get(user=request.user, lesson=obj)
-                return {
-                    'status': progress.status,
-                    'score': progress.score,
-                    'attempts': progress.attempts,
-                    'completed_at': progress.completed_at
-                }
-            except UserProgress.DoesNotExist:
-                return {'status': 'not_started', 'score': None, 'attempts': 0}
+            return lesson_progress_block(lookup_user_progress(self.context, request.user, obj))
         return None
 
 class LessonListSerializer(serializers.ModelSerializer):
@@ -44,13 +82,20 @@ class LessonListSerializer(serializers.ModelSerializer):
     def get_user_progress(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            try:
-                progress = UserProgress.objects.get(user=request.user, lesson=obj)
-                return {
-                    'status': progress.status,
-                    'score': progress.score,
-                    'attempts': progress.attempts
-                }
-            except UserProgress.DoesNotExist:
+            progress = lookup_user_progress(self.context, request.user, obj)
+            if progress is None:
                 return {'status': 'not_started', 'score': None, 'attempts': 0}
-        return None
\ No newline at end of file
+            return {
+                'status': progress.status,
+                'score': progress.score,
+                'attempts': progress.attempts
+            }
+        return None
+
+class VocabularyItemSerializer(serializers.ModelSerializer):
+    lesson_title = serializers.CharField(source='lesson.title', read_only=True)
+    lesson_cefr_level = serializers.CharField(source='lesson.cefr_level', read_only=True)
+    
+    class Meta:
+        model = VocabularyItem
+        fields = ('norwegian', 'english', 'pronunciation', 'lesson_id', 'lesson_title', 'lesson_cefr_level')
\ No newline at end of file
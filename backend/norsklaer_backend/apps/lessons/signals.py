@@ -0,0 +1,39 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import Lesson, Quiz
+from .cache import bump_content_version, bump_catalog_version
+from .graph import dependent_ids, descendant_ids, detach_prerequisite, refresh_closure
+from .vocabulary import rebuild_vocabulary
+
+@receiver([post_save, post_delete], sender=Lesson)
+def invalidate_lesson_content(sender, instance, **kwargs):
+    bump_content_version(instance.id)
+    bump_catalog_version()
+
+@receiver([post_save, post_delete], sender=Quiz)
+def invalidate_quiz_lesson_content(sender, instance, **kwargs):
+    bump_content_version(instance.lesson_id)
+
+@receiver(post_save, sender=Lesson)
+def refresh_lesson_closure(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, '_prerequisites_changed', False):
+        refresh_closure([instance.id])
+
+@receiver(post_save, sender=Lesson)
+def refresh_lesson_vocabulary(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, '_vocabulary_changed', False):
+        rebuild_vocabulary([instance])
+
+@receiver(pre_delete, sender=Lesson)
+def remember_lesson_descendants(sender, instance, **kwargs):
+    instance._closure_descendants = descendant_ids([instance.id])
+    instance._direct_dependents = dependent_ids(instance.id)
+
+@receiver(post_delete, sender=Lesson)
+def refresh_descendant_closure(sender, instance, **kwargs):
+    if instance._direct_dependents:
+        detach_prerequisite(instance.id, instance._direct_dependents)
+        for lesson_id in instance._direct_dependents:
+            bump_content_version(lesson_id)
+    if instance._closure_descendants:
+        refresh_closure(instance._closure_descendants)
\ No newline at end of file
@@ -0,0 +1,631 @@
+import io
+import json
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from .cache import get_content_version
+from .graph import rebuild_closure
+from .importer import LessonImporter, iter_json_documents
+from .models import Lesson, LessonPrerequisiteClosure, Quiz, VocabularyItem
+from norsklaer_backend.apps.progress.models import ProgressSummary, UserProgress
+
+User = get_user_model()
+
+class LessonListQueryCountTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='query@norsklaer.com',
+            username='queryuser',
+            password='testpass123',
+            current_cefr_level='B1'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_lessons(self, count):
+        for i in range(count):
+            lesson = Lesson.objects.create(
+                title=f'Lesson {i}',
+                cefr_level='A1',
+                lesson_type='vocabulary',
+                difficulty_score=1,
+                estimated_duration=10,
+                content_json={'introduction': 'Hei'}
+            )
+            if i % 2 == 0:
+                UserProgress.objects.create(user=self.user, lesson=lesson, status='completed', score=90, attempts=1)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/lessons/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.create_lessons(2)
+        small_page_queries, small_results = self.count_list_queries()
+
+        self.create_lessons(18)
+        full_page_queries, full_results = self.count_list_queries()
+
+        self.assertEqual(len(small_results), 2)
+        self.assertEqual(len(full_results), 20)
+        self.assertEqual(small_page_queries, full_page_queries)
+
+    def test_user_progress_matches_rows(self):
+        self.create_lessons(3)
+        _, results = self.count_list_queries()
+        statuses = sorted(lesson['user_progress']['status'] for lesson in results)
+        self.assertEqual(statuses, ['completed', 'completed', 'not_started'])
+
+    def test_detail_includes_user_progress(self):
+        self.create_lessons(1)
+        lesson = Lesson.objects.get()
+        response = self.client.get(f'/api/v1/lessons/{lesson.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_progress']['status'], 'completed')
+        self.assertEqual(response.data['user_progress']['score'], 90)
+
+class LessonDetailCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='cache@norsklaer.com',
+            username='cacheuser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lesson = Lesson.objects.create(
+            title='Basic Greetings',
+            cefr_level='A1',
+            lesson_type='vocabulary',
+            estimated_duration=15,
+            content_json={'introduction': 'Hei'}
+        )
+        self.url = f'/api/v1/lessons/{self.lesson.id}/'
+
+    def test_cached_hit_skips_lesson_queries(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 2)  # ETag validator and user progress only
+
+    def test_quiz_save_invalidates_content(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Quiz.objects.create(
+                lesson=self.lesson,
+                question_text='Hello?',
+                question_type='multiple_choice',
+                correct_answer='Hei'
+            )
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['quizzes']), 1)
+
+    def test_version_is_bumped_only_after_commit(self):
+        version = get_content_version(self.lesson.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.lesson.title = 'Renamed'
+            self.lesson.save()
+            self.assertEqual(get_content_version(self.lesson.id), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_content_version(self.lesson.id), version)
+
+    def test_progress_is_merged_per_user(self):
+        self.client.get(self.url)
+        UserProgress.objects.create(user=self.user, lesson=self.lesson, status='in_progress', attempts=1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['user_progress']['status'], 'in_progress')
+
+    def test_cached_lesson_is_still_level_gated(self):
+        b2_lesson = Lesson.objects.create(
+            title='Advanced',
+            cefr_level='B2',
+            lesson_type='grammar',
+            estimated_duration=40,
+            content_json={}
+        )
+        b2_user = User.objects.create_user(
+            email='b2@norsklaer.com', username='b2user', password='testpass123', current_cefr_level='B2'
+        )
+        self.client.force_authenticate(user=b2_user)
+        self.assertEqual(self.client.get(f'/api/v1/lessons/{b2_lesson.id}/').status_code, 200)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(f'/api/v1/lessons/{b2_lesson.id}/').status_code, 404)
+
+class CefrRankGatingTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='rank@norsklaer.com',
+            username='rankuser',
+            password='testpass123',
+            current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=self.user)
+        for level in ['A1', 'A2', 'B1', 'C2']:
+            Lesson.objects.create(
+                title=f'{level} lesson',
+                cefr_level=level,
+                lesson_type='grammar',
+                estimated_duration=10,
+                content_json={}
+            )
+
+    def test_ranks_follow_levels(self):
+        self.assertEqual(self.user.cefr_rank, 2)
+        self.assertEqual(Lesson.objects.get(cefr_level='C2').cefr_rank, 6)
+
+    def test_list_is_gated_by_rank(self):
+        response = self.client.get('/api/v1/lessons/')
+        self.assertEqual([lesson['cefr_level'] for lesson in response.data['results']], ['A1', 'A2'])
+
+    def test_level_change_moves_gate(self):
+        self.user.current_cefr_level = 'B1'
+        self.user.save(update_fields=['current_cefr_level'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.cefr_rank, 3)
+        response = self.client.get('/api/v1/lessons/')
+        self.assertEqual(len(response.data['results']), 3)
+
+class LessonConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='etag@norsklaer.com',
+            username='etaguser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lesson = Lesson.objects.create(
+            title='Basic Greetings',
+            cefr_level='A1',
+            lesson_type='vocabulary',
+            estimated_duration=15,
+            content_json={'introduction': 'Hei'}
+        )
+
+    def test_list_not_modified_skips_serialization(self):
+        Lesson.objects.filter(pk=self.lesson.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        response = self.client.get('/api/v1/lessons/')
+        self.assertIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/lessons/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+    def test_last_modified_withheld_during_the_change_second(self):
+        # A second change within the same second would otherwise share the date and get a 304
+        response = self.client.get('/api/v1/lessons/')
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('ETag', response)
+
+    def test_progress_change_invalidates_list_etag(self):
+        etag = self.client.get('/api/v1/lessons/')['ETag']
+        UserProgress.objects.create(user=self.user, lesson=self.lesson, status='in_progress')
+        response = self.client.get('/api/v1/lessons/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_quiz_change_invalidates_detail_etag(self):
+        url = f'/api/v1/lessons/{self.lesson.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Quiz.objects.create(
+                lesson=self.lesson,
+                question_text='Hello?',
+                question_type='multiple_choice',
+                correct_answer='Hei'
+            )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+class LessonKeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='pages@norsklaer.com',
+            username='pagesuser',
+            password='testpass123',
+            current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=self.user)
+        Lesson.objects.bulk_create([
+            Lesson(
+                title=f'Lesson {i}',
+                cefr_level='A1' if i % 3 else 'A2',
+                cefr_rank=1 if i % 3 else 2,
+                lesson_type='vocabulary',
+                difficulty_score=i % 4,  # plenty of ties
+                estimated_duration=10,
+                content_json={}
+            )
+            for i in range(45)
+        ])
+
+    def test_pages_cover_every_lesson_once_in_order(self):
+        seen = []
+        url = '/api/v1/lessons/'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append(response.data['results'])
+            seen.extend(response.data['results'])
+            url = response.data['next']
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertEqual(len({lesson['id'] for lesson in seen}), 45)
+        keys = [(lesson['cefr_level'], lesson['difficulty_score'], lesson['id']) for lesson in seen]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get('/api/v1/lessons/')
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [lesson['id'] for lesson in back.data['results']],
+            [lesson['id'] for lesson in first.data['results']]
+        )
+
+    def test_pages_without_offset(self):
+        first = self.client.get('/api/v1/lessons/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+        page_queries = [q['sql'] for q in queries if 'LIMIT' in q['sql']]
+        self.assertEqual(len(page_queries), 1)
+        self.assertNotIn('OFFSET', page_queries[0])
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get('/api/v1/lessons/?cursor=garbage').status_code, 404)
+
+class LessonSectionTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='sections@norsklaer.com',
+            username='sectionsuser',
+            password='testpass123',
+            current_cefr_level='B1'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lesson = Lesson.objects.create(
+            title='Present Tense Verbs',
+            cefr_level='B1',
+            lesson_type='grammar',
+            estimated_duration=35,
+            content_json={
+                'introduction': 'Master Norwegian present tense verb conjugations',
+                'grammar_rules': [
+                    {'rule': 'Most verbs add -r in present tense', 'example': 'snakke → snakker'},
+                    {'rule': 'Some verbs are irregular', 'example': 'være → er'}
+                ]
+            }
+        )
+
+    def test_manifest_omits_content(self):
+        response = self.client.get(f'/api/v1/lessons/{self.lesson.id}/?content=manifest')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('content_json', response.data)
+        sections = {section['name']: section for section in response.data['content_sections']}
+        self.assertEqual(sections['grammar_rules']['items'], 2)
+        self.assertIsNone(sections['introduction']['items'])
+        self.assertGreater(sections['grammar_rules']['size'], sections['introduction']['size'])
+        self.assertIn('user_progress', response.data)
+
+    def test_manifest_of_non_object_content_is_empty(self):
+        Lesson.objects.filter(pk=self.lesson.pk).update(content_json=['Hei', 'Ha det'])
+        response = self.client.get(f'/api/v1/lessons/{self.lesson.id}/?content=manifest')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content_sections'], [])
+
+    def test_section_endpoint_returns_one_section(self):
+        response = self.client.get(f'/api/v1/lessons/{self.lesson.id}/sections/grammar_rules/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], self.lesson.content_json['grammar_rules'])
+
+    def test_missing_section_is_404(self):
+        response = self.client.get(f'/api/v1/lessons/{self.lesson.id}/sections/vocabulary/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_section_is_level_gated(self):
+        self.user.current_cefr_level = 'A1'
+        self.user.save()
+        response = self.client.get(f'/api/v1/lessons/{self.lesson.id}/sections/introduction/')
+        self.assertEqual(response.status_code, 404)
+
+class PrerequisiteGraphTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='graph@norsklaer.com',
+            username='graphuser',
+            password='testpass123',
+            current_cefr_level='B1'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.greetings = self.create_lesson('Basic Greetings')
+        self.family = self.create_lesson('Family Members', [self.greetings.id])
+        self.verbs = self.create_lesson('Present Tense Verbs', [self.family.id])
+        self.numbers = self.create_lesson('Numbers 1-20')
+
+    def create_lesson(self, title, prerequisites=None):
+        return Lesson.objects.create(
+            title=title,
+            cefr_level='A1',
+            lesson_type='vocabulary',
+            estimated_duration=10,
+            content_json={},
+            prerequisites=prerequisites or []
+        )
+
+    def ancestors(self, lesson):
+        return dict(LessonPrerequisiteClosure.objects.filter(descendant=lesson).values_list('ancestor_id', 'depth'))
+
+    def unlocked_titles(self):
+        response = self.client.get('/api/v1/lessons/?unlocked=true')
+        return {lesson['title'] for lesson in response.data['results']}
+
+    def test_closure_is_transitive(self):
+        self.assertEqual(self.ancestors(self.verbs), {self.family.id: 1, self.greetings.id: 2})
+
+    def test_in_place_prerequisite_edit_is_detected(self):
+        self.numbers.prerequisites.append(self.greetings.id)
+        self.numbers.save()
+        self.assertEqual(self.ancestors(self.numbers), {self.greetings.id: 1})
+
+    def test_editing_prerequisites_updates_descendants(self):
+        self.family.prerequisites = [self.numbers.id]
+        self.family.save()
+        self.assertEqual(self.ancestors(self.verbs), {self.family.id: 1, self.numbers.id: 2})
+
+    def test_cycle_is_rejected(self):
+        self.greetings.prerequisites = [self.verbs.id]
+        with self.assertRaises(ValidationError):
+            self.greetings.save()
+
+    def test_unknown_prerequisite_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            self.create_lesson('Broken', [999999])
+
+    def test_deleting_a_lesson_drops_its_edges(self):
+        self.family.delete()
+        self.assertEqual(self.ancestors(self.verbs), {})
+        self.verbs.refresh_from_db()
+        self.assertEqual(self.verbs.prerequisites, [])
+        # The dependent still validates and saves
+        self.verbs.title = 'Verbs'
+        self.verbs.save()
+
+    def test_unlocked_filter_follows_completed_progress(self):
+        self.assertEqual(self.unlocked_titles(), {'Basic Greetings', 'Numbers 1-20'})
+        UserProgress.objects.create(user=self.user, lesson=self.greetings, status='completed')
+        self.assertEqual(self.unlocked_titles(), {'Basic Greetings', 'Numbers 1-20', 'Family Members'})
+        UserProgress.objects.create(user=self.user, lesson=self.family, status='mastered')
+        self.assertIn('Present Tense Verbs', self.unlocked_titles())
+
+    def test_rebuild_matches_incremental(self):
+        expected = set(LessonPrerequisiteClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        LessonPrerequisiteClosure.objects.all().delete()
+        rebuild_closure()
+        self.assertEqual(set(LessonPrerequisiteClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')), expected)
+
+class LessonSearchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='search@norsklaer.com',
+            username='searchuser',
+            password='testpass123',
+            current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.family = Lesson.objects.create(
+            title='Family Members', cefr_level='A2', lesson_type='vocabulary', estimated_duration=25,
+            content_json={'vocabulary': [
+                {'norwegian': 'familie', 'english': 'family'},
+                {'norwegian': 'søster', 'english': 'sister'},
+            ]}
+        )
+        self.workplace = Lesson.objects.create(
+            title='Workplace Basics', cefr_level='A2', lesson_type='vocabulary', estimated_duration=30,
+            content_json={'vocabulary': [{'norwegian': 'møte', 'english': 'meeting'}],
+                          'cultural_note': 'Norwegian workplaces emphasize work-life balance'}
+        )
+        self.verbs = Lesson.objects.create(
+            title='Present Tense Verbs', cefr_level='B1', lesson_type='grammar', estimated_duration=35,
+            content_json={'examples': [{'norwegian': 'Jeg snakker norsk', 'english': 'I speak Norwegian'}]}
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/v1/lessons/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [lesson['title'] for lesson in response.data['results']]
+
+    def test_search_document_tracks_content(self):
+        self.assertIn('søster', self.family.search_document)
+        self.family.content_json = {'introduction': 'Hei'}
+        self.family.save(update_fields=['content_json'])
+        self.family.refresh_from_db()
+        self.assertEqual(self.family.search_document, 'Hei')
+
+    def test_finds_vocabulary_and_ranks_title_matches_first(self):
+        self.assertEqual(self.search('søster'), ['Family Members'])
+        self.assertEqual(self.search('workplace')[0], 'Workplace Basics')
+
+    def test_tolerates_typos(self):
+        self.assertEqual(self.search('familei'), ['Family Members'])
+
+    def test_results_are_cefr_gated(self):
+        self.assertEqual(self.search('norwegian'), ['Workplace Basics'])
+
+    def test_new_lessons_are_searchable(self):
+        Lesson.objects.create(
+            title='Numbers 1-20', cefr_level='A1', lesson_type='vocabulary', estimated_duration=20,
+            content_json={'vocabulary': [{'norwegian': 'fem', 'english': 'five'}]}
+        )
+        self.assertEqual(self.search('five'), ['Numbers 1-20'])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/api/v1/lessons/search/').status_code, 400)
+
+class LessonImportTest(APITestCase):
+    def bundle(self, key, prerequisites=(), **extra):
+        bundle = {
+            'external_key': key,
+            'title': key.title(),
+            'cefr_level': 'A1',
+            'lesson_type': 'vocabulary',
+            'estimated_duration': 10,
+            'content_json': {'vocabulary': [{'norwegian': 'hei', 'english': 'hello'}]},
+            'prerequisites': list(prerequisites),
+            'quizzes': [{
+                'external_key': f'{key}-hei', 'question_text': f'{key}?', 'question_type': 'fill_blank',
+                'correct_answer': 'hei',
+            }],
+        }
+        bundle.update(extra)
+        return bundle
+
+    def run_import(self, text, batch_size=2):
+        return LessonImporter(batch_size=batch_size).run(io.StringIO(text))
+
+    def test_ndjson_import_resolves_forward_prerequisites(self):
+        catalog = '\n'.join(json.dumps(bundle) for bundle in [
+            self.bundle('verbs', ['family']),
+            self.bundle('family', ['greetings']),
+            self.bundle('greetings'),
+        ])
+        report = self.run_import(catalog, batch_size=1)
+        self.assertEqual((report.lessons, report.quizzes, report.invalid), (3, 3, 0))
+
+        verbs = Lesson.objects.get(external_key='verbs')
+        family = Lesson.objects.get(external_key='family')
+        self.assertEqual(verbs.prerequisites, [family.id])
+        self.assertEqual(verbs.cefr_rank, 1)
+        self.assertIn('hello', verbs.search_document)
+        self.assertEqual(LessonPrerequisiteClosure.objects.filter(descendant=verbs).count(), 2)
+
+    def test_reimport_is_idempotent(self):
+        catalog = json.dumps([self.bundle('greetings'), self.bundle('family', ['greetings'])], indent=2)
+        self.run_import(catalog)
+        first = list(Lesson.objects.order_by('id').values_list('id', 'prerequisites'))
+        quiz_ids = list(Quiz.objects.order_by('id').values_list('id', flat=True))
+
+        updated = json.dumps([self.bundle('greetings', title='Hilsener'), self.bundle('family', ['greetings'])])
+        self.run_import(updated)
+        self.assertEqual(list(Lesson.objects.order_by('id').values_list('id', 'prerequisites')), first)
+        self.assertEqual(list(Quiz.objects.order_by('id').values_list('id', flat=True)), quiz_ids)
+        self.assertEqual(Lesson.objects.get(external_key='greetings').title, 'Hilsener')
+
+    def test_invalid_bundles_are_reported_and_skipped(self):
+        catalog = '\n'.join([
+            json.dumps(self.bundle('greetings')),
+            json.dumps(self.bundle('broken', cefr_level='Z9')),
+            json.dumps(self.bundle('family', ['missing'])),
+        ])
+        report = self.run_import(catalog)
+        self.assertEqual(report.lessons, 2)
+        self.assertEqual(report.invalid, 2)
+        self.assertEqual(Lesson.objects.get(external_key='family').prerequisites, [])
+
+    def test_quizzes_keep_their_identity_when_reordered(self):
+        quizzes = [
+            {'external_key': key, 'question_text': f'{key}?', 'question_type': 'fill_blank', 'correct_answer': key}
+            for key in ('hei', 'takk')
+        ]
+        self.run_import(json.dumps([self.bundle('greetings', quizzes=quizzes)]))
+        ids = dict(Quiz.objects.values_list('external_key', 'id'))
+
+        self.run_import(json.dumps([self.bundle('greetings', quizzes=quizzes[::-1])]))
+        self.assertEqual(Quiz.objects.get(id=ids['takk']).correct_answer, 'takk')
+        self.assertEqual(Quiz.objects.get(id=ids['hei']).correct_answer, 'hei')
+
+    def test_level_changes_rebuild_learner_summaries(self):
+        self.run_import(json.dumps([self.bundle('greetings')]))
+        user = User.objects.create_user(email='mover@norsklaer.com', username='mover', password='testpass123')
+        UserProgress.objects.create(user=user, lesson=Lesson.objects.get(), status='completed')
+        self.assertEqual(ProgressSummary.objects.get(user=user).finished_by_level, {'A1': 1})
+
+        self.run_import(json.dumps([self.bundle('greetings', cefr_level='A2')]))
+        self.assertEqual(ProgressSummary.objects.get(user=user).finished_by_level, {'A2': 1})
+
+    def test_lessons_may_share_quiz_keys(self):
+        quiz = {'external_key': 'q1', 'question_text': 'Hei?', 'question_type': 'fill_blank', 'correct_answer': 'hei'}
+        for batch_size in (2, 1):
+            self.run_import(json.dumps([self.bundle('a', quizzes=[quiz]), self.bundle('b', quizzes=[quiz])]),
+                            batch_size=batch_size)
+            self.assertEqual(
+                sorted(Quiz.objects.values_list('lesson__external_key', 'external_key')),
+                [('a', 'q1'), ('b', 'q1')],
+            )
+
+    def test_quizzes_need_an_external_key(self):
+        quiz = {'question_text': 'Hei?', 'question_type': 'fill_blank', 'correct_answer': 'hei'}
+        report = self.run_import(json.dumps([self.bundle('greetings', quizzes=[quiz])]))
+        self.assertEqual((report.lessons, report.invalid), (0, 1))
+
+    def test_cycles_are_rejected(self):
+        catalog = '\n'.join([json.dumps(self.bundle('a', ['b'])), json.dumps(self.bundle('b', ['a']))])
+        with self.assertRaises(ValidationError):
+            self.run_import(catalog)
+        self.assertFalse(LessonPrerequisiteClosure.objects.exists())
+
+    def test_reader_handles_documents_split_across_reads(self):
+        text = json.dumps([self.bundle('greetings'), self.bundle('family')])
+        documents = list(iter_json_documents(io.StringIO(text), read_size=7))
+        self.assertEqual([position for position, _ in documents], [1, 2])
+        self.assertEqual(documents[1][1]['external_key'], 'family')
+
+class VocabularyTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='words@norsklaer.com',
+            username='wordsuser',
+            password='testpass123',
+            current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.family = Lesson.objects.create(
+            title='Family Members', cefr_level='A2', lesson_type='vocabulary', estimated_duration=25,
+            content_json={'vocabulary': [
+                {'norwegian': 'familie', 'english': 'family', 'pronunciation': 'fah-mee-lee-eh'},
+                {'norwegian': 'Søster', 'english': 'sister'},
+            ]}
+        )
+        self.advanced = Lesson.objects.create(
+            title='Advanced Family', cefr_level='C1', lesson_type='vocabulary', estimated_duration=25,
+            content_json={'vocabulary': [{'norwegian': 'familie', 'english': 'family'}]}
+        )
+
+    def lookup(self, **params):
+        response = self.client.get('/api/v1/lessons/vocabulary/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_items_follow_content_changes(self):
+        self.assertEqual(VocabularyItem.objects.filter(lesson=self.family).count(), 2)
+        self.family.content_json['vocabulary'].append({'norwegian': 'bror', 'english': 'brother'})
+        self.family.save()
+        self.assertEqual(VocabularyItem.objects.filter(lesson=self.family).count(), 3)
+        self.family.title = 'Family'
+        self.family.save(update_fields=['title'])
+        self.assertEqual(VocabularyItem.objects.filter(lesson=self.family).count(), 3)
+
+    def test_lookup_is_normalized_and_gated(self):
+        results = self.lookup(word='SØSTER')
+        self.assertEqual([item['lesson_title'] for item in results], ['Family Members'])
+        self.assertEqual([item['lesson_id'] for item in self.lookup(word='family')], [self.family.id])
+        self.assertEqual(len(self.lookup(word='fam', prefix='true')), 1)
+
+    def test_seen_vocabulary_joins_progress(self):
+        response = self.client.get('/api/v1/progress/vocabulary/')
+        self.assertEqual(response.data['total_words'], 0)
+        UserProgress.objects.create(user=self.user, lesson=self.family, status='in_progress')
+        response = self.client.get('/api/v1/progress/vocabulary/')
+        self.assertEqual(response.data['total_words'], 2)
+        self.assertEqual(response.data['words'][0], {'norwegian': 'familie', 'english': 'family'})
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Text helpers for searching Norwegian lesson content
+Normalization keeps æ/ø/å intact; stemming is a light suffix stripper that
+approximates the Snowball Norwegian stemmer Postgres uses for tsvector
+"""
+import re
+import unicodedata
+
+TOKEN_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# Longest suffixes first so 'ene' wins over 'e'
+NORWEGIAN_SUFFIXES = (
+    'hetene', 'hetens', 'heten', 'heter', 'endes', 'ande', 'ende', 'edes',
+    'ene', 'ane', 'ers', 'ets', 'het', 'ast', 'en', 'ar', 'er', 'as', 'es',
+    'et', 'a', 'e', 's',
+)
+MIN_STEM_LENGTH = 3
+
+def normalize(text):
+    return unicodedata.normalize('NFC', text).casefold()
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+def stem(token):
+    for suffix in NORWEGIAN_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+def trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def trigram_similarity(left, right):
+    left, right = trigrams(left), trigrams(right)
+    return len(left & right) / len(left | right) if left and right else 0.0
+
+def extract_search_text(content):
+    """Flatten every string in a lesson's content_json into one searchable document"""
+    parts = []
+    stack = [content]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+    return '\n'.join(parts)
\ No newline at end of file
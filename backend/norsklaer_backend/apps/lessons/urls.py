@@ -1,7 +1,12 @@
 from django.urls import path
-from .views import LessonListView, LessonDetailView
+from .views import (
+    LessonListView, LessonDetailView, LessonSectionView, LessonSearchView, VocabularyLookupView,
+)
 
 urlpatterns = [
     path('', LessonListView.as_view(), name='lesson_list'),
+    path('search/', LessonSearchView.as_view(), name='lesson_search'),
+    path('vocabulary/', VocabularyLookupView.as_view(), name='vocabulary_lookup'),
     path('<int:pk>/', LessonDetailView.as_view(), name='lesson_detail'),
+    path('<int:pk>/sections/<slug:name>/', LessonSectionView.as_view(), name='lesson_section'),
 ]
\ No newline at end of file
@@ -1,35 +1,173 @@
 from rest_framework import generics, filters
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django.db.models import Count, Max, Q
+from django.db.models.fields.json import KeyTransform
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Lesson
-from .serializers import LessonSerializer, LessonListSerializer
+from .models import Lesson, VocabularyItem
+from .cache import get_lesson_content, get_content_version
+from .filters import LessonFilter
+from .search import search_lessons
+from .vocabulary import normalize_term
+from .serializers import (
+    LessonSerializer, LessonListSerializer, LessonContentSerializer,
+    VocabularyItemSerializer, build_progress_map, lesson_progress_block, content_section_manifest,
+)
+from norsklaer_backend.apps.progress.cache import get_progress_version, progress_modified_at
+from norsklaer_backend.apps.progress.models import UserProgress
+from norsklaer_backend.cefr import available_to, is_available_to
+from norsklaer_backend.conditional import ConditionalGetMixin
+from norsklaer_backend.pagination import KeysetPagination
 
-class LessonListView(generics.ListAPIView):
+class LessonListView(ConditionalGetMixin, generics.ListAPIView):
     serializer_class = LessonListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['cefr_level', 'lesson_type']
+    filterset_class = LessonFilter
     ordering_fields = ['difficulty_score', 'created_at']
-    ordering = ['difficulty_score']
+    ordering = ['cefr_rank', 'difficulty_score']
     
     def get_queryset(self):
-        user = self.request.user
         # Filter lessons based on user's current CEFR level and below
-        cefr_order = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
-        user_level_index = cefr_order.index(user.current_cefr_level)
-        available_levels = cefr_order[:user_level_index + 1]
+        return Lesson.objects.filter(available_to(self.request.user)).defer('content_json', 'prerequisites', 'search_document')
+    
+    def get_validators(self, request, *args, **kwargs):
+        stats = self.filter_queryset(self.get_queryset()).aggregate(
+            lesson_count=Count('id'), last_updated=Max('updated_at')
+        )
+        progress_version = get_progress_version(request.user.id)
+        last_modified = max(filter(None, [stats['last_updated'], progress_modified_at(request.user.id)]))
+        etag_parts = (
+            'lessons', request.user.id, request.user.cefr_rank,
+            stats['lesson_count'], stats['last_updated'], progress_version,
+        )
+        return etag_parts, last_modified
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        lessons = page if page is not None else list(queryset)
+        
+        # One progress query per page instead of one per lesson
+        context = self.get_serializer_context()
+        context['progress_map'] = build_progress_map(request.user, lessons)
+        serializer = self.get_serializer(lessons, many=True, context=context)
         
-        return Lesson.objects.filter(cefr_level__in=available_levels)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
 
-class LessonDetailView(generics.RetrieveAPIView):
+class LessonDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        cefr_order = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
-        user_level_index = cefr_order.index(user.current_cefr_level)
-        available_levels = cefr_order[:user_level_index + 1]
+        return Lesson.objects.filter(available_to(self.request.user)).prefetch_related('quizzes')
+    
+    def get_validators(self, request, *args, **kwargs):
+        lesson_id = kwargs[self.lookup_field]
+        last_updated = Lesson.objects.filter(
+            available_to(request.user), pk=lesson_id
+        ).values_list('updated_at', flat=True).first()
+        if last_updated is None:
+            raise Http404
+        
+        # Quiz edits do not touch Lesson.updated_at, but they do replace the content version
+        etag_parts = (
+            'lesson', lesson_id, request.user.id, last_updated,
+            get_content_version(lesson_id), get_progress_version(request.user.id),
+        )
+        return etag_parts, max(last_updated, progress_modified_at(request.user.id))
+    
+    def retrieve(self, request, *args, **kwargs):
+        lesson_id = kwargs[self.lookup_field]
+        content_mode = request.query_params.get('content', 'full')
+        if content_mode not in ('full', 'manifest'):
+            raise ValidationError({'content': "Must be 'full' or 'manifest'"})
+        
+        # Lesson content is shared by every user, so only the progress block is per request
+        if content_mode == 'manifest':
+            payload = get_lesson_content(lesson_id, lambda: self.load_lesson_manifest(lesson_id), kind='manifest')
+        else:
+            payload = get_lesson_content(lesson_id, lambda: self.load_lesson_content(lesson_id))
+        if payload is None or not is_available_to(request.user, payload['cefr_level']):
+            raise Http404
+        
+        progress = UserProgress.objects.filter(user=request.user, lesson_id=lesson_id).first()
+        data = dict(payload)
+        data['user_progress'] = lesson_progress_block(progress)
+        return Response(data)
+    
+    def load_lesson_content(self, lesson_id):
+        lesson = Lesson.objects.prefetch_related('quizzes').filter(pk=lesson_id).first()
+        if lesson is None:
+            return None
+        return dict(LessonContentSerializer(lesson, context=self.get_serializer_context()).data)
+    
+    def load_lesson_manifest(self, lesson_id):
+        payload = get_lesson_content(lesson_id, lambda: self.load_lesson_content(lesson_id))
+        if payload is None:
+            return None
+        manifest = {key: value for key, value in payload.items() if key != 'content_json'}
+        manifest['content_sections'] = content_section_manifest(payload['content_json'])
+        return manifest
+
+class LessonSectionView(generics.GenericAPIView):
+    """Single content_json section, extracted in the database so the rest stays unread"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk, name):
+        lessons = Lesson.objects.filter(available_to(request.user), pk=pk, content_json__has_key=name)
+        section = lessons.annotate(section=KeyTransform(name, 'content_json')).values_list('section', flat=True)
+        if not section:
+            raise Http404
+        return Response({'lesson_id': pk, 'name': name, 'content': section[0]})
+
+class LessonSearchView(generics.GenericAPIView):
+    """Ranked search over lesson titles and content, limited to the user's level"""
+    serializer_class = LessonListSerializer
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 50
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'A search query is required'})
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer'})
         
-        return Lesson.objects.filter(cefr_level__in=available_levels).prefetch_related('quizzes')
\ No newline at end of file
+        ranked = search_lessons(query, request.user, max(limit, 1))
+        lessons = Lesson.objects.defer('content_json', 'prerequisites', 'search_document').in_bulk(
+            [lesson_id for lesson_id, _ in ranked]
+        )
+        ordered = [lessons[lesson_id] for lesson_id, _ in ranked if lesson_id in lessons]
+        
+        context = self.get_serializer_context()
+        context['progress_map'] = build_progress_map(request.user, ordered)
+        results = self.get_serializer(ordered, many=True, context=context).data
+        scores = dict(ranked)
+        for lesson, result in zip(ordered, results):
+            result['rank'] = round(scores[lesson.id], 4)
+        return Response({'query': query, 'results': results})
+
+class VocabularyLookupView(generics.ListAPIView):
+    """Lessons containing a Norwegian or English word, via the vocabulary_items indexes"""
+    serializer_class = VocabularyItemSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get_queryset(self):
+        term = normalize_term(self.request.query_params.get('word', ''))
+        if not term:
+            raise ValidationError({'word': 'A word is required'})
+        lookup = 'startswith' if self.request.query_params.get('prefix') == 'true' else 'exact'
+        matches = Q(**{f'norwegian_normalized__{lookup}': term}) | Q(**{f'english_normalized__{lookup}': term})
+        return (VocabularyItem.objects.filter(matches, available_to(self.request.user, prefix='lesson__'))
+                .select_related('lesson').order_by('norwegian_normalized', 'id'))
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Materialized vocabulary derived from Lesson.content_json["vocabulary"]
+Turns "lessons containing word X" and "words a user has seen" into indexed
+lookups instead of deserializing every lesson's JSON
+"""
+from django.db import transaction
+from .models import Lesson, VocabularyItem
+from .text import normalize
+
+FIELD_LENGTH = 255
+BATCH_SIZE = 1000
+
+def normalize_term(text):
+    return ' '.join(normalize(text).split())[:FIELD_LENGTH]
+
+def build_items(lesson):
+    items = []
+    for position, entry in enumerate(lesson.vocabulary_entries()):
+        if not isinstance(entry, dict) or not isinstance(entry.get('norwegian'), str):
+            continue
+        norwegian = entry['norwegian'].strip()
+        english = entry.get('english') if isinstance(entry.get('english'), str) else ''
+        pronunciation = entry.get('pronunciation') if isinstance(entry.get('pronunciation'), str) else ''
+        if not norwegian:
+            continue
+        items.append(VocabularyItem(
+            lesson_id=lesson.id,
+            position=position,
+            norwegian=norwegian[:FIELD_LENGTH],
+            english=english.strip()[:FIELD_LENGTH],
+            pronunciation=pronunciation.strip()[:FIELD_LENGTH],
+            norwegian_normalized=normalize_term(norwegian),
+            english_normalized=normalize_term(english),
+        ))
+    return items
+
+def rebuild_vocabulary(lessons):
+    """Replace vocabulary rows for the given lessons (which must have content_json loaded)"""
+    lessons = list(lessons)
+    items = [item for lesson in lessons for item in build_items(lesson)]
+    with transaction.atomic():
+        VocabularyItem.objects.filter(lesson_id__in=[lesson.id for lesson in lessons]).delete()
+        VocabularyItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+    return len(items)
+
+def rebuild_all_vocabulary(batch_size=BATCH_SIZE):
+    total = 0
+    batch = []
+    for lesson in Lesson.objects.only('id', 'content_json').iterator(chunk_size=batch_size):
+        batch.append(lesson)
+        if len(batch) >= batch_size:
+            total += rebuild_vocabulary(batch)
+            batch = []
+    if batch:
+        total += rebuild_vocabulary(batch)
+    return total
\ No newline at end of file
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import ProgressAnalyticsView, LessonAnalyticsView
+
+urlpatterns = [
+    path('progress/', ProgressAnalyticsView.as_view(), name='progress_analytics'),
+    path('lessons/<int:pk>/', LessonAnalyticsView.as_view(), name='lesson_analytics'),
+]
\ No newline at end of file
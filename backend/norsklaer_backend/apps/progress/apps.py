@@ -1,5 +1,48 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class ProgressConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'norsklaer_backend.apps.progress'
\ No newline at end of file
+    name = 'norsklaer_backend.apps.progress'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Before the backfills, which may write progress and so log events
+        post_migrate.connect(setup_progress_events, sender=self)
+        post_migrate.connect(backfill_progress_summaries, sender=self)
+        post_migrate.connect(backfill_progress_rollups, sender=self)
+        post_migrate.connect(seed_review_schedules, sender=self)
+        post_migrate.connect(backfill_leaderboards, sender=self)
+
+def setup_progress_events(sender, using='default', **kwargs):
+    from .events import seed_snapshots, setup_event_log
+    from .models import ProgressEvent, UserProgress
+    setup_event_log(using)
+    if not ProgressEvent.objects.exists() and UserProgress.objects.exists():
+        seed_snapshots()
+
+def backfill_progress_summaries(sender, **kwargs):
+    from .models import ProgressSummary, UserProgress
+    from .summary import rebuild_summaries
+    if not ProgressSummary.objects.exists() and UserProgress.objects.exists():
+        rebuild_summaries()
+
+def backfill_progress_rollups(sender, **kwargs):
+    from .models import DailyUserProgress, UserProgress
+    from .rollups import backfill_rollups
+    if not DailyUserProgress.objects.exists() and UserProgress.objects.exists():
+        backfill_rollups()
+
+def seed_review_schedules(sender, **kwargs):
+    from .models import ReviewSchedule
+    from .scheduler import seed_schedules
+    if not ReviewSchedule.objects.exists():
+        seed_schedules()
+
+def backfill_leaderboards(sender, **kwargs):
+    from .leaderboards import current_windows, rebuild_leaderboards, recount_cohorts
+    from .models import DailyUserProgress, LeaderboardCohort, LeaderboardEntry
+    if not LeaderboardEntry.objects.exists() and DailyUserProgress.objects.exists():
+        rebuild_leaderboards()
+    elif not LeaderboardCohort.objects.exists():
+        recount_cohorts(current_windows())
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Per-user progress version used as a cheap validator for conditional GETs
+The version is the time of the user's last progress change, so it doubles
+as a Last-Modified value without reading user_progress. It lives in the
+shared cache; on a miss (eviction, a fresh cache, a rebuild that replaced
+the generation) it is taken from the user's ProgressSummary.updated_at, so
+every worker and management command agrees on it.
+"""
+import time
+import uuid
+from datetime import datetime, timezone
+from django.core.cache import cache
+from .models import ProgressSummary
+
+VERSION_TIMEOUT = None
+GENERATION_KEY = 'progress:generation'
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, VERSION_TIMEOUT)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+def _version_key(user_id):
+    return f'progress:version:{_generation()}:{user_id}'
+
+def _stored_version(user_id):
+    updated_at = ProgressSummary.objects.filter(user_id=user_id).values_list('updated_at', flat=True).first()
+    return updated_at.timestamp() if updated_at else 0
+
+def get_progress_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _stored_version(user_id), VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+def bump_progress_version(user_id):
+    cache.set(_version_key(user_id), time.time(), VERSION_TIMEOUT)
+
+def bump_progress_versions(user_ids=None):
+    """Bump the given users, or everyone by starting a new generation"""
+    if user_ids is None:
+        cache.set(GENERATION_KEY, uuid.uuid4().hex, VERSION_TIMEOUT)
+        return
+    for user_id in user_ids:
+        bump_progress_version(user_id)
+
+def progress_modified_at(user_id):
+    return datetime.fromtimestamp(get_progress_version(user_id), tz=timezone.utc)
\ No newline at end of file
@@ -0,0 +1,299 @@
+"""
+Append-only progress event log
+Every progress write appends events in its own transaction: 'update' for
+attempts through the API, 'time' for flushed heartbeats, 'set'/'delete' for
+direct ORM edits. On PostgreSQL the table is range-partitioned by month, so
+old history is removed by detaching or dropping whole partitions instead of
+DELETEs on the hot table. compact_before() first folds the old events of
+each (user, lesson) into one 'snapshot' event in the kept range, so
+replay() can still rebuild UserProgress from what remains.
+"""
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+from norsklaer_backend.apps.lessons.models import Lesson
+from .models import ProgressEvent, UserProgress
+from .summary import rebuild_summaries
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = 3
+REPLAY_BATCH_SIZE = 1000
+PARTITION_PREFIX = 'progress_events_'
+
+POSTGRES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS progress_events (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+        user_id BIGINT NOT NULL,
+        lesson_id BIGINT NOT NULL,
+        kind VARCHAR(10) NOT NULL,
+        occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        status VARCHAR(20),
+        score INTEGER,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        time_spent INTEGER NOT NULL DEFAULT 0,
+        completed_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (id, occurred_at)
+    ) PARTITION BY RANGE (occurred_at)
+"""
+POSTGRES_SETUP_SQL = [
+    POSTGRES_TABLE_SQL,
+    "CREATE INDEX IF NOT EXISTS progress_events_user_lesson ON progress_events (user_id, lesson_id, occurred_at)",
+    # Catches writes for months nobody created a partition for yet
+    "CREATE TABLE IF NOT EXISTS progress_events_default PARTITION OF progress_events DEFAULT",
+]
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+def partition_name(month):
+    return f'{PARTITION_PREFIX}{month.year:04d}_{month.month:02d}'
+
+def is_partitioned(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+def setup_event_log(using='default'):
+    """Create the event table (partitioned on PostgreSQL) and upcoming partitions"""
+    db = connections[using]
+    if is_partitioned(using):
+        with db.cursor() as cursor:
+            for statement in POSTGRES_SETUP_SQL:
+                cursor.execute(statement)
+        try:
+            ensure_partitions(using=using)
+        except DatabaseError:
+            # Writes still land in the default partition; maintain_progress_events retries
+            logger.exception('Could not create progress event partitions')
+    elif ProgressEvent._meta.db_table not in db.introspection.table_names():
+        with db.schema_editor() as editor:
+            editor.create_model(ProgressEvent)
+
+def create_partition(cursor, month):
+    """
+    Create one monthly partition. Rows the default partition already holds
+    for that month would make a plain CREATE ... PARTITION OF fail, so they
+    are moved across with the default detached meanwhile.
+    """
+    name, bounds = partition_name(month), [month, add_months(month, 1)]
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM progress_events_default WHERE occurred_at >= %s AND occurred_at < %s)",
+        bounds,
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF progress_events FOR VALUES FROM (%s) TO (%s)", bounds)
+        return
+    cursor.execute("ALTER TABLE progress_events DETACH PARTITION progress_events_default")
+    cursor.execute(f"CREATE TABLE {name} PARTITION OF progress_events FOR VALUES FROM (%s) TO (%s)", bounds)
+    cursor.execute(
+        f"INSERT INTO {name} SELECT * FROM progress_events_default WHERE occurred_at >= %s AND occurred_at < %s",
+        bounds,
+    )
+    cursor.execute("DELETE FROM progress_events_default WHERE occurred_at >= %s AND occurred_at < %s", bounds)
+    cursor.execute("ALTER TABLE progress_events ATTACH PARTITION progress_events_default DEFAULT")
+
+def ensure_partitions(months_ahead=PARTITION_MONTHS_AHEAD, using='default'):
+    """Create any missing monthly partitions from the current month through months_ahead"""
+    if not is_partitioned(using):
+        return []
+    existing = {month for month, _ in monthly_partitions(using)}
+    current = month_start(timezone.now())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month in existing:
+            continue
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            create_partition(cursor, month)
+        created.append(partition_name(month))
+    return created
+
+def monthly_partitions(using='default'):
+    """[(month, table name)] of attached monthly partitions, oldest first"""
+    with connections[using].cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'progress_events'
+        """)
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        suffix = name[len(PARTITION_PREFIX):]
+        if suffix.count('_') == 1 and suffix.replace('_', '').isdigit():
+            year, month = suffix.split('_')
+            partitions.append((datetime(int(year), int(month), 1, tzinfo=dt_timezone.utc), name))
+    return sorted(partitions)
+
+def event(kind, user_id, lesson_id, occurred_at, **values):
+    return ProgressEvent(kind=kind, user_id=user_id, lesson_id=lesson_id, occurred_at=occurred_at, **values)
+
+def update_event(user_id, lesson_id, status, score, attempts, time_spent, occurred_at):
+    return event('update', user_id, lesson_id, occurred_at, status=status, score=score, attempts=attempts,
+                 time_spent=time_spent, completed_at=occurred_at if status == 'completed' else None)
+
+def state_event(kind, progress, occurred_at):
+    return event(kind, progress.user_id, progress.lesson_id, occurred_at, status=progress.status,
+                 score=progress.score, attempts=progress.attempts, time_spent=progress.time_spent,
+                 completed_at=progress.completed_at)
+
+def append(events):
+    if events:
+        ProgressEvent.objects.bulk_create(events)
+
+def fold(state, item):
+    """Apply one event to a (user, lesson) state dict, or None when there is no row"""
+    if item.kind in ('set', 'snapshot'):
+        return {
+            'status': item.status, 'score': item.score, 'attempts': item.attempts,
+            'time_spent': item.time_spent, 'completed_at': item.completed_at,
+            'created_at': state['created_at'] if state else item.occurred_at, 'updated_at': item.occurred_at,
+        }
+    if item.kind == 'delete':
+        return None
+    if item.kind == 'time':
+        if state is not None:
+            state['time_spent'] += item.time_spent
+            state['updated_at'] = item.occurred_at
+        return state
+    if state is None:
+        state = {'status': 'not_started', 'score': None, 'attempts': 0, 'time_spent': 0,
+                 'completed_at': None, 'created_at': item.occurred_at}
+    state['status'] = item.status
+    if item.score is not None:
+        state['score'] = item.score
+    state['attempts'] += item.attempts
+    state['time_spent'] += item.time_spent
+    if item.completed_at is not None:
+        state['completed_at'] = item.completed_at
+    state['updated_at'] = item.occurred_at
+    return state
+
+def seed_snapshots(batch_size=REPLAY_BATCH_SIZE):
+    """Log a snapshot of every existing progress row, so history starts complete"""
+    seeded = 0
+    batch = []
+    for progress in UserProgress.objects.iterator(chunk_size=batch_size):
+        batch.append(state_event('snapshot', progress, progress.updated_at))
+        if len(batch) >= batch_size:
+            append(batch)
+            seeded += len(batch)
+            batch = []
+    append(batch)
+    return seeded + len(batch)
+
+def ordered_events(queryset):
+    # A snapshot stands for everything before its timestamp, so it sorts first within it
+    return queryset.annotate(
+        snapshot_first=Case(When(kind='snapshot', then=Value(0)), default=Value(1), output_field=IntegerField())
+    ).order_by('user_id', 'lesson_id', 'occurred_at', 'snapshot_first', 'id')
+
+def fold_streams(queryset):
+    """Yield ((user_id, lesson_id), state) per pair, streaming the ordered events"""
+    key = None
+    state = None
+    for item in ordered_events(queryset).iterator(chunk_size=REPLAY_BATCH_SIZE):
+        item_key = (item.user_id, item.lesson_id)
+        if item_key != key:
+            if key is not None:
+                yield key, state
+            key, state = item_key, None
+        state = fold(state, item)
+    if key is not None:
+        yield key, state
+
+@contextmanager
+def replayed_timestamps():
+    # auto_now/auto_now_add would stamp every replayed row with the replay time
+    fields = [UserProgress._meta.get_field('created_at'), UserProgress._meta.get_field('updated_at')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+def write_states(states):
+    """Upsert folded states into user_progress and delete rows whose last event was a delete"""
+    # Lessons deleted before their cascade was logged cannot take rows back
+    lesson_ids = set(Lesson.objects.filter(id__in={key[1] for key, _ in states}).values_list('id', flat=True))
+    keep = [(key, state) for key, state in states if state is not None and key[1] in lesson_ids]
+    gone = [key for key, state in states if state is None]
+    UserProgress.objects.bulk_create(
+        [UserProgress(user_id=user_id, lesson_id=lesson_id, **state) for (user_id, lesson_id), state in keep],
+        update_conflicts=True, unique_fields=['user', 'lesson'],
+        update_fields=['status', 'score', 'attempts', 'time_spent', 'completed_at', 'created_at', 'updated_at'],
+    )
+    for user_id, lesson_id in gone:
+        UserProgress.objects.filter(user_id=user_id, lesson_id=lesson_id).delete()
+
+def replay(user_ids=None, batch_size=REPLAY_BATCH_SIZE):
+    """
+    Rebuild UserProgress (and the affected summaries) from the event log;
+    returns the number of (user, lesson) pairs replayed
+    """
+    events = ProgressEvent.objects.all()
+    if user_ids:
+        events = events.filter(user_id__in=user_ids)
+    replayed = 0
+    users = set()
+    batch = []
+    with replayed_timestamps():
+        with transaction.atomic():
+            for key, state in fold_streams(events):
+                batch.append((key, state))
+                users.add(key[0])
+                if len(batch) >= batch_size:
+                    write_states(batch)
+                    replayed += len(batch)
+                    batch = []
+            if batch:
+                write_states(batch)
+                replayed += len(batch)
+            rebuild_summaries(sorted(users))
+    return replayed
+
+def compact_before(cutoff, detach=False, using='default'):
+    """
+    Fold every event before cutoff (a month start) into one snapshot per
+    (user, lesson) at cutoff, then drop the old monthly partitions, or detach
+    them into standalone tables for archiving; returns (snapshots, partitions)
+    """
+    cutoff = month_start(cutoff)
+    old = ProgressEvent.objects.using(using).filter(occurred_at__lt=cutoff)
+    snapshots = []
+    written = 0
+    with transaction.atomic(using=using):
+        for (user_id, lesson_id), state in fold_streams(old):
+            if state is not None:
+                written += 1
+                snapshots.append(event('snapshot', user_id, lesson_id, cutoff, status=state['status'],
+                                       score=state['score'], attempts=state['attempts'],
+                                       time_spent=state['time_spent'], completed_at=state['completed_at']))
+            if len(snapshots) >= REPLAY_BATCH_SIZE:
+                ProgressEvent.objects.using(using).bulk_create(snapshots)
+                snapshots = []
+        ProgressEvent.objects.using(using).bulk_create(snapshots)
+
+        removed = []
+        if is_partitioned(using):
+            with connections[using].cursor() as cursor:
+                for month, name in monthly_partitions(using):
+                    if month < cutoff:
+                        if detach:
+                            cursor.execute(f'ALTER TABLE progress_events DETACH PARTITION {name}')
+                        else:
+                            cursor.execute(f'DROP TABLE {name}')
+                        removed.append(name)
+        # Only the default partition (or the whole table elsewhere) still holds old rows
+        old.delete()
+    return written, removed
\ No newline at end of file
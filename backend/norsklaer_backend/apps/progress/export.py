@@ -0,0 +1,36 @@
+"""Columns and filters for the staff progress export; see norsklaer_backend/export.py"""
+import django_filters
+from norsklaer_backend.apps.lessons.models import Lesson
+from .models import UserProgress
+
+PROGRESS_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('cohort', 'user__current_cefr_level'),
+    ('lesson_id', 'lesson_id'),
+    ('lesson_title', 'lesson__title'),
+    ('lesson_level', 'lesson__cefr_level'),
+    ('status', 'status'),
+    ('score', 'score'),
+    ('attempts', 'attempts'),
+    ('time_spent', 'time_spent'),
+    ('completed_at', 'completed_at'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+
+class ProgressExportFilter(django_filters.FilterSet):
+    level = django_filters.ChoiceFilter(field_name='lesson__cefr_level', choices=Lesson.CEFR_LEVELS)
+    cohort = django_filters.ChoiceFilter(field_name='user__current_cefr_level', choices=Lesson.CEFR_LEVELS)
+    since = django_filters.DateFilter(field_name='updated_at', lookup_expr='date__gte')
+    until = django_filters.DateFilter(field_name='updated_at', lookup_expr='date__lte')
+    user = django_filters.NumberFilter(field_name='user_id')
+    
+    class Meta:
+        model = UserProgress
+        fields = ['level', 'cohort', 'since', 'until', 'user']
+
+def export_queryset():
+    # Primary key order keeps the cursor on an index and the output stable
+    return UserProgress.objects.order_by('id')
\ No newline at end of file
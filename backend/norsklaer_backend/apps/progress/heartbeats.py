@@ -0,0 +1,215 @@
+"""
+Write-behind buffering for time-on-lesson heartbeats
+Heartbeats only add seconds to an in-process buffer keyed by (user, lesson).
+A background thread flushes the coalesced totals with one UPDATE per chunk
+when the flush interval passes or the buffer reaches the size threshold, and
+once more when the worker exits. Only existing progress rows are updated, so
+heartbeats never create progress or change attempts; seconds for lessons
+the user has not started are discarded at flush time.
+"""
+import atexit
+import logging
+import operator
+import threading
+import time
+from functools import reduce
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.db.models import BigIntegerField, Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from .cache import bump_progress_version
+from .events import append, event
+from .models import ProgressSummary, UserProgress
+from .rollups import record_time
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+FLUSH_CHUNK_SIZE = 300
+
+class LocalHeartbeatBuffer:
+    """Per-process buffer; add() is a dict update under a lock"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+    
+    def add(self, user_id, lesson_id, seconds):
+        """Buffer seconds and return the number of pending (user, lesson) entries"""
+        key = (user_id, lesson_id)
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + seconds
+            return len(self.pending)
+    
+    def drain(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return pending
+    
+    def restore(self, pending):
+        """Put back entries from a failed flush, merged with anything added since"""
+        with self.lock:
+            for key, seconds in pending.items():
+                self.pending[key] = self.pending.get(key, 0) + seconds
+    
+    def depth(self):
+        with self.lock:
+            return len(self.pending), sum(self.pending.values())
+
+class HeartbeatMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.heartbeats = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.rows_written = 0
+        self.seconds_written = 0
+        self.seconds_discarded = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self.last_flush_at = None
+    
+    def record_flush(self, elapsed, rows, seconds, discarded):
+        elapsed_ms = elapsed * 1000
+        with self.lock:
+            self.flushes += 1
+            self.rows_written += rows
+            self.seconds_written += seconds
+            self.seconds_discarded += discarded
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.last_flush_at = timezone.now()
+
+def lock_summaries(user_ids):
+    # Summaries before progress rows, the same order record_progress() locks in
+    list(ProgressSummary.objects.select_for_update().filter(user_id__in=user_ids)
+         .order_by('user_id').values_list('user_id', flat=True))
+
+def flush_entries(pending):
+    """
+    Add buffered seconds to existing progress rows and their users' summaries
+    in one transaction; returns (rows, seconds) actually written
+    """
+    now = timezone.now()
+    items = sorted(pending.items())
+    written = {}
+    with transaction.atomic():
+        for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+            chunk = items[start:start + FLUSH_CHUNK_SIZE]
+            user_ids = sorted({user_id for (user_id, _), _ in chunk})
+            lock_summaries(user_ids)
+            rows = UserProgress.objects.filter(reduce(operator.or_, [
+                Q(user_id=user_id, lesson_id=lesson_id) for (user_id, lesson_id), _ in chunk
+            ]))
+            keys = set(rows.values_list('user_id', 'lesson_id'))
+            chunk = [(key, seconds) for key, seconds in chunk if key in keys]
+            if not chunk:
+                continue
+            rows.update(time_spent=F('time_spent') + Case(
+                *[When(user_id=user_id, lesson_id=lesson_id, then=Value(seconds))
+                  for (user_id, lesson_id), seconds in chunk],
+                default=Value(0), output_field=IntegerField(),
+            ), updated_at=now)
+            
+            per_user = {}
+            for (user_id, _), seconds in chunk:
+                per_user[user_id] = per_user.get(user_id, 0) + seconds
+            ProgressSummary.objects.filter(user_id__in=per_user).update(
+                total_time_spent=F('total_time_spent') + Case(
+                    *[When(user_id=user_id, then=Value(seconds)) for user_id, seconds in per_user.items()],
+                    default=Value(0), output_field=BigIntegerField(),
+                ), updated_at=now,
+            )
+            written.update(chunk)
+        
+        if written:
+            per_user = {}
+            per_lesson = {}
+            for (user_id, lesson_id), seconds in written.items():
+                per_user[user_id] = per_user.get(user_id, 0) + seconds
+                per_lesson[lesson_id] = per_lesson.get(lesson_id, 0) + seconds
+            levels = dict(User.objects.filter(id__in=per_user).values_list('id', 'current_cefr_level'))
+            record_time(per_user, levels, per_lesson)
+            append([
+                event('time', user_id, lesson_id, now, time_spent=seconds)
+                for (user_id, lesson_id), seconds in sorted(written.items())
+            ])
+    for user_id in {user_id for user_id, _ in written}:
+        bump_progress_version(user_id)
+    return len(written), sum(written.values())
+
+class HeartbeatRecorder:
+    def __init__(self, buffer=None):
+        self.buffer = buffer or LocalHeartbeatBuffer()
+        self.metrics = HeartbeatMetrics()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.thread_lock = threading.Lock()
+    
+    def record(self, user_id, lesson_id, seconds):
+        depth = self.buffer.add(user_id, lesson_id, seconds)
+        with self.metrics.lock:
+            self.metrics.heartbeats += 1
+        self.ensure_flusher()
+        if depth >= settings.PROGRESS_HEARTBEAT_FLUSH_SIZE:
+            self.wake.set()
+    
+    def flush(self):
+        """Write everything buffered so far; safe to call from any thread"""
+        with self.flush_lock:
+            pending = self.buffer.drain()
+            if not pending:
+                return 0
+            started = time.monotonic()
+            try:
+                rows, seconds = flush_entries(pending)
+            except Exception:
+                self.buffer.restore(pending)
+                with self.metrics.lock:
+                    self.metrics.failed_flushes += 1
+                logger.exception('Heartbeat flush failed; %d entries kept for retry', len(pending))
+                return 0
+            self.metrics.record_flush(
+                time.monotonic() - started, rows, seconds, sum(pending.values()) - seconds
+            )
+            return rows
+    
+    def ensure_flusher(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.thread_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='heartbeat-flusher', daemon=True)
+                self.thread.start()
+    
+    def run(self):
+        while True:
+            self.wake.wait(settings.PROGRESS_HEARTBEAT_FLUSH_INTERVAL)
+            self.wake.clear()
+            close_old_connections()
+            self.flush()
+    
+    def stats(self):
+        entries, seconds = self.buffer.depth()
+        metrics = self.metrics
+        with metrics.lock:
+            return {
+                'buffered_entries': entries,
+                'buffered_seconds': seconds,
+                'heartbeats': metrics.heartbeats,
+                'flushes': metrics.flushes,
+                'failed_flushes': metrics.failed_flushes,
+                'rows_written': metrics.rows_written,
+                'seconds_written': metrics.seconds_written,
+                'seconds_discarded': metrics.seconds_discarded,
+                'last_flush_ms': metrics.last_flush_ms,
+                'max_flush_ms': metrics.max_flush_ms,
+                'last_flush_at': metrics.last_flush_at,
+            }
+
+recorder = HeartbeatRecorder()
+
+# Gunicorn workers exit through sys.exit on graceful shutdown, which runs atexit
+atexit.register(recorder.flush)
\ No newline at end of file
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import LeaderboardView
+
+urlpatterns = [
+    path('', LeaderboardView.as_view(), name='leaderboards'),
+]
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Leaderboards per CEFR cohort, weekly and all-time
+Each progress write adds its points to the user's row for the current week
+and the all-time window in one INSERT ... ON CONFLICT DO UPDATE, so ranking
+never aggregates user_progress. Reads walk the leaderboard_rank index: top N
+is an ordered LIMIT, a user's rank counts the rows above them. Cohort sizes
+are counters in leaderboard_cohorts, moved when an entry is created or
+changes cohort, so a standing never counts the whole cohort. Equal points
+share a rank (1, 2, 2, 4) and are listed by who reached them first. A new
+week simply starts new rows; prune_windows() drops finished weeks.
+"""
+from collections import Counter
+from datetime import date, timedelta
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .models import DailyUserProgress, LeaderboardCohort, LeaderboardEntry
+
+COMPLETION_POINTS = 100
+ALL_TIME_START = date(2000, 1, 1)
+PERIODS = [period for period, _ in LeaderboardEntry.PERIODS]
+KEEP_WEEKS = 12
+BACKFILL_BATCH_SIZE = 1000
+
+INSERT_SQL = """
+    INSERT INTO leaderboard_entries (user_id, period, window_start, cefr_level, points, reached_at)
+    VALUES {values}
+    ON CONFLICT (user_id, period, window_start) DO NOTHING
+    RETURNING period
+"""
+
+COHORT_SQL = """
+    INSERT INTO leaderboard_cohorts (period, window_start, cefr_level, learners)
+    VALUES {values}
+    ON CONFLICT (period, window_start, cefr_level) DO UPDATE SET
+        learners = leaderboard_cohorts.learners + excluded.learners
+"""
+
+UPSERT_SQL = """
+    INSERT INTO leaderboard_entries (user_id, period, window_start, cefr_level, points, reached_at)
+    VALUES {values}
+    ON CONFLICT (user_id, period, window_start) DO UPDATE SET
+        points = leaderboard_entries.points + excluded.points,
+        cefr_level = excluded.cefr_level,
+        reached_at = excluded.reached_at
+"""
+
+def points_for(delta):
+    """Points for a rollup delta: every newly finished lesson plus every score earned"""
+    return delta['completions'] * COMPLETION_POINTS + delta['score_total']
+
+def window_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return ALL_TIME_START
+
+def current_windows(day=None):
+    day = day or timezone.now().date()
+    return {period: window_start(period, day) for period in PERIODS}
+
+def entry_params(user_id, windows, cefr_level, points, now):
+    params = []
+    for period, start in windows.items():
+        params.extend([
+            user_id, period, connection.ops.adapt_datefield_value(start), cefr_level, points,
+            connection.ops.adapt_datetimefield_value(now),
+        ])
+    return ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(windows)), params
+
+def adjust_cohorts(changes):
+    """Apply {(period, window_start, cefr_level): learner delta} to the cohort counters"""
+    changes = {cohort: delta for cohort, delta in changes.items() if delta}
+    if not changes:
+        return
+    params = []
+    # A fixed order keeps concurrent writers from locking counters in opposite orders
+    for (period, start, cefr_level), delta in sorted(changes.items()):
+        params.extend([period, connection.ops.adapt_datefield_value(start), cefr_level, delta])
+    values = ', '.join(['(%s, %s, %s, %s)'] * len(changes))
+    with connection.cursor() as cursor:
+        cursor.execute(COHORT_SQL.format(values=values), params)
+
+def award_points(user_id, cefr_level, delta, now):
+    """Add a write's combined rollup delta to the user's current windows"""
+    points = points_for(delta)
+    if not points:
+        return
+    windows = current_windows(now.date())
+    values, params = entry_params(user_id, windows, cefr_level, points, now)
+    with connection.cursor() as cursor:
+        # Rows this insert creates are new cohort members; the rest already exist and add to their points
+        cursor.execute(INSERT_SQL.format(values=values), params)
+        created = {period for period, in cursor.fetchall()}
+        existing = {period: start for period, start in windows.items() if period not in created}
+        if existing:
+            values, params = entry_params(user_id, existing, cefr_level, points, now)
+            cursor.execute(UPSERT_SQL.format(values=values), params)
+    adjust_cohorts({(period, windows[period], cefr_level): 1 for period in created})
+
+def move_cohort(user_id, cefr_level):
+    """Follow a level change in the current windows; finished weeks keep the old cohort"""
+    starts = current_windows()
+    with transaction.atomic():
+        moved = list(LeaderboardEntry.objects.select_for_update().filter(
+            Q(period='week', window_start=starts['week']) | Q(period='all'), user_id=user_id
+        ).exclude(cefr_level=cefr_level).values_list('id', 'period', 'window_start', 'cefr_level'))
+        if not moved:
+            return
+        LeaderboardEntry.objects.filter(id__in=[entry_id for entry_id, *_ in moved]).update(cefr_level=cefr_level)
+        changes = Counter()
+        for _, period, start, previous in moved:
+            changes[(period, start, previous)] -= 1
+            changes[(period, start, cefr_level)] += 1
+        adjust_cohorts(changes)
+
+def cohort(period, cefr_level, start):
+    return LeaderboardEntry.objects.filter(period=period, window_start=start, cefr_level=cefr_level)
+
+def top_entries(period, cefr_level, limit, start=None):
+    """The first limit entries of a cohort with competition ranks (ties share a rank)"""
+    start = start or current_windows()[period]
+    entries = list(
+        cohort(period, cefr_level, start).select_related('user')
+        .order_by('-points', 'reached_at', 'user_id')[:limit]
+    )
+    ranked = []
+    for position, entry in enumerate(entries, start=1):
+        rank = ranked[-1]['rank'] if ranked and ranked[-1]['points'] == entry.points else position
+        ranked.append({'rank': rank, 'user_id': entry.user_id, 'username': entry.user.username,
+                       'points': entry.points})
+    return ranked
+
+def standing(user, period, start=None):
+    """The user's rank and percentile in their cohort, or None without points"""
+    start = start or current_windows()[period]
+    entries = cohort(period, user.current_cefr_level, start)
+    entry = entries.filter(user=user).first()
+    if entry is None:
+        return None
+    # Both counts are range scans of leaderboard_rank bounded by the user's points
+    above = entries.filter(points__gt=entry.points).count()
+    ties = entries.filter(points=entry.points).count()
+    learners = cohort_size(period, user.current_cefr_level, start)
+    learners = max(learners, above + ties) if learners is not None else entries.count()
+    below = learners - above - ties
+    return {
+        'rank': above + 1,
+        'points': entry.points,
+        'learners': learners,
+        # Share of the cohort behind the user, counting half of those tied
+        'percentile': round(100 * (below + ties / 2) / learners, 1),
+    }
+
+def cohort_size(period, cefr_level, start):
+    """The cohort's learner counter, or None before it has one"""
+    return LeaderboardCohort.objects.filter(
+        period=period, window_start=start, cefr_level=cefr_level
+    ).values_list('learners', flat=True).first()
+
+def recount_cohorts(windows):
+    """Reset the cohort counters of the given {period: window_start} from their entries"""
+    current = Q()
+    for period, start in windows.items():
+        current |= Q(period=period, window_start=start)
+    LeaderboardCohort.objects.filter(current).delete()
+    LeaderboardCohort.objects.bulk_create([
+        LeaderboardCohort(**row)
+        for row in LeaderboardEntry.objects.filter(current).values('period', 'window_start', 'cefr_level')
+        .annotate(learners=Count('id')).order_by()
+    ])
+
+def prune_windows(keep_weeks=KEEP_WEEKS):
+    """Delete weekly windows older than keep_weeks; returns rows deleted"""
+    oldest = current_windows()['week'] - timedelta(weeks=keep_weeks)
+    deleted, _ = LeaderboardEntry.objects.filter(period='week', window_start__lt=oldest).delete()
+    LeaderboardCohort.objects.filter(period='week', window_start__lt=oldest).delete()
+    return deleted
+
+def rebuild_leaderboards(user_ids=None):
+    """
+    Recompute the current windows from the daily user rollups; every user is
+    placed in the cohort of their current level. Returns rows written
+    """
+    now = timezone.now()
+    starts = current_windows(now.date())
+    rows = DailyUserProgress.objects.all()
+    entries = LeaderboardEntry.objects.filter(Q(period='week', window_start=starts['week']) | Q(period='all'))
+    if user_ids:
+        rows = rows.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    totals = rows.values('user_id', 'user__current_cefr_level').annotate(
+        all_completions=Sum('completions'),
+        all_scores=Sum('score_total'),
+        week_completions=Sum('completions', filter=Q(day__gte=starts['week'])),
+        week_scores=Sum('score_total', filter=Q(day__gte=starts['week'])),
+    ).order_by('user_id')
+
+    written = 0
+    with transaction.atomic():
+        entries.delete()
+        batch = []
+        for row in totals.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+            for period, prefix in (('all', 'all'), ('week', 'week')):
+                points = points_for({
+                    'completions': row[f'{prefix}_completions'] or 0,
+                    'score_total': row[f'{prefix}_scores'] or 0,
+                })
+                if points:
+                    batch.append(LeaderboardEntry(
+                        user_id=row['user_id'], period=period, window_start=starts[period],
+                        cefr_level=row['user__current_cefr_level'], points=points, reached_at=now,
+                    ))
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                LeaderboardEntry.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        LeaderboardEntry.objects.bulk_create(batch)
+        recount_cohorts(starts)
+    return written + len(batch)
\ No newline at end of file
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.progress.rollups import backfill_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily progress rollups from user_progress (replaces existing rollups)'
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding daily progress rollups...')
+        written = backfill_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written['users']} user, {written['lessons']} lesson and {written['cohorts']} cohort day rows"
+        ))
\ No newline at end of file
@@ -0,0 +1,13 @@
+from norsklaer_backend.apps.progress.export import (
+    PROGRESS_EXPORT_COLUMNS, ProgressExportFilter, export_queryset,
+)
+from norsklaer_backend.export import ExportCommand
+
+class Command(ExportCommand):
+    help = 'Stream every user_progress row as CSV or NDJSON'
+    columns = PROGRESS_EXPORT_COLUMNS
+    export_name = 'user-progress'
+    filterset_class = ProgressExportFilter
+    
+    def get_queryset(self):
+        return export_queryset()
\ No newline at end of file
@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand, CommandError
+from norsklaer_backend.apps.progress.events import (
+    compact_before, ensure_partitions, is_partitioned,
+)
+
+class Command(BaseCommand):
+    help = 'Create upcoming progress event partitions and compact or archive old months'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Monthly partitions to keep created beyond the current month')
+        parser.add_argument('--compact-before', metavar='YYYY-MM',
+                            help='Fold events before this month into snapshots and remove them')
+        parser.add_argument('--detach', action='store_true',
+                            help='Detach old partitions for archiving instead of dropping them')
+    
+    def handle(self, *args, **options):
+        created = ensure_partitions(options['months_ahead'])
+        if created:
+            self.stdout.write(f"Created partitions {', '.join(created)}")
+        if not options['compact_before']:
+            return
+        try:
+            cutoff = datetime.strptime(options['compact_before'], '%Y-%m').replace(tzinfo=timezone.utc)
+        except ValueError:
+            raise CommandError('--compact-before must look like YYYY-MM')
+        
+        if options['detach'] and not is_partitioned():
+            raise CommandError('--detach needs the partitioned PostgreSQL event table')
+        snapshots, removed = compact_before(cutoff, detach=options['detach'])
+        action = 'Detached' if options['detach'] else 'Dropped'
+        self.stdout.write(f"{action} {', '.join(removed) or 'no partitions'}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted events before {options['compact_before']} into {snapshots} snapshots"
+        ))
\ No newline at end of file
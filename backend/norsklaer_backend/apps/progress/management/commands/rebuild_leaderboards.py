@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.progress.leaderboards import KEEP_WEEKS, prune_windows, rebuild_leaderboards
+
+class Command(BaseCommand):
+    help = 'Recompute the current leaderboard windows from the daily rollups and drop old weeks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild this user id (repeatable)')
+        parser.add_argument('--keep-weeks', type=int, default=KEEP_WEEKS,
+                            help='Finished weekly windows to keep')
+        parser.add_argument('--prune-only', action='store_true',
+                            help='Only drop old weekly windows')
+    
+    def handle(self, *args, **options):
+        pruned = prune_windows(options['keep_weeks'])
+        self.stdout.write(f'Dropped {pruned} entries from old weekly windows')
+        if options['prune_only']:
+            return
+        written = rebuild_leaderboards(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} leaderboard entries'))
\ No newline at end of file
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.progress.summary import rebuild_summaries
+
+class Command(BaseCommand):
+    help = 'Recompute per-user progress summaries from user_progress'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild this user id (repeatable)')
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding progress summaries...')
+        written = rebuild_summaries(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} progress summaries'))
\ No newline at end of file
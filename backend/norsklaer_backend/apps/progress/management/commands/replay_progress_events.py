@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.progress.events import replay
+
+class Command(BaseCommand):
+    help = 'Rebuild user_progress and progress summaries from the progress event log'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only replay this user id (repeatable)')
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Replaying progress events...')
+        replayed = replay(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Replayed {replayed} lesson progress rows'))
\ No newline at end of file
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.progress.scheduler import reschedule_all, seed_schedules
+
+class Command(BaseCommand):
+    help = 'Schedule unscheduled finished lessons and recompute every review due date'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only reschedule this user id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        if not options['users']:
+            created = seed_schedules(batch_size=options['batch_size'])
+            self.stdout.write(f'Scheduled {created} previously unscheduled lessons')
+        changed = reschedule_all(options['users'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rescheduled {changed} reviews'))
\ No newline at end of file
@@ -29,4 +29,194 @@ class UserProgress(models.Model):
             models.Index(fields=['user']),
             models.Index(fields=['lesson']),
             models.Index(fields=['status']),
-        ]
\ No newline at end of file
+            models.Index(fields=['user', 'updated_at', 'id']),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_saved_state()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.remember_saved_state()
+    
+    def summary_state(self):
+        return {'status': self.status, 'score': self.score, 'time_spent': self.time_spent}
+    
+    def remember_saved_state(self):
+        # Read by the post_save handler that maintains ProgressSummary
+        deferred = self.get_deferred_fields()
+        if not deferred & {'status', 'score', 'time_spent'}:
+            self._saved_summary_state = self.summary_state()
+
+class ProgressSummary(models.Model):
+    """
+    Per-user progress totals, kept up to date on every progress write so the
+    dashboard reads one row instead of aggregating user_progress
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='progress_summary')
+    not_started_count = models.IntegerField(default=0)
+    in_progress_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    mastered_count = models.IntegerField(default=0)
+    total_time_spent = models.BigIntegerField(default=0, help_text="Time spent in seconds")
+    score_total = models.BigIntegerField(default=0)
+    scored_lessons = models.IntegerField(default=0)
+    finished_by_level = models.JSONField(default=dict, blank=True,
+                                         help_text="Completed or mastered lessons per CEFR level")
+    last_active_day = models.DateField(null=True, blank=True,
+                                       help_text="Last day with a progress write, for cohort learner counts")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    FINISHED_STATUSES = ('completed', 'mastered')
+    
+    class Meta:
+        db_table = 'user_progress_summaries'
+    
+    @property
+    def total_lessons(self):
+        return self.not_started_count + self.in_progress_count + self.completed_count + self.mastered_count
+    
+    @property
+    def average_score(self):
+        return self.score_total / self.scored_lessons if self.scored_lessons else None
+    
+    def apply_change(self, cefr_level, before, after):
+        """Move one lesson's contribution from the before state to the after state (either may be None)"""
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            field = f"{state['status']}_count"
+            setattr(self, field, getattr(self, field) + sign)
+            self.total_time_spent += sign * state['time_spent']
+            if state['score'] is not None:
+                self.score_total += sign * state['score']
+                self.scored_lessons += sign
+            if cefr_level and state['status'] in self.FINISHED_STATUSES:
+                self.finished_by_level[cefr_level] = self.finished_by_level.get(cefr_level, 0) + sign
+
+class ProgressEvent(models.Model):
+    """
+    Append-only log of progress changes; see events.py
+    Unmanaged so PostgreSQL can create it range-partitioned by month. Plain id
+    columns rather than foreign keys, so history outlives lesson edits.
+    """
+    KINDS = [
+        ('update', 'Progress update'),
+        ('time', 'Time heartbeat'),
+        ('set', 'Direct edit'),
+        ('delete', 'Deleted'),
+        ('snapshot', 'Compacted state'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    user_id = models.BigIntegerField()
+    lesson_id = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    occurred_at = models.DateTimeField()
+    status = models.CharField(max_length=20, null=True, blank=True)
+    score = models.IntegerField(null=True, blank=True)
+    attempts = models.IntegerField(default=0, help_text="Increment, or the total for set/snapshot")
+    time_spent = models.IntegerField(default=0, help_text="Increment, or the total for set/snapshot")
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        managed = False
+        db_table = 'progress_events'
+        indexes = [
+            models.Index(fields=['user_id', 'lesson_id', 'occurred_at'], name='progress_events_user_lesson'),
+        ]
+
+class ReviewSchedule(models.Model):
+    """Spaced-repetition state for a finished lesson; see scheduler.py"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_schedules')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='review_schedules')
+    ease_factor = models.FloatField(default=2.5)
+    interval_days = models.FloatField(default=0)
+    repetitions = models.IntegerField(default=0, help_text="Successful reviews in a row")
+    lapses = models.IntegerField(default=0)
+    last_reviewed_at = models.DateTimeField()
+    due_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'review_schedules'
+        unique_together = ['user', 'lesson']
+        indexes = [
+            models.Index(fields=['user', 'due_at']),
+        ]
+
+class LeaderboardEntry(models.Model):
+    """A user's points in one leaderboard window; see leaderboards.py"""
+    PERIODS = [
+        ('week', 'Weekly'),
+        ('all', 'All time'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    period = models.CharField(max_length=4, choices=PERIODS)
+    window_start = models.DateField()
+    cefr_level = models.CharField(max_length=2)
+    points = models.BigIntegerField(default=0)
+    reached_at = models.DateTimeField(help_text="When points last changed; earlier wins a tie")
+    
+    class Meta:
+        db_table = 'leaderboard_entries'
+        unique_together = ['user', 'period', 'window_start']
+        indexes = [
+            models.Index(fields=['period', 'window_start', 'cefr_level', '-points', 'reached_at', 'user'],
+                         name='leaderboard_rank'),
+        ]
+
+class LeaderboardCohort(models.Model):
+    """Learners in one leaderboard cohort and window, kept in step with LeaderboardEntry"""
+    period = models.CharField(max_length=4, choices=LeaderboardEntry.PERIODS)
+    window_start = models.DateField()
+    cefr_level = models.CharField(max_length=2)
+    learners = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'leaderboard_cohorts'
+        unique_together = ['period', 'window_start', 'cefr_level']
+
+class DailyProgressMetrics(models.Model):
+    """Additive activity counters shared by the daily rollup tables"""
+    day = models.DateField()
+    time_spent = models.BigIntegerField(default=0, help_text="Time spent in seconds")
+    attempts = models.IntegerField(default=0)
+    completions = models.IntegerField(default=0)
+    scored_attempts = models.IntegerField(default=0)
+    score_total = models.BigIntegerField(default=0)
+    scores_0_19 = models.IntegerField(default=0)
+    scores_20_39 = models.IntegerField(default=0)
+    scores_40_59 = models.IntegerField(default=0)
+    scores_60_79 = models.IntegerField(default=0)
+    scores_80_100 = models.IntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+
+class DailyUserProgress(DailyProgressMetrics):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_progress')
+    
+    class Meta:
+        db_table = 'progress_daily_users'
+        unique_together = ['user', 'day']
+
+class DailyLessonProgress(DailyProgressMetrics):
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='daily_progress')
+    
+    class Meta:
+        db_table = 'progress_daily_lessons'
+        unique_together = ['lesson', 'day']
+
+class DailyCohortProgress(DailyProgressMetrics):
+    """Activity of all learners at one CEFR level, by the learner's level at the time"""
+    cefr_level = models.CharField(max_length=2)
+    learners = models.IntegerField(default=0, help_text="Learners who recorded progress that day")
+    
+    class Meta:
+        db_table = 'progress_daily_cohorts'
+        unique_together = ['cefr_level', 'day']
\ No newline at end of file
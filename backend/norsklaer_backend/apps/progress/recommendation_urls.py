@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import LessonRecommendationView
+
+urlpatterns = [
+    path('', LessonRecommendationView.as_view(), name='recommendations'),
+]
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Lesson recommendations
+Candidate pools are precomputed per (CEFR rank, progress bucket) from the
+catalog and cached until it changes: the lessons at the learner's level and
+the one below whose difficulty best fits the bucket. Each request only
+re-ranks that fixed-size pool against the learner's progress, so cost does
+not grow with the catalog. A learner who has finished most of the pool gets
+it topped up from the catalog with lessons they have not finished. Results
+are cached per user until their progress changes.
+"""
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Abs
+from norsklaer_backend.apps.lessons.cache import get_catalog_version
+from norsklaer_backend.apps.lessons.models import Lesson
+from .cache import get_progress_version
+from .models import ProgressSummary, UserProgress
+from .summary import available_lessons_by_level, get_summary
+
+CANDIDATE_POOL_SIZE = 100
+RECENT_WINDOW = 10
+CACHE_TIMEOUT = 60 * 60
+
+# Completion of the learner's current level -> target difficulty (1-10)
+BUCKETS = (('starting', 0.25, 3), ('developing', 0.75, 5), ('consolidating', None, 7))
+SCORE_ADJUSTMENTS = ((85, 1), (60, 0))
+LOW_SCORE_ADJUSTMENT = -1
+
+WEIGHTS = {'fit': 0.35, 'level': 0.2, 'prerequisites': 0.3, 'balance': 0.15}
+IN_PROGRESS_BONUS = 0.3
+BELOW_LEVEL_WEIGHT = 0.5
+
+def progress_bucket(user, summary, available):
+    """(bucket name, target difficulty) from completion of the user's current level"""
+    level = user.current_cefr_level
+    total = available.get(level, 0)
+    completion = summary.finished_by_level.get(level, 0) / total if total else 0
+    for name, upper, target in BUCKETS:
+        if upper is None or completion < upper:
+            return name, target
+
+def pool_lessons(cefr_rank, target):
+    return (
+        Lesson.objects.filter(Q(cefr_rank=cefr_rank) | Q(cefr_rank=cefr_rank - 1))
+        .annotate(distance=Abs(F('difficulty_score') - target))
+        .order_by('distance', '-cefr_rank', 'id')
+    )
+
+def pool_rows(lessons):
+    return list(lessons.values_list('id', 'cefr_rank', 'difficulty_score', 'lesson_type', 'prerequisites'))
+
+def candidate_pool(cefr_rank, bucket, target):
+    """Cached [(id, cefr_rank, difficulty, lesson_type, prerequisites)] nearest the target difficulty"""
+    key = f'recommendations:pool:{get_catalog_version()}:{cefr_rank}:{bucket}'
+    pool = cache.get(key)
+    if pool is None:
+        pool = pool_rows(pool_lessons(cefr_rank, target)[:CANDIDATE_POOL_SIZE])
+        cache.set(key, pool, CACHE_TIMEOUT)
+    return pool
+
+def unfinished_candidates(user, target, exclude_ids):
+    """The next pool-sized set of lessons past the shared pool that the user has not finished"""
+    finished = UserProgress.objects.filter(
+        user=user, lesson_id=OuterRef('pk'), status__in=ProgressSummary.FINISHED_STATUSES
+    )
+    return pool_rows(
+        pool_lessons(user.cefr_rank, target).exclude(id__in=exclude_ids).exclude(Exists(finished))
+        [:CANDIDATE_POOL_SIZE]
+    )
+
+def pool_progress(user, pool):
+    """{lesson_id: status} for the pool lessons and their prerequisites, in one query"""
+    wanted = {lesson_id for lesson_id, *_ in pool}
+    for *_, prerequisites in pool:
+        wanted.update(prerequisites or [])
+    return dict(UserProgress.objects.filter(user=user, lesson_id__in=wanted).values_list('lesson_id', 'status'))
+
+def target_difficulty(base, recent_scores):
+    if not recent_scores:
+        return base
+    average = sum(recent_scores) / len(recent_scores)
+    for threshold, adjustment in SCORE_ADJUSTMENTS:
+        if average >= threshold:
+            return base + adjustment
+    return base + LOW_SCORE_ADJUSTMENT
+
+def rank_candidates(user, pool, target, progress, recent):
+    """
+    Score every pool lesson for the user in one pass; progress maps lesson
+    ids (pool and prerequisites) to status, recent is [(lesson_type, score)]
+    """
+    finished = {lesson_id for lesson_id, status in progress.items() if status in ProgressSummary.FINISHED_STATUSES}
+    target = target_difficulty(target, [score for _, score in recent if score is not None])
+    type_counts = {}
+    for lesson_type, _ in recent:
+        type_counts[lesson_type] = type_counts.get(lesson_type, 0) + 1
+    
+    ranked = []
+    for lesson_id, cefr_rank, difficulty, lesson_type, prerequisites in pool:
+        if lesson_id in finished:
+            continue
+        prerequisites = prerequisites or []
+        met = sum(1 for prerequisite in prerequisites if prerequisite in finished)
+        prerequisite_ratio = met / len(prerequisites) if prerequisites else 1.0
+        components = {
+            'fit': 1 - min(abs(difficulty - target), 9) / 9,
+            'level': 1.0 if cefr_rank == user.cefr_rank else BELOW_LEVEL_WEIGHT,
+            'prerequisites': prerequisite_ratio,
+            'balance': 1 - type_counts.get(lesson_type, 0) / len(recent) if recent else 1.0,
+        }
+        score = sum(WEIGHTS[name] * value for name, value in components.items())
+        reasons = []
+        if progress.get(lesson_id) == 'in_progress':
+            score += IN_PROGRESS_BONUS
+            reasons.append('continue')
+        if prerequisites and prerequisite_ratio == 1.0:
+            reasons.append('prerequisites_met')
+        if recent and lesson_type not in type_counts:
+            reasons.append('new_lesson_type')
+        if components['fit'] >= 0.85:
+            reasons.append('matches_difficulty')
+        ranked.append((round(score, 4), lesson_id, reasons))
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return ranked
+
+def compute_recommendations(user, limit):
+    summary = get_summary(user.id)
+    bucket, target = progress_bucket(user, summary, available_lessons_by_level())
+    pool = candidate_pool(user.cefr_rank, bucket, target)
+    progress = pool_progress(user, pool)
+    
+    unfinished = sum(
+        1 for lesson_id, *_ in pool if progress.get(lesson_id) not in ProgressSummary.FINISHED_STATUSES
+    )
+    if unfinished < limit and len(pool) >= CANDIDATE_POOL_SIZE:
+        # The shared pool is mostly finished for this learner; the catalog may hold more
+        extra = unfinished_candidates(user, target, [lesson_id for lesson_id, *_ in pool])
+        pool = pool + extra
+        progress.update(pool_progress(user, extra))
+    recent = list(
+        UserProgress.objects.filter(user=user).order_by('-updated_at', '-id')
+        .values_list('lesson__lesson_type', 'score')[:RECENT_WINDOW]
+    )
+    ranked = rank_candidates(user, pool, target, progress, recent)[:limit]
+    
+    lessons = Lesson.objects.only('id', 'title', 'cefr_level', 'lesson_type', 'difficulty_score',
+                                  'estimated_duration').in_bulk([lesson_id for _, lesson_id, _ in ranked])
+    return {
+        'bucket': bucket,
+        'results': [
+            {
+                'id': lesson_id,
+                'title': lessons[lesson_id].title,
+                'cefr_level': lessons[lesson_id].cefr_level,
+                'lesson_type': lessons[lesson_id].lesson_type,
+                'difficulty_score': lessons[lesson_id].difficulty_score,
+                'estimated_duration': lessons[lesson_id].estimated_duration,
+                'score': score,
+                'reasons': reasons,
+            }
+            for score, lesson_id, reasons in ranked
+            if lesson_id in lessons
+        ],
+    }
+
+def get_recommendations(user, limit):
+    """Cached per user until their progress, their level or the catalog changes"""
+    key = (f'recommendations:user:{user.id}:{user.cefr_rank}:{limit}:'
+           f'{get_progress_version(user.id)}:{get_catalog_version()}')
+    payload = cache.get(key)
+    if payload is None:
+        payload = compute_recommendations(user, limit)
+        cache.set(key, payload, CACHE_TIMEOUT)
+    return payload
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+Daily progress rollups per user, per lesson and per CEFR cohort
+Progress writes add their deltas with multi-row INSERT ... ON CONFLICT DO
+UPDATE inside the write's transaction, so analytics read a bounded number of
+day rows instead of a user's whole history. The cohort row for a level and
+day is shared by every learner at that level, so its delta is added once the
+write has committed, in its own statement; holding its lock for the rest of
+the write would serialize them all. backfill_rollups() rebuilds the
+tables from user_progress, which only keeps each lesson's latest state, so
+backfilled history is attributed to updated_at/completed_at days.
+"""
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import (
+    DailyCohortProgress, DailyLessonProgress, DailyUserProgress, ProgressSummary, UserProgress,
+)
+
+METRIC_FIELDS = [
+    'time_spent', 'attempts', 'completions', 'scored_attempts', 'score_total',
+    'scores_0_19', 'scores_20_39', 'scores_40_59', 'scores_60_79', 'scores_80_100',
+]
+SCORE_BUCKETS = ['scores_0_19', 'scores_20_39', 'scores_40_59', 'scores_60_79', 'scores_80_100']
+BUCKET_WIDTH = 20
+BACKFILL_BATCH_SIZE = 1000
+
+def empty_delta():
+    return dict.fromkeys(METRIC_FIELDS, 0)
+
+def score_bucket(score):
+    return SCORE_BUCKETS[min(max(score, 0) // BUCKET_WIDTH, len(SCORE_BUCKETS) - 1)]
+
+def activity_delta(before, after, attempts=1, time_spent=0, scores=()):
+    """Rollup delta for one lesson's progress write; before/after are summary states"""
+    delta = empty_delta()
+    delta['attempts'] = attempts
+    delta['time_spent'] = time_spent
+    finished = ProgressSummary.FINISHED_STATUSES
+    if after['status'] in finished and (before is None or before['status'] not in finished):
+        delta['completions'] = 1
+    for score in scores:
+        delta['scored_attempts'] += 1
+        delta['score_total'] += score
+        delta[score_bucket(score)] += 1
+    return delta
+
+def combine(deltas):
+    total = empty_delta()
+    for delta in deltas:
+        for field in METRIC_FIELDS:
+            total[field] += delta[field]
+    return total
+
+def add_to_rollup(model, key_field, day, deltas, extra_fields=()):
+    """Add {key: delta} to model's rows for day, creating them as needed, in one statement"""
+    if not deltas:
+        return
+    table = model._meta.db_table
+    key_column = model._meta.get_field(key_field).column
+    fields = METRIC_FIELDS + list(extra_fields)
+    columns = [key_column, 'day'] + fields
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    day = connection.ops.adapt_datefield_value(day)
+    params = []
+    # Sorted so concurrent writers lock shared rows in the same order
+    for key, delta in sorted(deltas.items()):
+        params.extend([key, day] + [delta[field] for field in fields])
+    assignments = ', '.join(f'{field} = {table}.{field} + excluded.{field}' for field in fields)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([placeholders] * len(deltas))} "
+        f"ON CONFLICT ({key_column}, day) DO UPDATE SET {assignments}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+def add_to_cohorts(day, deltas):
+    """Add {cefr_level: delta} to the cohort rollup after the surrounding transaction commits"""
+    transaction.on_commit(
+        lambda: add_to_rollup(DailyCohortProgress, 'cefr_level', day, deltas, extra_fields=['learners'])
+    )
+
+def record_activity(user_id, cefr_level, summary, lesson_deltas, day=None):
+    """
+    Add one user's lesson deltas to all three rollups; summary must be locked
+    by the caller, who saves it afterwards
+    """
+    day = day or timezone.now().date()
+    total = combine(lesson_deltas.values())
+    cohort = dict(total, learners=0)
+    if summary.last_active_day != day:
+        summary.last_active_day = day
+        cohort['learners'] = 1
+    add_to_rollup(DailyUserProgress, 'user', day, {user_id: total})
+    add_to_rollup(DailyLessonProgress, 'lesson', day, lesson_deltas)
+    add_to_cohorts(day, {cefr_level: cohort})
+
+def record_time(user_seconds, user_levels, lesson_seconds, day=None):
+    """Time-only deltas from buffered heartbeats; learners are not counted"""
+    day = day or timezone.now().date()
+    cohorts = {}
+    for user_id, seconds in user_seconds.items():
+        level = user_levels[user_id]
+        cohorts[level] = cohorts.get(level, 0) + seconds
+    
+    def time_deltas(seconds_by_key, **extra):
+        return {key: dict(empty_delta(), time_spent=seconds, **extra) for key, seconds in seconds_by_key.items()}
+    
+    add_to_rollup(DailyUserProgress, 'user', day, time_deltas(user_seconds))
+    add_to_rollup(DailyLessonProgress, 'lesson', day, time_deltas(lesson_seconds))
+    add_to_cohorts(day, time_deltas(cohorts, learners=0))
+
+def average(total, count):
+    return round(total / count, 1) if count else None
+
+def day_range(days, today=None):
+    end = today or timezone.now().date()
+    return [end - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+
+def daily_series(rows, days):
+    """Zero-filled per-day metrics, oldest first, plus totals and the score distribution"""
+    by_day = {row.day: row for row in rows}
+    series = []
+    totals = empty_delta()
+    for day in days:
+        row = by_day.get(day)
+        values = {field: getattr(row, field) if row else 0 for field in METRIC_FIELDS}
+        for field in METRIC_FIELDS:
+            totals[field] += values[field]
+        series.append({
+            'date': day,
+            'time_spent': values['time_spent'],
+            'attempts': values['attempts'],
+            'completions': values['completions'],
+            'average_score': average(values['score_total'], values['scored_attempts']),
+        })
+    return {
+        'totals': {
+            'time_spent': totals['time_spent'],
+            'attempts': totals['attempts'],
+            'completions': totals['completions'],
+            'average_score': average(totals['score_total'], totals['scored_attempts']),
+        },
+        'score_distribution': {
+            field.replace('scores_', '').replace('_', '-'): totals[field] for field in SCORE_BUCKETS
+        },
+        'series': series,
+    }
+
+def cohort_series(rows, days):
+    by_day = {row.day: row for row in rows}
+    series = []
+    for day in days:
+        row = by_day.get(day)
+        learners = row.learners if row else 0
+        series.append({
+            'date': day,
+            'learners': learners,
+            'time_spent_per_learner': average(row.time_spent, learners) if row else None,
+            'completions_per_learner': average(row.completions, learners) if row else None,
+            'average_score': average(row.score_total, row.scored_attempts) if row else None,
+        })
+    return series
+
+def backfill_aggregates():
+    """Per-row aggregates attributing activity to the day of the row's last update"""
+    aggregates = {
+        'time_spent': Sum('time_spent'),
+        'attempts': Sum('attempts'),
+        'scored_attempts': Count('score'),
+        'score_total': Sum('score'),
+    }
+    for index, field in enumerate(SCORE_BUCKETS):
+        low = index * BUCKET_WIDTH
+        condition = Q(score__gte=low) if index else Q(score__isnull=False)
+        if index < len(SCORE_BUCKETS) - 1:
+            condition &= Q(score__lt=low + BUCKET_WIDTH)
+        aggregates[field] = Count('id', filter=condition)
+    return aggregates
+
+def backfill_rows(model, key_field, key_path, extra=None):
+    activity = UserProgress.objects.annotate(day=TruncDate('updated_at')).values(key_path, 'day').annotate(
+        **backfill_aggregates(), **(extra or {})
+    ).order_by()
+    completions = UserProgress.objects.filter(completed_at__isnull=False).annotate(
+        day=TruncDate('completed_at')
+    ).values(key_path, 'day').annotate(n=Count('id')).order_by()
+    
+    rows = {}
+    for row in activity.iterator():
+        values = {field: row[field] or 0 for field in METRIC_FIELDS if field != 'completions'}
+        values.update({field: row[field] for field in (extra or {})})
+        rows[(row[key_path], row['day'])] = model(**{key_field: row[key_path], 'day': row['day']}, **values)
+    for row in completions.iterator():
+        key = (row[key_path], row['day'])
+        if key not in rows:
+            rows[key] = model(**{key_field: row[key_path], 'day': row['day']})
+        rows[key].completions = row['n']
+    model.objects.bulk_create(rows.values(), batch_size=BACKFILL_BATCH_SIZE)
+    return len(rows)
+
+def backfill_rollups():
+    """Replace every rollup with one rebuilt from user_progress; returns rows written per table"""
+    with transaction.atomic():
+        for model in (DailyUserProgress, DailyLessonProgress, DailyCohortProgress):
+            model.objects.all().delete()
+        return {
+            'users': backfill_rows(DailyUserProgress, 'user_id', 'user_id'),
+            'lessons': backfill_rows(DailyLessonProgress, 'lesson_id', 'lesson_id'),
+            'cohorts': backfill_rows(DailyCohortProgress, 'cefr_level', 'user__current_cefr_level',
+                                     extra={'learners': Count('user_id', distinct=True)}),
+        }
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Spaced-repetition review scheduling (SM-2)
+A lesson enters the schedule when it is first completed or mastered; every
+later scored write is a review graded 0-5 from its score. Intervals grow by
+the ease factor on success and reset on a lapse. due_at is derived from
+last_reviewed_at and interval_days, so changing REVIEW_INTERVAL_MODIFIER only
+needs reschedule_all(), not replaying history.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from .models import ReviewSchedule, UserProgress
+
+MIN_EASE = 1.3
+PASSING_QUALITY = 3
+FIRST_INTERVALS = (1, 6)
+FINISHED_QUALITY = {'completed': 4, 'mastered': 5}
+QUALITY_THRESHOLDS = ((90, 5), (75, 4), (60, 3), (40, 2), (20, 1))
+RESCHEDULE_BATCH_SIZE = 1000
+SCHEDULE_UPDATE_FIELDS = ['ease_factor', 'interval_days', 'repetitions', 'lapses', 'last_reviewed_at', 'due_at']
+
+def review_quality(status, score):
+    """SM-2 grade for a progress write, or None when it isn't a review"""
+    if score is not None:
+        for threshold, quality in QUALITY_THRESHOLDS:
+            if score >= threshold:
+                return quality
+        return 0
+    return FINISHED_QUALITY.get(status)
+
+def due_at(schedule):
+    return schedule.last_reviewed_at + timedelta(days=schedule.interval_days * settings.REVIEW_INTERVAL_MODIFIER)
+
+def apply_review(schedule, quality, reviewed_at):
+    if quality >= PASSING_QUALITY:
+        if schedule.repetitions < len(FIRST_INTERVALS):
+            schedule.interval_days = FIRST_INTERVALS[schedule.repetitions]
+        else:
+            schedule.interval_days = round(schedule.interval_days * schedule.ease_factor, 2)
+        schedule.repetitions += 1
+    else:
+        schedule.repetitions = 0
+        schedule.lapses += 1
+        schedule.interval_days = FIRST_INTERVALS[0]
+    schedule.ease_factor = max(
+        MIN_EASE, schedule.ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    )
+    schedule.last_reviewed_at = reviewed_at
+    schedule.due_at = due_at(schedule)
+
+def record_reviews(user_id, reviews, reviewed_at):
+    """
+    Apply {lesson_id: (status, score)} from progress writes in two queries;
+    lessons only enter the schedule once finished
+    """
+    existing = {
+        schedule.lesson_id: schedule
+        for schedule in ReviewSchedule.objects.filter(user_id=user_id, lesson_id__in=list(reviews))
+    }
+    changed = []
+    for lesson_id, (status, score) in sorted(reviews.items()):
+        schedule = existing.get(lesson_id)
+        if schedule is None and status not in FINISHED_QUALITY:
+            continue
+        # Once scheduled, only scored writes are reviews; a status or time update is not
+        if schedule is not None and score is None:
+            continue
+        quality = review_quality(status, score)
+        if quality is None:
+            continue
+        if schedule is None:
+            schedule = ReviewSchedule(user_id=user_id, lesson_id=lesson_id)
+        apply_review(schedule, quality, reviewed_at)
+        changed.append(schedule)
+    if changed:
+        # Without ids, new and existing schedules go out as one upsert keyed on (user, lesson)
+        for schedule in changed:
+            schedule.id = None
+        ReviewSchedule.objects.bulk_create(
+            changed, update_conflicts=True, unique_fields=['user', 'lesson'],
+            update_fields=SCHEDULE_UPDATE_FIELDS,
+        )
+
+def seed_schedules(batch_size=RESCHEDULE_BATCH_SIZE):
+    """Schedule finished lessons that have no schedule yet; returns rows created"""
+    scheduled = ReviewSchedule.objects.filter(user_id=OuterRef('user_id'), lesson_id=OuterRef('lesson_id'))
+    missing = UserProgress.objects.filter(status__in=list(FINISHED_QUALITY)).exclude(Exists(scheduled)).only(
+        'user_id', 'lesson_id', 'status', 'score', 'completed_at', 'updated_at'
+    )
+    created = 0
+    batch = []
+    for progress in missing.iterator(chunk_size=batch_size):
+        schedule = ReviewSchedule(user_id=progress.user_id, lesson_id=progress.lesson_id)
+        apply_review(schedule, review_quality(progress.status, progress.score),
+                     progress.completed_at or progress.updated_at)
+        batch.append(schedule)
+        if len(batch) >= batch_size:
+            created += len(ReviewSchedule.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        created += len(ReviewSchedule.objects.bulk_create(batch, ignore_conflicts=True))
+    return created
+
+def reschedule_all(user_ids=None, batch_size=RESCHEDULE_BATCH_SIZE):
+    """Recompute due_at for every schedule from its stored state; returns rows changed"""
+    schedules = ReviewSchedule.objects.only('id', 'interval_days', 'last_reviewed_at', 'due_at').order_by('id')
+    if user_ids:
+        schedules = schedules.filter(user_id__in=user_ids)
+    changed = 0
+    batch = []
+    for schedule in schedules.iterator(chunk_size=batch_size):
+        due = due_at(schedule)
+        if due != schedule.due_at:
+            schedule.due_at = due
+            batch.append(schedule)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                ReviewSchedule.objects.bulk_update(batch, ['due_at'])
+            changed += len(batch)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            ReviewSchedule.objects.bulk_update(batch, ['due_at'])
+        changed += len(batch)
+    return changed
\ No newline at end of file
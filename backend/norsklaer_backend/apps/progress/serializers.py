@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import UserProgress
+from .models import ReviewSchedule, UserProgress
 from norsklaer_backend.apps.lessons.models import Lesson
 
 class ProgressUpdateSerializer(serializers.ModelSerializer):
@@ -8,21 +9,48 @@ class ProgressUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProgress
         fields = ('lesson_id', 'status', 'score', 'time_spent')
+        # Scores feed averages and leaderboard points, so they must stay on the 0-100 scale
+        extra_kwargs = {
+            'score': {'min_value': 0, 'max_value': 100},
+            'time_spent': {'min_value': 0},
+        }
+
+class ProgressBatchSerializer(serializers.Serializer):
+    """Envelope for a batch; each item is validated separately so failures are per item"""
+    updates = serializers.ListField(child=serializers.JSONField(), allow_empty=False)
+    
+    def validate_updates(self, value):
+        if len(value) > settings.PROGRESS_BATCH_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"At most {settings.PROGRESS_BATCH_MAX_SIZE} updates per batch"
+            )
+        return value
+
+class HeartbeatSerializer(serializers.Serializer):
+    lesson_id = serializers.IntegerField(min_value=1)
+    seconds = serializers.IntegerField(min_value=1)
     
-    def validate_lesson_id(self, value):
-        try:
-            lesson = Lesson.objects.get(id=value)
-            # Check if user has access to this lesson based on CEFR level
-            user = self.context['request'].user
-            cefr_order = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
-            user_level_index = cefr_order.index(user.current_cefr_level)
-            lesson_level_index = cefr_order.index(lesson.cefr_level)
-            
-            if lesson_level_index > user_level_index:
-                raise serializers.ValidationError("Lesson not available for your current level")
-            return value
-        except Lesson.DoesNotExist:
-            raise serializers.ValidationError("Lesson does not exist")
+    def validate_seconds(self, value):
+        # A client can't claim more time than could pass between heartbeats
+        return min(value, settings.PROGRESS_HEARTBEAT_MAX_SECONDS)
+
+LESSON_MISSING = "Lesson does not exist"
+LESSON_LOCKED = "Lesson not available for your current level"
+
+def lesson_access_error(lesson_id):
+    """Why a progress write was rejected; only queried on the failure path"""
+    return LESSON_LOCKED if Lesson.objects.filter(id=lesson_id).exists() else LESSON_MISSING
+
+def lesson_access_errors(user, lesson_ids):
+    """{lesson_id: error} for lessons the user may not record, in one query"""
+    ranks = dict(Lesson.objects.filter(id__in=set(lesson_ids)).values_list('id', 'cefr_rank'))
+    errors = {}
+    for lesson_id in lesson_ids:
+        if lesson_id not in ranks:
+            errors[lesson_id] = LESSON_MISSING
+        elif ranks[lesson_id] > user.cefr_rank:
+            errors[lesson_id] = LESSON_LOCKED
+    return errors
 
 class UserProgressSerializer(serializers.ModelSerializer):
     lesson_title = serializers.CharField(source='lesson.title', read_only=True)
@@ -31,4 +59,15 @@ class UserProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProgress
         fields = ('id', 'lesson_title', 'lesson_cefr_level', 'status', 'score', 
-                 'attempts', 'time_spent', 'completed_at', 'updated_at')
\ No newline at end of file
+                 'attempts', 'time_spent', 'completed_at', 'updated_at')
+
+class ReviewScheduleSerializer(serializers.ModelSerializer):
+    lesson_id = serializers.IntegerField(read_only=True)
+    lesson_title = serializers.CharField(source='lesson.title', read_only=True)
+    lesson_cefr_level = serializers.CharField(source='lesson.cefr_level', read_only=True)
+    lesson_type = serializers.CharField(source='lesson.lesson_type', read_only=True)
+    
+    class Meta:
+        model = ReviewSchedule
+        fields = ('lesson_id', 'lesson_title', 'lesson_cefr_level', 'lesson_type', 'due_at',
+                 'last_reviewed_at', 'interval_days', 'ease_factor', 'repetitions', 'lapses')
\ No newline at end of file
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from norsklaer_backend.apps.lessons.models import Lesson
+from .models import ProgressEvent, UserProgress
+from .cache import bump_progress_version
+from .events import append, event, state_event
+from .leaderboards import move_cohort
+from .summary import lesson_level, locked_summary, rebuild_summaries
+
+@receiver([post_save, post_delete], sender=UserProgress)
+def invalidate_progress_version(sender, instance, **kwargs):
+    bump_progress_version(instance.user_id)
+
+@receiver(post_save, sender=UserProgress)
+def update_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created and not hasattr(instance, '_saved_summary_state'):
+        # Loaded with deferred fields, so the previous state is unknown
+        rebuild_summaries([instance.user_id])
+        return
+    before = None if created else instance._saved_summary_state
+    with transaction.atomic():
+        summary = locked_summary(instance.user_id)
+        if summary is None:
+            # Built from user_progress, which already includes this save
+            rebuild_summaries([instance.user_id])
+            return
+        summary.apply_change(lesson_level(instance.lesson_id), before, instance.summary_state())
+        summary.save()
+
+@receiver(post_delete, sender=UserProgress)
+def update_summary_on_delete(sender, instance, **kwargs):
+    # No get_or_create: the user itself may be mid-deletion
+    with transaction.atomic():
+        summary = locked_summary(instance.user_id)
+        if summary is not None:
+            summary.apply_change(lesson_level(instance.lesson_id), instance.summary_state(), None)
+            summary.save()
+
+@receiver(post_save, sender=UserProgress)
+def log_progress_save(sender, instance, raw=False, **kwargs):
+    # Direct edits carry absolute values, so replay does not need to know what changed
+    if not raw:
+        append([state_event('set', instance, timezone.now())])
+
+@receiver(post_delete, sender=UserProgress)
+def log_progress_delete(sender, instance, **kwargs):
+    append([event('delete', instance.user_id, instance.lesson_id, timezone.now())])
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def purge_user_events(sender, instance, **kwargs):
+    # No foreign key to cascade through
+    ProgressEvent.objects.filter(user_id=instance.id).delete()
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def move_leaderboard_cohort(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw or (update_fields is not None and 'current_cefr_level' not in update_fields):
+        return
+    move_cohort(instance.id, instance.current_cefr_level)
+
+@receiver(post_save, sender=Lesson)
+def rebuild_summaries_on_level_change(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, '_cefr_level_changed', False):
+        rebuild_summaries(UserProgress.objects.filter(lesson_id=instance.id).values_list('user_id', flat=True).distinct())
\ No newline at end of file
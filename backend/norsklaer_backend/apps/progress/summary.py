@@ -0,0 +1,147 @@
+"""
+Incrementally maintained per-user progress summaries
+Every progress write locks the user's ProgressSummary row, reads the previous
+state of the lessons it touches and applies the difference, all inside the
+write's transaction. rebuild_summaries() recomputes rows from user_progress
+for repairs and after bulk catalog changes that move lessons between levels.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from norsklaer_backend.cefr import CEFR_ORDER
+from norsklaer_backend.apps.lessons.cache import get_catalog_version
+from norsklaer_backend.apps.lessons.models import Lesson
+from .cache import bump_progress_versions
+from .models import ProgressSummary, UserProgress
+
+REBUILD_BATCH_SIZE = 500
+LEVEL_COUNTS_TIMEOUT = 60 * 60
+
+def locked_summary(user_id):
+    """The user's summary row, locked until the surrounding transaction ends, or None"""
+    return ProgressSummary.objects.select_for_update().filter(user_id=user_id).first()
+
+def lock_summary(user_id):
+    """
+    Like locked_summary(), but a missing row is first built from the user's
+    current progress so deltas are applied to real totals
+    """
+    summary = locked_summary(user_id)
+    if summary is None:
+        summary = build_summaries([user_id])[0]
+        try:
+            with transaction.atomic():
+                summary.save(force_insert=True)
+        except IntegrityError:
+            # A concurrent first write created it
+            summary = locked_summary(user_id)
+    return summary
+
+def previous_states(user_id, lesson_ids):
+    """{lesson_id: (cefr_level, state or None)} in one query; missing lessons are absent"""
+    progress = UserProgress.objects.filter(user_id=user_id, lesson_id=OuterRef('pk'))
+    rows = Lesson.objects.filter(id__in=lesson_ids).annotate(
+        previous_status=Subquery(progress.values('status')),
+        previous_score=Subquery(progress.values('score')),
+        previous_time_spent=Subquery(progress.values('time_spent')),
+    ).values_list('id', 'cefr_level', 'previous_status', 'previous_score', 'previous_time_spent')
+    states = {}
+    for lesson_id, cefr_level, status, score, time_spent in rows:
+        state = None
+        if status is not None:
+            state = {'status': status, 'score': score, 'time_spent': time_spent}
+        states[lesson_id] = (cefr_level, state)
+    return states
+
+def lesson_level(lesson_id):
+    return Lesson.objects.filter(id=lesson_id).values_list('cefr_level', flat=True).first()
+
+def available_lessons_by_level():
+    """{cefr_level: lesson count}, cached until the catalog changes"""
+    key = f'progress:level_counts:{get_catalog_version()}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = dict(Lesson.objects.values('cefr_level').annotate(n=Count('id')).values_list('cefr_level', 'n'))
+        cache.set(key, counts, LEVEL_COUNTS_TIMEOUT)
+    return counts
+
+def get_summary(user_id):
+    """One primary-key read; a user without a row yet gets an unsaved one built from user_progress"""
+    return ProgressSummary.objects.filter(user_id=user_id).first() or build_summaries([user_id])[0]
+
+def percentage(part, whole):
+    return round(part / whole * 100, 1) if whole else 0
+
+def summary_payload(user):
+    summary = get_summary(user.id)
+    available = available_lessons_by_level()
+    levels = []
+    for level in CEFR_ORDER[:user.cefr_rank]:
+        finished = summary.finished_by_level.get(level, 0)
+        levels.append({
+            'level': level,
+            'lessons_completed': finished,
+            'available_lessons': available.get(level, 0),
+            'completion_percentage': percentage(finished, available.get(level, 0)),
+        })
+    finished = sum(level['lessons_completed'] for level in levels)
+    available_total = sum(level['available_lessons'] for level in levels)
+    average_score = summary.average_score
+    return {
+        'current_level': user.current_cefr_level,
+        'completion_percentage': percentage(finished, available_total),
+        'lessons_completed': finished,
+        'total_lessons': available_total,
+        'lessons_started': summary.total_lessons,
+        'status_counts': {
+            'not_started': summary.not_started_count,
+            'in_progress': summary.in_progress_count,
+            'completed': summary.completed_count,
+            'mastered': summary.mastered_count,
+        },
+        'total_time_spent': summary.total_time_spent,
+        'average_score': round(average_score, 1) if average_score is not None else None,
+        'levels': levels,
+    }
+
+def build_summaries(user_ids):
+    summaries = {user_id: ProgressSummary(user_id=user_id, finished_by_level={}) for user_id in user_ids}
+    rows = UserProgress.objects.filter(user_id__in=user_ids).values(
+        'user_id', 'status', 'lesson__cefr_level'
+    ).annotate(
+        lessons=Count('id'), time_spent=Sum('time_spent'), score_total=Sum('score'), scored=Count('score'),
+        last_updated=Max('updated_at'),
+    ).order_by()
+    for row in rows:
+        summary = summaries[row['user_id']]
+        field = f"{row['status']}_count"
+        setattr(summary, field, getattr(summary, field) + row['lessons'])
+        summary.total_time_spent += row['time_spent'] or 0
+        summary.score_total += row['score_total'] or 0
+        summary.scored_lessons += row['scored']
+        last_active_day = row['last_updated'].date()
+        if summary.last_active_day is None or last_active_day > summary.last_active_day:
+            summary.last_active_day = last_active_day
+        if row['status'] in ProgressSummary.FINISHED_STATUSES:
+            level = row['lesson__cefr_level']
+            summary.finished_by_level[level] = summary.finished_by_level.get(level, 0) + row['lessons']
+    return list(summaries.values())
+
+def rebuild_summaries(user_ids=None, batch_size=REBUILD_BATCH_SIZE):
+    """Recompute summaries from user_progress for the given users, or everyone; returns rows written"""
+    everyone = user_ids is None
+    if everyone:
+        user_ids = UserProgress.objects.values_list('user_id', flat=True).distinct().order_by('user_id')
+        with transaction.atomic():
+            # Users who no longer have any progress
+            ProgressSummary.objects.exclude(user_id__in=UserProgress.objects.values('user_id')).delete()
+    user_ids = list(user_ids)
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            ProgressSummary.objects.filter(user_id__in=chunk).delete()
+            written += len(ProgressSummary.objects.bulk_create(build_summaries(chunk)))
+    # Conditional GETs must not keep answering 304 from the old versions
+    bump_progress_versions(None if everyone else user_ids)
+    return written
\ No newline at end of file
@@ -0,0 +1,810 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from django.core.management import call_command
+from .heartbeats import recorder
+from datetime import timedelta
+from django.utils import timezone
+from .events import compact_before, replay
+from .models import (
+    DailyCohortProgress, DailyLessonProgress, DailyUserProgress, LeaderboardCohort, LeaderboardEntry,
+    ProgressEvent, ProgressSummary, ReviewSchedule, UserProgress,
+)
+from .leaderboards import rebuild_leaderboards
+from .summary import rebuild_summaries
+from norsklaer_backend.apps.lessons.models import Lesson
+
+User = get_user_model()
+
+class ProgressConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='progress@norsklaer.com',
+            username='progressuser',
+            password='testpass123',
+            current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lesson = Lesson.objects.create(
+            title='Family Members',
+            cefr_level='A2',
+            lesson_type='vocabulary',
+            estimated_duration=25,
+            content_json={}
+        )
+
+    def test_progress_update_invalidates_etag(self):
+        etag = self.client.get('/api/v1/progress/')['ETag']
+        self.assertEqual(self.client.get('/api/v1/progress/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post('/api/v1/progress/update/', {'lesson_id': self.lesson.id, 'status': 'completed'})
+        response = self.client.get('/api/v1/progress/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['overall_progress']['lessons_completed'], 1)
+        self.assertTrue(UserProgress.objects.filter(user=self.user, lesson=self.lesson).exists())
+
+    def test_rebuild_invalidates_etag(self):
+        etag = self.client.get('/api/v1/lessons/')['ETag']
+        # Bulk writes skip the signals, as a replay or repair would
+        UserProgress.objects.bulk_create([UserProgress(user=self.user, lesson=self.lesson, status='completed')])
+        self.assertEqual(self.client.get('/api/v1/lessons/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        rebuild_summaries()
+        response = self.client.get('/api/v1/lessons/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+class ProgressPaginationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='heavy@norsklaer.com',
+            username='heavyuser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        for i in range(25):
+            lesson = Lesson.objects.create(
+                title=f'Lesson {i}', cefr_level='A1', lesson_type='vocabulary',
+                estimated_duration=10, content_json={}
+            )
+            UserProgress.objects.create(
+                user=self.user, lesson=lesson, status='completed' if i < 10 else 'in_progress'
+            )
+
+    def test_summary_covers_all_rows_while_details_are_paged(self):
+        response = self.client.get('/api/v1/progress/')
+        self.assertEqual(len(response.data['progress_details']), 20)
+        self.assertEqual(response.data['overall_progress']['total_lessons'], 25)
+        self.assertEqual(response.data['overall_progress']['lessons_completed'], 10)
+
+        rest = self.client.get(response.data['next'])
+        self.assertEqual(len(rest.data['progress_details']), 5)
+        self.assertIsNone(rest.data['next'])
+        ids = {item['id'] for item in response.data['progress_details'] + rest.data['progress_details']}
+        self.assertEqual(len(ids), 25)
+
+    def test_later_pages_bound_the_leading_column(self):
+        response = self.client.get('/api/v1/progress/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data['next'])
+        page_query = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'])
+        self.assertIn('"user_progress"."updated_at" <=', page_query)
+
+class ProgressUpsertTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='upsert@norsklaer.com',
+            username='upsertuser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lesson = Lesson.objects.create(
+            title='Basic Greetings', cefr_level='A1', lesson_type='vocabulary',
+            estimated_duration=15, content_json={}
+        )
+
+    def post(self, lesson_id, **data):
+        return self.client.post('/api/v1/progress/update/', {'lesson_id': lesson_id, **data})
+
+    def test_update_is_a_single_progress_statement(self):
+        self.post(self.lesson.id, status='not_started')
+        # savepoint, summary lock, previous state, upsert, user and lesson rollups, review lookup,
+        # summary update, event, release; the cohort rollup runs after commit
+        with self.assertNumQueries(10):
+            response = self.post(self.lesson.id, status='in_progress', time_spent=30)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['attempts'], 2)
+
+    def test_repeated_updates_increment_in_the_database(self):
+        self.post(self.lesson.id, status='in_progress', score=40, time_spent=30)
+        response = self.post(self.lesson.id, status='completed', time_spent=45)
+        self.assertEqual(response.data['attempts'], 2)
+        self.assertEqual(response.data['score'], 40)
+
+        progress = UserProgress.objects.get(user=self.user, lesson=self.lesson)
+        self.assertEqual(progress.time_spent, 75)
+        self.assertEqual(progress.status, 'completed')
+        self.assertIsNotNone(progress.completed_at)
+
+    def test_rejects_missing_and_locked_lessons(self):
+        locked = Lesson.objects.create(
+            title='Subjunctive', cefr_level='C1', lesson_type='grammar',
+            estimated_duration=40, content_json={}
+        )
+        response = self.post(locked.id, status='in_progress')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['lesson_id'], ['Lesson not available for your current level'])
+
+        response = self.post(locked.id + 100, status='in_progress')
+        self.assertEqual(response.data['lesson_id'], ['Lesson does not exist'])
+        self.assertFalse(UserProgress.objects.exists())
+
+    def test_score_must_be_a_percentage(self):
+        for score in (2000000000, -1, 101):
+            response = self.post(self.lesson.id, status='completed', score=score)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('score', response.data)
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+class ProgressBatchUpdateTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='batch@norsklaer.com',
+            username='batchuser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Lesson {i}', cefr_level='A1', lesson_type='vocabulary',
+                estimated_duration=10, content_json={}
+            )
+            for i in range(3)
+        ]
+        self.locked = Lesson.objects.create(
+            title='Subjunctive', cefr_level='C1', lesson_type='grammar',
+            estimated_duration=40, content_json={}
+        )
+
+    def post(self, updates):
+        return self.client.post('/api/v1/progress/update/batch/', {'updates': updates}, format='json')
+
+    def test_batch_validates_and_writes_in_fixed_queries(self):
+        updates = [
+            {'lesson_id': lesson.id, 'status': 'completed', 'score': 90, 'time_spent': 60}
+            for lesson in self.lessons
+        ]
+        self.post(updates[:1])
+        # lesson levels, savepoint, summary lock, previous states, upsert, user and lesson rollups,
+        # leaderboard insert and update, review lookup and upsert, summary update, events, release;
+        # the cohort rollup runs after commit
+        with self.assertNumQueries(14):
+            response = self.post(updates)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(UserProgress.objects.filter(user=self.user, status='completed').count(), 3)
+        self.assertEqual(ProgressSummary.objects.get(user=self.user).completed_count, 3)
+
+    def test_partial_failures_are_reported_per_item(self):
+        response = self.post([
+            {'lesson_id': self.lessons[0].id, 'status': 'in_progress', 'time_spent': 30},
+            {'lesson_id': self.locked.id, 'status': 'in_progress'},
+            {'lesson_id': self.lessons[1].id, 'status': 'bogus'},
+            {'lesson_id': self.lessons[0].id, 'status': 'completed', 'time_spent': 15},
+        ])
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        results = response.data['results']
+        self.assertEqual(results[1]['errors']['lesson_id'], ['Lesson not available for your current level'])
+        self.assertIn('status', results[2]['errors'])
+        self.assertEqual(results[3]['attempts'], 2)
+
+        progress = UserProgress.objects.get(user=self.user, lesson=self.lessons[0])
+        self.assertEqual((progress.status, progress.time_spent, progress.attempts), ('completed', 45, 2))
+        self.assertIsNotNone(progress.completed_at)
+
+    def test_scores_outside_0_to_100_are_rejected(self):
+        response = self.post([
+            {'lesson_id': self.lessons[0].id, 'status': 'completed', 'score': 2000000000},
+            {'lesson_id': self.lessons[1].id, 'status': 'completed', 'score': -50},
+            {'lesson_id': self.lessons[2].id, 'status': 'completed', 'score': 100},
+        ])
+        self.assertEqual((response.data['updated'], response.data['failed']), (1, 2))
+        self.assertIn('score', response.data['results'][0]['errors'])
+        self.assertIn('score', response.data['results'][1]['errors'])
+        self.assertEqual(LeaderboardEntry.objects.get(period='all').points, 200)
+
+    def test_batch_size_is_capped(self):
+        with self.settings(PROGRESS_BATCH_MAX_SIZE=2):
+            response = self.post([{'lesson_id': lesson.id, 'status': 'in_progress'} for lesson in self.lessons])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserProgress.objects.exists())
+
+
+class ProgressSummaryTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='summary@norsklaer.com',
+            username='summaryuser',
+            password='testpass123',
+            current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.a1 = [
+            Lesson.objects.create(
+                title=f'A1 lesson {i}', cefr_level='A1', lesson_type='vocabulary',
+                estimated_duration=10, content_json={}
+            )
+            for i in range(4)
+        ]
+        self.a2 = Lesson.objects.create(
+            title='A2 lesson', cefr_level='A2', lesson_type='grammar',
+            estimated_duration=20, content_json={}
+        )
+        Lesson.objects.create(
+            title='B1 lesson', cefr_level='B1', lesson_type='grammar',
+            estimated_duration=30, content_json={}
+        )
+
+    def post(self, lesson, **data):
+        return self.client.post('/api/v1/progress/update/', {'lesson_id': lesson.id, **data})
+
+    def summary(self):
+        return self.client.get('/api/v1/progress/').data['overall_progress']
+
+    def test_summary_tracks_updates_against_available_lessons(self):
+        self.post(self.a1[0], status='in_progress', score=60, time_spent=100)
+        self.post(self.a1[0], status='completed', score=80, time_spent=50)
+        self.post(self.a1[1], status='mastered', score=100, time_spent=10)
+        self.post(self.a2, status='in_progress', time_spent=5)
+
+        summary = self.summary()
+        self.assertEqual(summary['lessons_completed'], 2)
+        self.assertEqual(summary['total_lessons'], 5)
+        self.assertEqual(summary['completion_percentage'], 40.0)
+        self.assertEqual(summary['status_counts'], {
+            'not_started': 0, 'in_progress': 1, 'completed': 1, 'mastered': 1
+        })
+        self.assertEqual(summary['total_time_spent'], 165)
+        self.assertEqual(summary['average_score'], 90.0)
+        self.assertEqual(summary['levels'][0], {
+            'level': 'A1', 'lessons_completed': 2, 'available_lessons': 4, 'completion_percentage': 50.0
+        })
+
+    def test_orm_writes_and_deletes_keep_summary_in_step(self):
+        self.post(self.a1[0], status='completed', score=70)
+        progress = UserProgress.objects.create(user=self.user, lesson=self.a1[1], status='completed', score=90)
+        progress.status = 'in_progress'
+        progress.save()
+        UserProgress.objects.get(lesson=self.a1[0]).delete()
+
+        summary = ProgressSummary.objects.get(user=self.user)
+        self.assertEqual((summary.completed_count, summary.in_progress_count), (0, 1))
+        self.assertEqual((summary.score_total, summary.scored_lessons), (90, 1))
+        self.assertEqual(summary.finished_by_level, {'A1': 0})
+
+    def test_lesson_level_change_moves_completion(self):
+        self.post(self.a1[0], status='completed')
+        self.a1[0].cefr_level = 'A2'
+        self.a1[0].save()
+        self.assertEqual(ProgressSummary.objects.get(user=self.user).finished_by_level, {'A2': 1})
+
+    def test_rebuild_command_repairs_drift(self):
+        self.post(self.a1[0], status='completed', time_spent=40)
+        ProgressSummary.objects.filter(user=self.user).update(completed_count=7, total_time_spent=0)
+        call_command('rebuild_progress_summaries', '--user', str(self.user.id), stdout=io.StringIO())
+        summary = ProgressSummary.objects.get(user=self.user)
+        self.assertEqual((summary.completed_count, summary.total_time_spent), (1, 40))
+
+class HeartbeatTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        recorder.buffer.drain()
+        self.user = User.objects.create_user(
+            email='heartbeat@norsklaer.com',
+            username='heartbeatuser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Lesson {i}', cefr_level='A1', lesson_type='listening',
+                estimated_duration=10, content_json={}
+            )
+            for i in range(2)
+        ]
+        self.client.post('/api/v1/progress/update/', {
+            'lesson_id': self.lessons[0].id, 'status': 'in_progress', 'time_spent': 10
+        })
+
+    def tearDown(self):
+        recorder.buffer.drain()
+
+    def beat(self, lesson, seconds=15):
+        with self.settings(PROGRESS_HEARTBEAT_FLUSH_INTERVAL=3600):
+            return self.client.post('/api/v1/progress/heartbeat/', {'lesson_id': lesson.id, 'seconds': seconds})
+
+    def test_heartbeats_are_buffered_then_flushed_in_one_batch(self):
+        with self.assertNumQueries(0):
+            response = self.beat(self.lessons[0])
+        self.assertEqual(response.status_code, 202)
+        self.beat(self.lessons[0])
+        self.beat(self.lessons[0], seconds=600)
+        self.beat(self.lessons[1])
+
+        progress = UserProgress.objects.get(user=self.user, lesson=self.lessons[0])
+        self.assertEqual(progress.time_spent, 10)
+
+        recorder.flush()
+        progress.refresh_from_db()
+        self.assertEqual((progress.time_spent, progress.attempts), (100, 1))
+        self.assertEqual(ProgressSummary.objects.get(user=self.user).total_time_spent, 100)
+        # No progress row for the second lesson, so its seconds are dropped
+        self.assertFalse(UserProgress.objects.filter(lesson=self.lessons[1]).exists())
+
+        stats = recorder.stats()
+        self.assertEqual(stats['buffered_entries'], 0)
+        self.assertGreaterEqual(stats['seconds_discarded'], 15)
+
+    def test_stats_are_staff_only(self):
+        self.assertEqual(self.client.get('/api/v1/progress/heartbeat/stats/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.beat(self.lessons[0])
+        response = self.client.get('/api/v1/progress/heartbeat/stats/')
+        self.assertEqual(response.data['buffered_entries'], 1)
+        self.assertIn('max_flush_ms', response.data)
+
+class ProgressAnalyticsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        recorder.buffer.drain()
+        self.user = User.objects.create_user(
+            email='analytics@norsklaer.com',
+            username='analyticsuser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.peer = User.objects.create_user(
+            email='peer@norsklaer.com',
+            username='peeruser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Lesson {i}', cefr_level='A1', lesson_type='vocabulary',
+                estimated_duration=10, content_json={}
+            )
+            for i in range(2)
+        ]
+
+    def tearDown(self):
+        recorder.buffer.drain()
+
+    def post(self, user, lesson, **data):
+        self.client.force_authenticate(user=user)
+        return self.client.post('/api/v1/progress/update/', {'lesson_id': lesson.id, **data})
+
+    def test_writes_roll_up_by_user_lesson_and_cohort(self):
+        # Cohort rows are added once each write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(self.user, self.lessons[0], status='in_progress', score=50, time_spent=60)
+            self.post(self.user, self.lessons[0], status='completed', score=90, time_spent=30)
+            self.post(self.user, self.lessons[1], status='completed', score=85, time_spent=10)
+            self.post(self.peer, self.lessons[0], status='completed', score=70, time_spent=100)
+
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/analytics/progress/?days=7')
+        self.assertEqual(len(response.data['series']), 7)
+        today = response.data['series'][-1]
+        self.assertEqual((today['attempts'], today['completions'], today['time_spent']), (3, 2, 100))
+        self.assertEqual(today['average_score'], 75.0)
+        self.assertEqual(response.data['score_distribution'], {
+            '0-19': 0, '20-39': 0, '40-59': 1, '60-79': 0, '80-100': 2
+        })
+        cohort = response.data['cohort']['series'][-1]
+        self.assertEqual(cohort['learners'], 2)
+        self.assertEqual(cohort['time_spent_per_learner'], 100.0)
+
+        lesson_day = DailyLessonProgress.objects.get(lesson=self.lessons[0])
+        self.assertEqual((lesson_day.attempts, lesson_day.completions), (3, 2))
+
+    def test_heartbeats_add_time_to_rollups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(self.user, self.lessons[0], status='in_progress', time_spent=10)
+            with self.settings(PROGRESS_HEARTBEAT_FLUSH_INTERVAL=3600):
+                self.client.post('/api/v1/progress/heartbeat/', {'lesson_id': self.lessons[0].id, 'seconds': 15})
+            recorder.flush()
+        self.assertEqual(DailyUserProgress.objects.get(user=self.user).time_spent, 25)
+        self.assertEqual(DailyCohortProgress.objects.get(cefr_level='A1').time_spent, 25)
+
+    def test_backfill_rebuilds_from_progress(self):
+        UserProgress.objects.create(user=self.user, lesson=self.lessons[0], status='completed',
+                                    score=95, attempts=4, time_spent=300, completed_at=timezone.now())
+        UserProgress.objects.create(user=self.peer, lesson=self.lessons[0], status='in_progress',
+                                    score=10, attempts=1, time_spent=20)
+        call_command('backfill_progress_rollups', stdout=io.StringIO())
+
+        lesson_day = DailyLessonProgress.objects.get(lesson=self.lessons[0])
+        self.assertEqual((lesson_day.attempts, lesson_day.time_spent, lesson_day.completions), (5, 320, 1))
+        self.assertEqual((lesson_day.scores_0_19, lesson_day.scores_80_100), (1, 1))
+        self.assertEqual(DailyCohortProgress.objects.get(cefr_level='A1').learners, 2)
+
+    def test_lesson_analytics_are_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        url = f'/api/v1/analytics/lessons/{self.lessons[0].id}/'
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.post(self.user, self.lessons[0], status='completed', score=80)
+        response = self.client.get(url + '?days=1')
+        self.assertEqual(response.data['totals']['completions'], 1)
+        self.assertEqual(self.client.get(url + '?days=999').status_code, 400)
+
+
+class ReviewScheduleTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='reviews@norsklaer.com',
+            username='reviewsuser',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Lesson {i}', cefr_level='A1', lesson_type='vocabulary',
+                estimated_duration=10, content_json={}
+            )
+            for i in range(3)
+        ]
+
+    def post(self, lesson, **data):
+        return self.client.post('/api/v1/progress/update/', {'lesson_id': lesson.id, **data})
+
+    def schedule(self, lesson):
+        return ReviewSchedule.objects.get(user=self.user, lesson=lesson)
+
+    def test_finishing_schedules_and_reviews_follow_sm2(self):
+        self.post(self.lessons[0], status='in_progress', score=40)
+        self.assertFalse(ReviewSchedule.objects.exists())
+
+        self.post(self.lessons[0], status='completed', score=80)
+        schedule = self.schedule(self.lessons[0])
+        self.assertEqual((schedule.interval_days, schedule.repetitions), (1, 1))
+        self.assertAlmostEqual((schedule.due_at - schedule.last_reviewed_at).total_seconds(), 86400)
+
+        self.post(self.lessons[0], status='completed', score=95)
+        schedule = self.schedule(self.lessons[0])
+        self.assertEqual((schedule.interval_days, schedule.repetitions), (6, 2))
+        ease = schedule.ease_factor
+
+        self.post(self.lessons[0], status='completed', score=10)
+        schedule = self.schedule(self.lessons[0])
+        self.assertEqual((schedule.interval_days, schedule.repetitions, schedule.lapses), (1, 0, 1))
+        self.assertLess(schedule.ease_factor, ease)
+
+    def test_unscored_writes_do_not_count_as_reviews(self):
+        self.post(self.lessons[0], status='completed', score=80)
+        before = self.schedule(self.lessons[0])
+        self.post(self.lessons[0], status='mastered')
+        after = self.schedule(self.lessons[0])
+        self.assertEqual((after.repetitions, after.last_reviewed_at), (before.repetitions, before.last_reviewed_at))
+
+    def test_queue_lists_due_reviews_in_one_query(self):
+        for lesson in self.lessons:
+            self.post(lesson, status='completed')
+        now = timezone.now()
+        ReviewSchedule.objects.filter(lesson=self.lessons[0]).update(due_at=now - timedelta(days=2))
+        ReviewSchedule.objects.filter(lesson=self.lessons[1]).update(due_at=now - timedelta(days=1))
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/progress/reviews/?limit=1')
+        self.assertEqual([item['lesson_id'] for item in response.data['results']], [self.lessons[0].id])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get('/api/v1/progress/reviews/')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_reschedule_applies_interval_modifier(self):
+        self.post(self.lessons[0], status='completed')
+        UserProgress.objects.create(user=self.user, lesson=self.lessons[1], status='mastered',
+                                    completed_at=timezone.now())
+        with self.settings(REVIEW_INTERVAL_MODIFIER=2.0):
+            call_command('reschedule_reviews', stdout=io.StringIO())
+        for lesson in self.lessons[:2]:
+            schedule = self.schedule(lesson)
+            self.assertAlmostEqual((schedule.due_at - schedule.last_reviewed_at).total_seconds(), 2 * 86400)
+
+class LessonRecommendationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='recommend@norsklaer.com',
+            username='recommenduser',
+            password='testpass123',
+            current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=self.user)
+
+        def lesson(title, level, difficulty, lesson_type='vocabulary', prerequisites=None):
+            return Lesson.objects.create(
+                title=title, cefr_level=level, lesson_type=lesson_type, difficulty_score=difficulty,
+                estimated_duration=15, content_json={}, prerequisites=prerequisites or []
+            )
+
+        self.basics = lesson('Basics', 'A1', 2)
+        self.family = lesson('Family', 'A2', 3, prerequisites=[self.basics.id])
+        self.verbs = lesson('Verbs', 'A2', 3, lesson_type='grammar')
+        self.hard = lesson('Hard', 'A2', 10)
+        self.locked = lesson('Advanced', 'B1', 3)
+
+    def get(self, **params):
+        return self.client.get('/api/v1/recommendations/', params)
+
+    def ids(self, response):
+        return [item['id'] for item in response.data['results']]
+
+    def test_ranks_gated_unfinished_candidates(self):
+        self.client.post('/api/v1/progress/update/', {
+            'lesson_id': self.basics.id, 'status': 'completed', 'score': 90
+        })
+        ids = self.ids(self.get())
+        self.assertNotIn(self.basics.id, ids)
+        self.assertNotIn(self.locked.id, ids)
+        self.assertEqual(ids[-1], self.hard.id)
+        family = next(item for item in self.get().data['results'] if item['id'] == self.family.id)
+        self.assertIn('prerequisites_met', family['reasons'])
+
+    def test_results_are_cached_until_progress_changes(self):
+        self.get()
+        with self.assertNumQueries(0):
+            self.get()
+
+        self.client.post('/api/v1/progress/update/', {'lesson_id': self.verbs.id, 'status': 'in_progress'})
+        results = self.get().data['results']
+        self.assertEqual(results[0]['id'], self.verbs.id)
+        self.assertIn('continue', results[0]['reasons'])
+
+    def test_pool_query_runs_once_per_catalog_version(self):
+        self.get()
+        other = User.objects.create_user(
+            email='other@norsklaer.com', username='otheruser', password='testpass123', current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=other)
+        # summary lookup and build (no progress yet), progress version, progress, recent activity,
+        # lesson details; the pool comes from cache
+        with self.assertNumQueries(6):
+            self.get()
+
+    def test_pool_is_topped_up_when_the_learner_finished_it(self):
+        # The two nearest lessons fill the pool; once both are finished the rest still come through
+        with mock.patch('norsklaer_backend.apps.progress.recommendations.CANDIDATE_POOL_SIZE', 2):
+            for lesson in (self.family, self.verbs):
+                self.client.post('/api/v1/progress/update/', {'lesson_id': lesson.id, 'status': 'completed'})
+            ids = self.ids(self.get())
+        self.assertEqual(set(ids), {self.basics.id, self.hard.id})
+
+class ProgressEventTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='events@norsklaer.com',
+            username='eventsuser',
+            password='testpass123',
+            current_cefr_level='A2'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Lesson {index}', cefr_level='A1', lesson_type='vocabulary',
+                estimated_duration=15, content_json={}
+            )
+            for index in range(2)
+        ]
+
+    def post(self, lesson, **data):
+        return self.client.post('/api/v1/progress/update/', {'lesson_id': lesson.id, **data})
+
+    def snapshot(self):
+        return {
+            (item.lesson_id, item.status, item.score, item.attempts, item.time_spent, item.completed_at)
+            for item in UserProgress.objects.filter(user=self.user)
+        }
+
+    def test_writes_append_events(self):
+        self.post(self.lessons[0], status='in_progress', time_spent=30)
+        self.client.post('/api/v1/progress/update/batch/', {'updates': [
+            {'lesson_id': self.lessons[0].id, 'status': 'completed', 'score': 80},
+            {'lesson_id': self.lessons[1].id, 'status': 'in_progress'},
+        ]}, format='json')
+        UserProgress.objects.get(user=self.user, lesson=self.lessons[1]).delete()
+
+        kinds = list(ProgressEvent.objects.filter(user_id=self.user.id).order_by('id').values_list('kind', flat=True))
+        self.assertEqual(kinds, ['update', 'update', 'update', 'delete'])
+
+        self.user.delete()
+        self.assertFalse(ProgressEvent.objects.exists())
+
+    def test_replay_rebuilds_progress_and_summary(self):
+        self.post(self.lessons[0], status='in_progress', score=40, time_spent=30)
+        self.post(self.lessons[0], status='completed', time_spent=45)
+        self.post(self.lessons[1], status='in_progress', time_spent=10)
+        progress = UserProgress.objects.get(user=self.user, lesson=self.lessons[1])
+        progress.score = 55
+        progress.save()
+        expected = self.snapshot()
+
+        UserProgress.objects.filter(user=self.user).update(attempts=0, time_spent=0, status='not_started')
+        self.assertEqual(replay([self.user.id]), 2)
+        self.assertEqual(self.snapshot(), expected)
+        summary = ProgressSummary.objects.get(user=self.user)
+        self.assertEqual(summary.completed_count, 1)
+        self.assertEqual(summary.total_time_spent, 85)
+
+    def test_compaction_keeps_replay_exact(self):
+        self.post(self.lessons[0], status='in_progress', score=40, time_spent=30)
+        self.post(self.lessons[1], status='completed', score=90, time_spent=20)
+        ProgressEvent.objects.update(occurred_at=timezone.now() - timedelta(days=70))
+        self.post(self.lessons[0], status='completed', time_spent=15)
+        expected = self.snapshot()
+
+        cutoff = timezone.now() - timedelta(days=35)
+        snapshots, _ = compact_before(cutoff)
+        self.assertEqual(snapshots, 2)
+        self.assertEqual(
+            sorted(ProgressEvent.objects.values_list('kind', flat=True)), ['snapshot', 'snapshot', 'update']
+        )
+
+        UserProgress.objects.filter(user=self.user).delete()
+        ProgressEvent.objects.filter(kind='delete').delete()
+        replay([self.user.id])
+        self.assertEqual(self.snapshot(), expected)
+
+class LeaderboardTest(APITestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f'board{index}@norsklaer.com', username=f'board{index}',
+                password='testpass123', current_cefr_level='A1'
+            )
+            for index in range(4)
+        ]
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Lesson {index}', cefr_level='A1', lesson_type='vocabulary',
+                estimated_duration=15, content_json={}
+            )
+            for index in range(2)
+        ]
+
+    def finish(self, user, lesson, score):
+        self.client.force_authenticate(user=user)
+        self.client.post('/api/v1/progress/update/', {'lesson_id': lesson.id, 'status': 'completed', 'score': score})
+
+    def get(self, user, **params):
+        self.client.force_authenticate(user=user)
+        return self.client.get('/api/v1/leaderboards/', params)
+
+    def test_ranks_share_ties_and_report_percentile(self):
+        self.finish(self.users[0], self.lessons[0], 90)
+        self.finish(self.users[0], self.lessons[1], 50)
+        self.finish(self.users[1], self.lessons[0], 80)
+        self.finish(self.users[2], self.lessons[0], 80)
+
+        response = self.get(self.users[2], period='all')
+        self.assertEqual(
+            [(item['rank'], item['username'], item['points']) for item in response.data['results']],
+            [(1, 'board0', 340), (2, 'board1', 180), (2, 'board2', 180)],
+        )
+        self.assertEqual(response.data['me'], {'rank': 2, 'points': 180, 'learners': 3, 'percentile': 33.3})
+        self.assertIsNone(self.get(self.users[3]).data['me'])
+
+    def test_cohorts_follow_level_changes(self):
+        self.finish(self.users[0], self.lessons[0], 70)
+        self.users[0].current_cefr_level = 'A2'
+        self.users[0].save()
+
+        self.assertEqual(self.get(self.users[1]).data['results'], [])
+        response = self.get(self.users[0])
+        self.assertEqual(response.data['cefr_level'], 'A2')
+        self.assertEqual(response.data['me']['rank'], 1)
+        self.assertEqual(
+            dict(LeaderboardCohort.objects.filter(period='all').values_list('cefr_level', 'learners')),
+            {'A1': 0, 'A2': 1},
+        )
+
+    def test_weekly_windows_reset_and_rebuild_matches(self):
+        self.finish(self.users[0], self.lessons[0], 60)
+        LeaderboardEntry.objects.filter(period='week').update(window_start=timezone.now().date() - timedelta(days=7))
+        self.assertEqual(self.get(self.users[0]).data['results'], [])
+        self.assertEqual(self.get(self.users[0], period='all').data['me']['points'], 160)
+
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardCohort.objects.all().delete()
+        rebuild_leaderboards()
+        self.assertEqual(self.get(self.users[0]).data['me']['learners'], 1)
+        self.assertEqual(self.get(self.users[0]).data['me']['points'], 160)
+        self.assertEqual(self.get(self.users[0], period='all').data['me']['points'], 160)
+
+    def test_rejects_unknown_period(self):
+        self.assertEqual(self.get(self.users[0], period='month').status_code, 400)
+
+class ProgressExportTest(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='staff@norsklaer.com', username='staffuser', password='testpass123', is_staff=True
+        )
+        self.learners = [
+            User.objects.create_user(
+                email=f'export{index}@norsklaer.com', username=f'export{index}',
+                password='testpass123', current_cefr_level=level
+            )
+            for index, level in enumerate(['A1', 'A2'])
+        ]
+        lesson = Lesson.objects.create(
+            title='Hilsener, «hei»', cefr_level='A1', lesson_type='vocabulary',
+            estimated_duration=15, content_json={}
+        )
+        for learner in self.learners:
+            UserProgress.objects.create(user=learner, lesson=lesson, status='completed', score=80)
+
+    def export(self, **params):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get('/api/v1/progress/export/', params)
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_streams_csv_for_staff_only(self):
+        self.client.force_authenticate(user=self.learners[0])
+        self.assertEqual(self.client.get('/api/v1/progress/export/').status_code, 403)
+
+        response, body = self.export(cohort='A2')
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="user-progress-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([row['username'] for row in rows], ['export1'])
+        self.assertEqual(rows[0]['lesson_title'], 'Hilsener, «hei»')
+
+    def test_csv_cells_cannot_start_formulas(self):
+        User.objects.filter(pk=self.learners[1].pk).update(username='=HYPERLINK("http://x")')
+        _, body = self.export(cohort='A2')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(rows[0]['username'], '\'=HYPERLINK("http://x")')
+        # NDJSON keeps the raw value
+        _, body = self.export(output='ndjson', cohort='A2')
+        self.assertEqual(json.loads(body)['username'], '=HYPERLINK("http://x")')
+
+    def test_ndjson_can_be_gzipped(self):
+        response, body = self.export(output='ndjson', gzip='1', level='A1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['status'], 'completed')
+
+    def test_rejects_bad_filters(self):
+        self.assertEqual(self.export(output='xml')[0].status_code, 400)
+        self.assertEqual(self.export(since='yesterday')[0].status_code, 400)
+
+    def test_command_writes_the_same_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'progress.csv.gz')
+            call_command('export_progress', output=path, gzip=True, fetch_size=1, stdout=io.StringIO())
+            with gzip.open(path, 'rt') as stream:
+                rows = list(csv.DictReader(stream))
+        self.assertEqual(sorted(row['cohort'] for row in rows), ['A1', 'A2'])
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Single-statement progress writes
+The insert-or-update and counter increments happen in one
+INSERT ... ON CONFLICT DO UPDATE, so concurrent posts for the same lesson
+cannot lose attempts or time_spent. A single update also folds the CEFR gate
+into the statement. Both paths update the user's ProgressSummary, the daily
+rollups, the leaderboards and the review schedule, and append to the event
+log, in the same transaction.
+"""
+from django.db import transaction
+from django.utils import timezone
+from .cache import bump_progress_version
+from .events import append, update_event
+from .models import UserProgress
+from .leaderboards import award_points
+from .rollups import activity_delta, combine, record_activity
+from .scheduler import record_reviews
+from .summary import lock_summary, previous_states
+
+COLUMNS = '(user_id, lesson_id, status, score, attempts, time_spent, completed_at, created_at, updated_at)'
+
+ON_CONFLICT_SQL = """
+    ON CONFLICT (user_id, lesson_id) DO UPDATE SET
+        status = excluded.status,
+        score = COALESCE(excluded.score, user_progress.score),
+        attempts = user_progress.attempts + excluded.attempts,
+        time_spent = user_progress.time_spent + excluded.time_spent,
+        completed_at = COALESCE(excluded.completed_at, user_progress.completed_at),
+        updated_at = excluded.updated_at
+    RETURNING id, user_id, lesson_id, status, score, attempts, time_spent, completed_at, created_at, updated_at
+"""
+
+UPSERT_SQL = f"""
+    INSERT INTO user_progress {COLUMNS}
+    SELECT %s, id, %s, %s, 1, %s, CASE WHEN %s = 'completed' THEN %s END, %s, %s
+    FROM lessons
+    WHERE id = %s AND cefr_rank <= %s
+    {ON_CONFLICT_SQL}
+"""
+
+# Rows per multi-row statement; 9 parameters each stays under SQLite's 999 limit
+BATCH_CHUNK_SIZE = 100
+ROW_PLACEHOLDERS = '(%s, %s, %s, %s, %s, %s, %s, %s, %s)'
+
+def record_progress(user, lesson_id, status, score=None, time_spent=0):
+    """
+    Record one attempt and return the updated UserProgress, or None when the
+    lesson does not exist or is above the user's level
+    """
+    now = timezone.now()
+    params = [user.id, status, score, time_spent, status, now, now, now, lesson_id, user.cefr_rank]
+    with transaction.atomic():
+        summary = lock_summary(user.id)
+        states = previous_states(user.id, [lesson_id])
+        if lesson_id not in states:
+            return None
+        # raw() adapts the parameters and converts the RETURNING row like a normal query
+        rows = list(UserProgress.objects.raw(UPSERT_SQL, params))
+        if not rows:
+            return None
+        cefr_level, before = states[lesson_id]
+        after = rows[0].summary_state()
+        summary.apply_change(cefr_level, before, after)
+        scores = [score] if score is not None else []
+        delta = activity_delta(before, after, time_spent=time_spent, scores=scores)
+        record_activity(user.id, user.current_cefr_level, summary, {lesson_id: delta})
+        award_points(user.id, user.current_cefr_level, delta, now)
+        record_reviews(user.id, {lesson_id: (status, score)}, now)
+        summary.save()
+        append([update_event(user.id, lesson_id, status, score, 1, time_spent, now)])
+    # Bypasses save(), so invalidate the way the post_save signal would
+    bump_progress_version(user.id)
+    return rows[0]
+
+def merge_updates(updates):
+    """
+    Collapse updates for the same lesson into one row, applied in order, since
+    ON CONFLICT cannot touch the same row twice in one statement
+    """
+    merged = {}
+    for update in updates:
+        row = merged.get(update['lesson_id'])
+        if row is None:
+            row = merged[update['lesson_id']] = {
+                'status': None, 'score': None, 'scores': [], 'attempts': 0, 'time_spent': 0,
+                'completed': False,
+            }
+        row['status'] = update['status']
+        if update.get('score') is not None:
+            row['score'] = update['score']
+            row['scores'].append(update['score'])
+        row['attempts'] += 1
+        row['time_spent'] += update.get('time_spent', 0)
+        row['completed'] = row['completed'] or update['status'] == 'completed'
+    return merged
+
+def record_progress_batch(user, updates):
+    """
+    Apply already-authorized updates in one transaction with multi-row upserts;
+    returns {lesson_id: UserProgress}
+    """
+    now = timezone.now()
+    rows = list(merge_updates(updates).items())
+    progress = {}
+    if not rows:
+        return progress
+    with transaction.atomic():
+        summary = lock_summary(user.id)
+        states = previous_states(user.id, [lesson_id for lesson_id, _ in rows])
+        for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+            chunk = rows[start:start + BATCH_CHUNK_SIZE]
+            params = []
+            for lesson_id, row in chunk:
+                params.extend([
+                    user.id, lesson_id, row['status'], row['score'], row['attempts'], row['time_spent'],
+                    now if row['completed'] else None, now, now,
+                ])
+            values = ', '.join([ROW_PLACEHOLDERS] * len(chunk))
+            sql = f'INSERT INTO user_progress {COLUMNS} VALUES {values} {ON_CONFLICT_SQL}'
+            for item in UserProgress.objects.raw(sql, params):
+                progress[item.lesson_id] = item
+        merged = dict(rows)
+        deltas = {}
+        for lesson_id, item in progress.items():
+            cefr_level, before = states[lesson_id]
+            after = item.summary_state()
+            summary.apply_change(cefr_level, before, after)
+            row = merged[lesson_id]
+            deltas[lesson_id] = activity_delta(
+                before, after, attempts=row['attempts'], time_spent=row['time_spent'], scores=row['scores']
+            )
+        record_activity(user.id, user.current_cefr_level, summary, deltas)
+        award_points(user.id, user.current_cefr_level, combine(deltas.values()), now)
+        record_reviews(user.id, {
+            lesson_id: (merged[lesson_id]['status'], merged[lesson_id]['score']) for lesson_id in progress
+        }, now)
+        summary.save()
+        # One event per accepted update, not per merged row, so replay sees each attempt
+        append([
+            update_event(user.id, update['lesson_id'], update['status'], update.get('score'), 1,
+                         update.get('time_spent', 0), now)
+            for update in updates if update['lesson_id'] in progress
+        ])
+    bump_progress_version(user.id)
+    return progress
\ No newline at end of file
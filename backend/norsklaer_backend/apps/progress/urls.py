@@ -1,7 +1,16 @@
 from django.urls import path
-from .views import ProgressUpdateView, UserProgressListView
+from .views import (
+    ProgressUpdateView, ProgressBatchUpdateView, UserProgressListView, SeenVocabularyView,
+    HeartbeatView, HeartbeatStatsView, ReviewQueueView, ProgressExportView,
+)
 
 urlpatterns = [
     path('', UserProgressListView.as_view(), name='progress_list'),
     path('update/', ProgressUpdateView.as_view(), name='progress_update'),
+    path('update/batch/', ProgressBatchUpdateView.as_view(), name='progress_batch_update'),
+    path('heartbeat/', HeartbeatView.as_view(), name='progress_heartbeat'),
+    path('heartbeat/stats/', HeartbeatStatsView.as_view(), name='progress_heartbeat_stats'),
+    path('reviews/', ReviewQueueView.as_view(), name='review_queue'),
+    path('vocabulary/', SeenVocabularyView.as_view(), name='seen_vocabulary'),
+    path('export/', ProgressExportView.as_view(), name='progress_export'),
 ]
\ No newline at end of file
@@ -1,10 +1,31 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from datetime import timedelta
+from django.db.models import Max
 from .models import UserProgress
-from .serializers import ProgressUpdateSerializer, UserProgressSerializer
-from norsklaer_backend.apps.lessons.models import Lesson
+from .export import PROGRESS_EXPORT_COLUMNS, ProgressExportFilter, export_queryset
+from .heartbeats import recorder
+from .models import DailyCohortProgress, DailyLessonProgress, DailyUserProgress, ReviewSchedule
+from .leaderboards import PERIODS, current_windows, standing, top_entries
+from .recommendations import get_recommendations
+from .rollups import cohort_series, daily_series, day_range
+from .serializers import (
+    HeartbeatSerializer, ProgressBatchSerializer, ProgressUpdateSerializer, ReviewScheduleSerializer,
+    UserProgressSerializer,
+    lesson_access_error, lesson_access_errors,
+)
+from .upsert import record_progress, record_progress_batch
+from .cache import get_progress_version, progress_modified_at
+from .summary import summary_payload
+from norsklaer_backend.apps.lessons.cache import get_catalog_version
+from norsklaer_backend.apps.lessons.models import Lesson, VocabularyItem
+from norsklaer_backend.conditional import ConditionalGetMixin
+from norsklaer_backend.export import StreamingExportView
+from norsklaer_backend.pagination import KeysetPagination
 
 class ProgressUpdateView(generics.CreateAPIView):
     serializer_class = ProgressUpdateSerializer
@@ -15,25 +36,15 @@ class ProgressUpdateView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         
         lesson_id = serializer.validated_data['lesson_id']
-        lesson = Lesson.objects.get(id=lesson_id)
-        
-        # Get or create progress record
-        progress, created = UserProgress.objects.get_or_create(
-            user=request.user,
-            lesson=lesson,
-            defaults={'status': 'not_started'}
+        progress = record_progress(
+            request.user,
+            lesson_id,
+            serializer.validated_data['status'],
+            score=serializer.validated_data.get('score'),
+            time_spent=serializer.validated_data.get('time_spent', 0),
         )
-        
-        # Update progress
-        progress.status = serializer.validated_data['status']
-        progress.score = serializer.validated_data.get('score', progress.score)
-        progress.time_spent += serializer.validated_data.get('time_spent', 0)
-        progress.attempts += 1
-        
-        if progress.status == 'completed':
-            progress.completed_at = timezone.now()
-        
-        progress.save()
+        if progress is None:
+            raise ValidationError({'lesson_id': [lesson_access_error(lesson_id)]})
         
         return Response({
             'message': 'Progress updated successfully',
@@ -43,28 +54,249 @@ class ProgressUpdateView(generics.CreateAPIView):
             'attempts': progress.attempts
         }, status=status.HTTP_201_CREATED)
 
-class UserProgressListView(generics.ListAPIView):
+class ProgressBatchUpdateView(generics.GenericAPIView):
+    """Apply many progress updates at once, reporting success or errors per item"""
+    serializer_class = ProgressBatchSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updates = serializer.validated_data['updates']
+        
+        results = [None] * len(updates)
+        valid = []
+        for index, update in enumerate(updates):
+            item = ProgressUpdateSerializer(data=update, context=self.get_serializer_context())
+            if item.is_valid():
+                valid.append((index, item.validated_data))
+            else:
+                results[index] = {'index': index, 'success': False, 'errors': item.errors}
+        
+        errors = lesson_access_errors(request.user, [data['lesson_id'] for _, data in valid])
+        accepted = []
+        for index, data in valid:
+            if data['lesson_id'] in errors:
+                results[index] = {'index': index, 'success': False,
+                                  'errors': {'lesson_id': [errors[data['lesson_id']]]}}
+            else:
+                accepted.append((index, data))
+        
+        progress = record_progress_batch(request.user, [data for _, data in accepted])
+        for index, data in accepted:
+            row = progress[data['lesson_id']]
+            results[index] = {
+                'index': index,
+                'success': True,
+                'lesson_id': row.lesson_id,
+                'status': row.status,
+                'score': row.score,
+                'attempts': row.attempts
+            }
+        
+        return Response({
+            'updated': len(accepted),
+            'failed': len(updates) - len(accepted),
+            'results': results
+        })
+
+class HeartbeatView(generics.GenericAPIView):
+    """
+    Time-on-lesson reports; buffered in memory and written in batches, so this
+    never touches the database. Seconds for lessons without progress are dropped.
+    """
+    serializer_class = HeartbeatSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recorder.record(request.user.id, serializer.validated_data['lesson_id'],
+                        serializer.validated_data['seconds'])
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+class HeartbeatStatsView(generics.GenericAPIView):
+    """Buffer depth and flush latency for the worker serving the request"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(recorder.stats())
+
+class ProgressExportView(StreamingExportView):
+    """Every learner's progress rows as CSV or NDJSON, for staff reporting"""
+    filterset_class = ProgressExportFilter
+    columns = PROGRESS_EXPORT_COLUMNS
+    export_name = 'user-progress'
+    
+    def get_queryset(self):
+        return export_queryset()
+
+class UserProgressListView(ConditionalGetMixin, generics.ListAPIView):
     serializer_class = UserProgressSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        return UserProgress.objects.filter(user=self.request.user).select_related('lesson')
+        return (UserProgress.objects.filter(user=self.request.user)
+                .select_related('lesson').order_by('-updated_at', '-id'))
+    
+    def get_validators(self, request, *args, **kwargs):
+        # Lesson titles and levels are part of the payload, so lesson edits count too
+        stats = UserProgress.objects.filter(user=request.user).aggregate(
+            last_updated=Max('updated_at'), lesson_last_updated=Max('lesson__updated_at')
+        )
+        last_modified = max(filter(None, [
+            stats['last_updated'], stats['lesson_last_updated'], progress_modified_at(request.user.id)
+        ]))
+        etag_parts = (
+            'progress', request.user.id, request.user.current_cefr_level,
+            stats['last_updated'], stats['lesson_last_updated'], get_progress_version(request.user.id),
+            get_catalog_version(),
+        )
+        return etag_parts, last_modified
     
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
         
-        # Calculate overall progress statistics
-        total_lessons = queryset.count()
-        completed_lessons = queryset.filter(status='completed').count()
-        completion_percentage = (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
+        return Response({
+            'overall_progress': summary_payload(request.user),
+            'progress_details': serializer.data,
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link()
+        })
+
+class SeenVocabularyView(generics.GenericAPIView):
+    """Distinct vocabulary from every lesson the user has started, in one indexed join"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        seen_lessons = UserProgress.objects.filter(user=request.user).exclude(
+            status='not_started'
+        ).values('lesson_id')
+        words = list(
+            VocabularyItem.objects.filter(lesson_id__in=seen_lessons)
+            .values('norwegian_normalized', 'norwegian', 'english')
+            .distinct().order_by('norwegian_normalized', 'english')
+        )
+        return Response({
+            'total_words': len({word['norwegian_normalized'] for word in words}),
+            'words': [{'norwegian': word['norwegian'], 'english': word['english']} for word in words]
+        })
+
+class ReviewQueueView(generics.GenericAPIView):
+    """
+    Lessons due for review by the end of today, most overdue first; one range
+    scan on (user, due_at)
+    """
+    serializer_class = ReviewScheduleSerializer
+    permission_classes = [IsAuthenticated]
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+    
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': ['Must be an integer']})
+        limit = max(1, min(limit, self.MAX_LIMIT))
         
+        end_of_day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        due = list(
+            ReviewSchedule.objects.filter(user=request.user, due_at__lt=end_of_day)
+            .select_related('lesson').order_by('due_at')[:limit + 1]
+        )
+        return Response({
+            'due_before': end_of_day,
+            'has_more': len(due) > limit,
+            'results': self.get_serializer(due[:limit], many=True).data
+        })
+
+class LessonRecommendationView(generics.GenericAPIView):
+    """Next lessons for the user, re-ranked from a cached candidate pool"""
+    permission_classes = [IsAuthenticated]
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 20
+    
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': ['Must be an integer']})
+        limit = max(1, min(limit, self.MAX_LIMIT))
+        return Response(get_recommendations(request.user, limit))
+
+class LeaderboardView(generics.GenericAPIView):
+    """Top learners in the user's CEFR cohort plus the user's own rank"""
+    permission_classes = [IsAuthenticated]
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 100
+    
+    def get(self, request):
+        period = request.query_params.get('period', 'week')
+        if period not in PERIODS:
+            raise ValidationError({'period': [f"Must be one of: {', '.join(PERIODS)}"]})
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': ['Must be an integer']})
+        limit = max(1, min(limit, self.MAX_LIMIT))
+        
+        start = current_windows()[period]
+        level = request.user.current_cefr_level
+        return Response({
+            'period': period,
+            'cefr_level': level,
+            'window_start': start if period == 'week' else None,
+            'results': top_entries(period, level, limit, start),
+            'me': standing(request.user, period, start),
+        })
+
+class AnalyticsRangeMixin:
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 365
+    
+    def get_days(self):
+        try:
+            days = int(self.request.query_params.get('days', self.DEFAULT_DAYS))
+        except ValueError:
+            raise ValidationError({'days': ['Must be an integer']})
+        if not 1 <= days <= self.MAX_DAYS:
+            raise ValidationError({'days': [f'Must be between 1 and {self.MAX_DAYS}']})
+        return day_range(days)
+
+class ProgressAnalyticsView(AnalyticsRangeMixin, generics.GenericAPIView):
+    """
+    The user's daily activity and their CEFR cohort's per-learner averages,
+    read from the daily rollups in two queries whatever the history size
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        days = self.get_days()
+        level = request.user.current_cefr_level
+        user_rows = DailyUserProgress.objects.filter(user=request.user, day__gte=days[0], day__lte=days[-1])
+        cohort_rows = DailyCohortProgress.objects.filter(cefr_level=level, day__gte=days[0], day__lte=days[-1])
+        return Response({
+            'start': days[0],
+            'end': days[-1],
+            **daily_series(user_rows, days),
+            'cohort': {'cefr_level': level, 'series': cohort_series(cohort_rows, days)},
+        })
+
+class LessonAnalyticsView(AnalyticsRangeMixin, generics.GenericAPIView):
+    """Daily activity on one lesson across all learners, for staff"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, pk):
+        days = self.get_days()
+        lesson = get_object_or_404(Lesson.objects.only('id', 'title', 'cefr_level'), pk=pk)
+        rows = DailyLessonProgress.objects.filter(lesson_id=pk, day__gte=days[0], day__lte=days[-1])
         return Response({
-            'overall_progress': {
-                'current_level': request.user.current_cefr_level,
-                'completion_percentage': round(completion_percentage, 1),
-                'lessons_completed': completed_lessons,
-                'total_lessons': total_lessons
-            },
-            'progress_details': serializer.data
+            'lesson_id': lesson.id,
+            'lesson_title': lesson.title,
+            'cefr_level': lesson.cefr_level,
+            'start': days[0],
+            'end': days[-1],
+            **daily_series(rows, days),
         })
\ No newline at end of file
@@ -1,8 +1,21 @@
 from django.contrib import admin
-from .models import SpeechAttempt
+from .models import SpeechAttempt, SpeechJob, SpeechResult
 
 @admin.register(SpeechAttempt)
 class SpeechAttemptAdmin(admin.ModelAdmin):
     list_display = ('user', 'quiz', 'accuracy_score', 'created_at')
     list_filter = ('quiz__question_type', 'accuracy_score')
-    search_fields = ('user__email', 'transcribed_text', 'expected_text')
\ No newline at end of file
+    search_fields = ('user__email', 'transcribed_text', 'expected_text')
+
+@admin.register(SpeechJob)
+class SpeechJobAdmin(admin.ModelAdmin):
+    list_display = ('attempt', 'status', 'tries', 'worker', 'cache_hit', 'created_at', 'finished_at')
+    list_filter = ('status', 'cache_hit')
+    readonly_fields = ('created_at',)
+
+@admin.register(SpeechResult)
+class SpeechResultAdmin(admin.ModelAdmin):
+    list_display = ('audio_sha256', 'model_version', 'accuracy_score', 'hits', 'last_used_at')
+    list_filter = ('model_version',)
+    search_fields = ('audio_sha256',)
+    readonly_fields = ('created_at',)
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""
+Transcription and pronunciation scoring for speech attempts
+Runs inside the speech workers, never in a request. A worker's batch of
+attempts goes to the configured recognizer (backends.py) in one call and
+is then scored in one call (scoring.py).
+"""
+from .backends import get_backend
+from .scoring import score_batch
+
+def analyse_batch(attempts, backend=None):
+    """
+    [(fields to store on the attempt, None) or (None, error)] for each
+    attempt; one attempt failing does not fail the others
+    """
+    backend = backend or get_backend()
+    try:
+        transcripts = backend.transcribe_batch([(attempt.audio_file_path, attempt.expected_text)
+                                                for attempt in attempts])
+    except Exception as e:
+        # A failed backend call fails every clip in it; each job is retried
+        return [(None, e)] * len(attempts)
+    outcomes = [None] * len(attempts)
+    transcribed = []
+    for index, text in enumerate(transcripts):
+        if isinstance(text, Exception):
+            outcomes[index] = (None, text)
+        else:
+            transcribed.append((index, text))
+    scores = score_batch([(attempts[index].expected_text, text) for index, text in transcribed])
+    for (index, text), (accuracy, feedback) in zip(transcribed, scores):
+        outcomes[index] = ({'transcribed_text': text, 'accuracy_score': accuracy, 'feedback_json': feedback}, None)
+    return outcomes
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Content-addressed storage for speech recordings
+A recording is saved once under its SHA-256, so identical bytes (a clip
+submitted again, an upload retried by the frontend) share one file and one
+digest, which also keys the result cache. The name carries no extension:
+the same bytes uploaded as take.webm and take.WEBM (or with no name) must
+map to one file, and decoders probe the content rather than trust a suffix.
+Files are never deleted along with an attempt, since other attempts may
+point at the same file.
+"""
+import hashlib
+from django.core.files.storage import default_storage
+
+AUDIO_PREFIX = 'speech/audio'
+
+def audio_name(digest):
+    return f'{AUDIO_PREFIX}/{digest[:2]}/{digest}'
+
+def file_digest(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def save_audio(name, content):
+    """Save content as name unless those bytes are already stored there; returns name"""
+    if default_storage.exists(name):
+        return name
+    stored = default_storage.save(name, content)
+    if stored != name:
+        # Another request saved the same bytes first; keep its copy
+        default_storage.delete(stored)
+    return name
+
+def store_audio(uploaded):
+    """Store an uploaded recording by content; returns (name, digest)"""
+    digest = file_digest(uploaded)
+    return save_audio(audio_name(digest), uploaded), digest
\ No newline at end of file
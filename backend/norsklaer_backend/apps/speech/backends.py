@@ -0,0 +1,184 @@
+"""
+Speech recognition backends
+A backend transcribes a whole batch of recordings in one call, so a model
+pays its per-call overhead once per batch the worker collects rather than
+once per clip. SPEECH_ASR_BACKEND selects the class:
+- FakeBackend echoes the expected text once the audio is readable; it is
+  deterministic and needs no model, for development and tests
+- CPUModelBackend runs Whisper on the CPU through faster-whisper (an
+  optional package), loaded on first use in each worker process
+- RemoteBackend posts the batch to an HTTP recognition service, in as
+  many requests as its size budget needs
+A backend's version is part of the result cache key (cache.py), so
+switching backends or models never serves another model's transcripts.
+"""
+import base64
+import json
+import urllib.request
+from functools import lru_cache
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.utils.module_loading import import_string
+
+# JSON keys and punctuation around each clip in a RemoteBackend request body
+CLIP_OVERHEAD_BYTES = 40
+
+class BackendError(Exception):
+    pass
+
+class TranscriptionBackend:
+    version = ''
+    
+    def transcribe_batch(self, clips):
+        """
+        Transcript, or the exception for that clip, for each
+        (audio_path, expected_text) in clips, in order. Raising fails the
+        whole batch.
+        """
+        raise NotImplementedError
+    
+    def read_audio(self, audio_path):
+        with default_storage.open(audio_path, 'rb') as file:
+            return file.read()
+
+class FakeBackend(TranscriptionBackend):
+    version = 'fake-1'
+    
+    def transcribe_batch(self, clips):
+        return [
+            expected_text if default_storage.exists(audio_path)
+            else FileNotFoundError(f'Audio file {audio_path} is missing')
+            for audio_path, expected_text in clips
+        ]
+
+class CPUModelBackend(TranscriptionBackend):
+    """
+    Clips that fit the model's 30-second window are padded to it and decoded
+    together in one generate() call; longer clips are transcribed one by one
+    """
+    
+    def __init__(self):
+        self.model = None
+        self.tokenizer = None
+    
+    @property
+    def version(self):
+        return f'faster-whisper:{settings.SPEECH_ASR_MODEL}:{settings.SPEECH_ASR_COMPUTE_TYPE}'
+    
+    def load(self):
+        if self.model is None:
+            try:
+                from faster_whisper import WhisperModel
+                from faster_whisper.tokenizer import Tokenizer
+            except ImportError:
+                raise ImproperlyConfigured('CPUModelBackend needs the faster-whisper package')
+            self.model = WhisperModel(
+                settings.SPEECH_ASR_MODEL, device='cpu', compute_type=settings.SPEECH_ASR_COMPUTE_TYPE,
+                cpu_threads=settings.SPEECH_ASR_CPU_THREADS,
+            )
+            self.tokenizer = Tokenizer(self.model.hf_tokenizer, self.model.model.is_multilingual,
+                                       task='transcribe', language=settings.SPEECH_ASR_LANGUAGE)
+        return self.model
+    
+    def transcribe_long(self, audio_path):
+        with default_storage.open(audio_path, 'rb') as file:
+            segments, _ = self.model.transcribe(file, language=settings.SPEECH_ASR_LANGUAGE, beam_size=1)
+            return ' '.join(segment.text.strip() for segment in segments)
+    
+    def transcribe_batch(self, clips):
+        model = self.load()
+        import ctranslate2
+        from faster_whisper.audio import decode_audio
+        extractor = model.feature_extractor
+        results = [None] * len(clips)
+        windows = []
+        for index, (audio_path, _) in enumerate(clips):
+            try:
+                with default_storage.open(audio_path, 'rb') as file:
+                    audio = decode_audio(file, sampling_rate=extractor.sampling_rate)
+                if len(audio) > extractor.n_samples:
+                    results[index] = self.transcribe_long(audio_path)
+                    continue
+                features = extractor(audio, padding=0)[:, :extractor.nb_max_frames]
+                windows.append((index, np.pad(features, ((0, 0), (0, extractor.nb_max_frames - features.shape[1])))))
+            except Exception as e:
+                results[index] = e
+        if windows:
+            mel = ctranslate2.StorageView.from_array(
+                np.ascontiguousarray(np.stack([features for _, features in windows]), dtype=np.float32)
+            )
+            prompt = [*self.tokenizer.sot_sequence, self.tokenizer.no_timestamps]
+            generated = model.model.generate(mel, [prompt] * len(windows), beam_size=1, suppress_blank=True)
+            for (index, _), output in zip(windows, generated):
+                results[index] = self.tokenizer.decode(output.sequences_ids[0]).strip()
+        return results
+
+class RemoteBackend(TranscriptionBackend):
+    """
+    POSTs {"model", "language", "clips": [{"audio" (base64), "expected_text"}]}
+    as JSON to SPEECH_ASR_URL, which answers {"results": [{"text"} or
+    {"error"}]} in the same order. A batch is split into as few requests as
+    keep each body under SPEECH_ASR_MAX_REQUEST_BYTES, so only one request's
+    clips are held in memory; a clip larger than that is sent on its own.
+    """
+    
+    @property
+    def version(self):
+        # Read per call so settings overrides apply to the shared instance
+        return f'remote:{settings.SPEECH_ASR_MODEL}'
+    
+    def post(self, payload):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if settings.SPEECH_ASR_TOKEN:
+            headers['Authorization'] = f'Bearer {settings.SPEECH_ASR_TOKEN}'
+        request = urllib.request.Request(settings.SPEECH_ASR_URL, data=json.dumps(payload).encode(),
+                                         headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=settings.SPEECH_ASR_TIMEOUT) as response:
+            return json.load(response)
+    
+    def requests(self, clips, results):
+        """Yield (clip indexes, clip payloads) per request; clips that cannot be read get their error in results"""
+        sent, payload, size = [], [], 0
+        for index, (audio_path, expected_text) in enumerate(clips):
+            try:
+                audio = self.read_audio(audio_path)
+            except Exception as e:
+                results[index] = e
+                continue
+            clip = {'audio': base64.b64encode(audio).decode('ascii'), 'expected_text': expected_text}
+            clip_size = len(clip['audio']) + len(json.dumps(expected_text)) + CLIP_OVERHEAD_BYTES
+            if payload and size + clip_size > settings.SPEECH_ASR_MAX_REQUEST_BYTES:
+                yield sent, payload
+                sent, payload, size = [], [], 0
+            sent.append(index)
+            payload.append(clip)
+            size += clip_size
+        if payload:
+            yield sent, payload
+    
+    def transcribe_batch(self, clips):
+        if not settings.SPEECH_ASR_URL:
+            raise ImproperlyConfigured('RemoteBackend needs SPEECH_ASR_URL')
+        results = [None] * len(clips)
+        for sent, payload in self.requests(clips, results):
+            answers = self.post({
+                'model': settings.SPEECH_ASR_MODEL, 'language': settings.SPEECH_ASR_LANGUAGE, 'clips': payload,
+            }).get('results')
+            if not isinstance(answers, list) or len(answers) != len(sent):
+                raise BackendError('Recognition service returned a result count that does not match the batch')
+            for index, answer in zip(sent, answers):
+                if isinstance(answer, dict) and isinstance(answer.get('text'), str):
+                    results[index] = answer['text']
+                else:
+                    error = answer.get('error') if isinstance(answer, dict) else None
+                    results[index] = BackendError(error or 'Recognition service returned no transcript')
+        return results
+
+@lru_cache(maxsize=None)
+def load_backend(path):
+    return import_string(path)()
+
+def get_backend():
+    return load_backend(settings.SPEECH_ASR_BACKEND)
\ No newline at end of file
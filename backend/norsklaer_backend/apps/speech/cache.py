@@ -0,0 +1,82 @@
+"""
+Cache of speech analysis results
+A result is keyed by the model version, the recording's SHA-256 and the
+expected text, so a resubmitted clip is scored without running the
+recognizer again while still getting its own SpeechAttempt. A new
+recognizer version (backends.py) or scoring.SCORING_VERSION retires old
+entries, which then age out. The table holds at most SPEECH_RESULT_CACHE_MAX_ENTRIES rows,
+evicting the least recently used; 0 turns the cache off. Eviction counts the
+table, so each process runs it on its first store and then once every
+SPEECH_RESULT_CACHE_EVICT_EVERY stored results, letting the table overshoot
+the bound by up to that many rows per process in between.
+"""
+import hashlib
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from .backends import get_backend
+from .models import SpeechResult
+from .scoring import SCORING_VERSION
+
+RESULT_FIELDS = ('transcribed_text', 'accuracy_score', 'feedback_json')
+
+# Results this process stored since it last evicted; None until its first eviction
+_stored_since_evict = None
+
+def enabled():
+    return settings.SPEECH_RESULT_CACHE_MAX_ENTRIES > 0
+
+def model_version():
+    return f'{get_backend().version}+scoring-{SCORING_VERSION}'
+
+def result_key(attempt):
+    """Cache key for an attempt, or None when its audio digest is unknown"""
+    if not attempt.audio_sha256:
+        return None
+    parts = (model_version(), attempt.audio_sha256, attempt.expected_text)
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+def cached_results(keys):
+    """{key: fields to store on the attempt} for the keys that are cached, marking them used"""
+    keys = {key for key in keys if key}
+    if not keys or not enabled():
+        return {}
+    found = {
+        key: dict(zip(RESULT_FIELDS, values))
+        for key, *values in SpeechResult.objects.filter(key__in=keys).values_list('key', *RESULT_FIELDS)
+    }
+    if found:
+        SpeechResult.objects.filter(key__in=list(found)).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return found
+
+def store_results(results):
+    """Cache {key: (audio_sha256, fields)}, evicting down to the size bound when one is due"""
+    global _stored_since_evict
+    if not results or not enabled():
+        return
+    now = timezone.now()
+    version = model_version()
+    SpeechResult.objects.bulk_create([
+        SpeechResult(key=key, audio_sha256=digest, model_version=version, last_used_at=now, **fields)
+        for key, (digest, fields) in results.items()
+    ], ignore_conflicts=True)
+    if _stored_since_evict is not None:
+        _stored_since_evict += len(results)
+        if _stored_since_evict < settings.SPEECH_RESULT_CACHE_EVICT_EVERY:
+            return
+    _stored_since_evict = 0
+    evict()
+
+def evict(max_entries=None):
+    """Delete the least recently used entries beyond max_entries; returns how many"""
+    if max_entries is None:
+        max_entries = settings.SPEECH_RESULT_CACHE_MAX_ENTRIES
+    excess = SpeechResult.objects.count() - max_entries
+    if excess <= 0:
+        return 0
+    oldest = list(SpeechResult.objects.order_by('last_used_at').values_list('key', flat=True)[:excess])
+    return SpeechResult.objects.filter(key__in=oldest).delete()[0]
+
+def cache_stats():
+    totals = SpeechResult.objects.aggregate(entries=Count('key'), hits=Sum('hits'))
+    return {'entries': totals['entries'], 'hits': totals['hits'] or 0}
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""Columns and filters for the staff speech attempt export; see norsklaer_backend/export.py"""
+import django_filters
+from norsklaer_backend.apps.lessons.models import Lesson
+from .models import SpeechAttempt
+
+SPEECH_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('cohort', 'user__current_cefr_level'),
+    ('quiz_id', 'quiz_id'),
+    ('lesson_id', 'quiz__lesson_id'),
+    ('lesson_level', 'quiz__lesson__cefr_level'),
+    ('status', 'job__status'),
+    ('expected_text', 'expected_text'),
+    ('transcribed_text', 'transcribed_text'),
+    ('accuracy_score', 'accuracy_score'),
+    ('feedback', 'feedback_json'),
+    ('created_at', 'created_at'),
+]
+
+class SpeechExportFilter(django_filters.FilterSet):
+    level = django_filters.ChoiceFilter(field_name='quiz__lesson__cefr_level', choices=Lesson.CEFR_LEVELS)
+    cohort = django_filters.ChoiceFilter(field_name='user__current_cefr_level', choices=Lesson.CEFR_LEVELS)
+    since = django_filters.DateFilter(field_name='created_at', lookup_expr='date__gte')
+    until = django_filters.DateFilter(field_name='created_at', lookup_expr='date__lte')
+    user = django_filters.NumberFilter(field_name='user_id')
+    
+    class Meta:
+        model = SpeechAttempt
+        fields = ['level', 'cohort', 'since', 'until', 'user']
+
+def export_queryset():
+    return SpeechAttempt.objects.order_by('id')
\ No newline at end of file
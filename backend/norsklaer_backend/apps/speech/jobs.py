@@ -0,0 +1,179 @@
+"""
+In-database queue for speech analysis
+A POST stores the attempt and one speech_jobs row; run_speech_worker
+processes claim queued rows (FOR UPDATE SKIP LOCKED on PostgreSQL, plus a
+compare-and-set UPDATE that also keeps SQLite safe), analyse them and store
+the result on the attempt. Failures are retried with exponential backoff up
+to SPEECH_JOB_MAX_TRIES; jobs whose worker died are requeued after
+SPEECH_JOB_TIMEOUT. Attempts whose recording and expected text were analysed
+before take their result from the cache instead (see cache.py).
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from .analysis import analyse_batch
+from .cache import cache_stats, cached_results, result_key, store_results
+from .models import SpeechAttempt, SpeechJob
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ('queued', 'processing')
+FINISHED_STATUSES = ('completed', 'failed')
+CLAIM_ATTEMPTS = 3
+LATENCY_SAMPLE_SIZE = 500
+ERROR_LENGTH = 2000
+
+def enqueue(attempt):
+    return SpeechJob.objects.create(attempt=attempt, available_at=timezone.now())
+
+def submit_attempt(user, quiz, audio_path, expected_text, audio_sha256=''):
+    """Store an attempt for already-saved audio and queue its analysis"""
+    with transaction.atomic():
+        attempt = SpeechAttempt.objects.create(
+            user=user, quiz=quiz, audio_file_path=audio_path, expected_text=expected_text,
+            audio_sha256=audio_sha256,
+        )
+        enqueue(attempt)
+    return attempt
+
+def attempt_status(attempt):
+    """The attempt's job status; without a job row, whether a result was ever stored"""
+    job = getattr(attempt, 'job', None)
+    if job is None:
+        return 'completed' if attempt.accuracy_score is not None else 'failed'
+    return job.status
+
+def pending_count(user):
+    return SpeechJob.objects.filter(attempt__user=user, status__in=PENDING_STATUSES).count()
+
+def claim_jobs(worker, limit=1):
+    """Mark up to limit available jobs as processing by worker and return them"""
+    for _ in range(CLAIM_ATTEMPTS):
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(SpeechJob.objects.select_for_update(skip_locked=True)
+                       .filter(status='queued', available_at__lte=now)
+                       .order_by('available_at', 'id').values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            # Without row locks another worker may have claimed some since the SELECT
+            claimed = SpeechJob.objects.filter(id__in=ids, status='queued').update(
+                status='processing', worker=worker, started_at=now, tries=F('tries') + 1
+            )
+        if claimed:
+            return list(SpeechJob.objects.select_related('attempt')
+                        .filter(id__in=ids, status='processing', worker=worker, started_at=now)
+                        .order_by('id'))
+    return []
+
+def claim_job(worker):
+    jobs = claim_jobs(worker)
+    return jobs[0] if jobs else None
+
+def retry_delay(tries):
+    return timedelta(seconds=settings.SPEECH_JOB_RETRY_DELAY * 2 ** (tries - 1))
+
+def finish_job(job, **fields):
+    # Only the claiming worker may finish it, in case a timeout requeued it meanwhile
+    return SpeechJob.objects.filter(id=job.id, status='processing', worker=job.worker).update(**fields)
+
+def fail_job(job, error):
+    now = timezone.now()
+    message = f'{type(error).__name__}: {error}'[:ERROR_LENGTH]
+    if job.tries >= settings.SPEECH_JOB_MAX_TRIES:
+        logger.warning('Speech job %s failed after %s tries: %s', job.id, job.tries, message)
+        finish_job(job, status='failed', last_error=message, finished_at=now)
+    else:
+        finish_job(job, status='queued', last_error=message, available_at=now + retry_delay(job.tries))
+
+def process_jobs(jobs):
+    """
+    Analyse claimed jobs' attempts as one batch and store the results;
+    cached results skip analysis, and an attempt repeated within the batch is
+    analysed once. Errors schedule a retry. Returns how many completed
+    """
+    keys = [result_key(job.attempt) for job in jobs]
+    cached = cached_results(keys)
+    # Attempts without an audio digest are never cached and are keyed by id
+    pending = {}
+    for job, key in zip(jobs, keys):
+        if key not in cached:
+            pending.setdefault(key or job.attempt.id, job.attempt)
+    outcomes = dict(zip(pending, analyse_batch(list(pending.values()))))
+    store_results({
+        key: (attempt.audio_sha256, outcomes[key][0])
+        for key, attempt in pending.items() if isinstance(key, str) and outcomes[key][1] is None
+    })
+    
+    completed = 0
+    for job, key in zip(jobs, keys):
+        cache_hit = key in cached
+        fields, error = (cached[key], None) if cache_hit else outcomes[key or job.attempt.id]
+        if error is not None:
+            fail_job(job, error)
+            continue
+        with transaction.atomic():
+            if not finish_job(job, status='completed', last_error='', finished_at=timezone.now(),
+                              cache_hit=cache_hit):
+                continue
+            for field, value in fields.items():
+                setattr(job.attempt, field, value)
+            job.attempt.save(update_fields=list(fields))
+        completed += 1
+    return completed
+
+def requeue_stale(timeout=None):
+    """Return jobs stuck in processing (their worker died) to the queue; returns the count"""
+    cutoff = timezone.now() - timedelta(seconds=timeout or settings.SPEECH_JOB_TIMEOUT)
+    stale = SpeechJob.objects.filter(status='processing', started_at__lt=cutoff)
+    error = 'Timed out in a worker'
+    failed = stale.filter(tries__gte=settings.SPEECH_JOB_MAX_TRIES).update(
+        status='failed', last_error=error, finished_at=timezone.now()
+    )
+    requeued = stale.update(status='queued', last_error=error, available_at=timezone.now())
+    return failed + requeued
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+def queue_stats():
+    """Queue depth plus wait/run latency and result cache hits over the most recent finished jobs"""
+    now = timezone.now()
+    counts = SpeechJob.objects.aggregate(
+        queued=Count('id', filter=Q(status='queued')),
+        processing=Count('id', filter=Q(status='processing')),
+        oldest_queued=Min('created_at', filter=Q(status='queued')),
+    )
+    recent = list(
+        SpeechJob.objects.filter(status__in=FINISHED_STATUSES)
+        .order_by('-finished_at').values_list('status', 'created_at', 'started_at', 'finished_at', 'cache_hit')
+        [:LATENCY_SAMPLE_SIZE]
+    )
+    completed = [row for row in recent if row[0] == 'completed']
+    waits = [(started - created).total_seconds() for _, created, started, _, _ in completed]
+    runs = [(finished - started).total_seconds() for _, _, started, finished, _ in completed]
+    cache_hits = sum(1 for row in completed if row[4])
+    cache = cache_stats()
+    return {
+        'queued': counts['queued'],
+        'processing': counts['processing'],
+        'oldest_queued_seconds': (
+            round((now - counts['oldest_queued']).total_seconds(), 3) if counts['oldest_queued'] else None
+        ),
+        'sample_size': len(recent),
+        'failed': len(recent) - len(completed),
+        'wait_p50_seconds': percentile(waits, 0.5),
+        'wait_p95_seconds': percentile(waits, 0.95),
+        'run_p50_seconds': percentile(runs, 0.5),
+        'run_p95_seconds': percentile(runs, 0.95),
+        'cache_hits': cache_hits,
+        'cache_hit_rate': round(cache_hits / len(completed), 3) if completed else None,
+        'cache_entries': cache['entries'],
+        'cache_lifetime_hits': cache['hits'],
+    }
\ No newline at end of file
@@ -0,0 +1,63 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from norsklaer_backend.apps.speech.scoring import score_batch, score_batch_python
+
+WORDS = [
+    'hei', 'jeg', 'heter', 'bor', 'i', 'norge', 'og', 'liker', 'å', 'lese', 'bøker', 'kaffe', 'med',
+    'melk', 'hvor', 'kommer', 'du', 'fra', 'vi', 'snakker', 'norsk', 'sammen', 'været', 'er', 'fint',
+    'i', 'dag', 'skal', 'gå', 'på', 'tur', 'fjellet', 'søster', 'mormor', 'kjøkkenet', 'ærlig',
+]
+LETTERS = 'abcdefghijklmnoprstuvyæøå'
+
+def garble(word, rng):
+    position = rng.randrange(len(word))
+    return word[:position] + rng.choice(LETTERS) + word[position + 1:]
+
+def make_pairs(count, words, rng):
+    pairs = []
+    for _ in range(count):
+        expected = [rng.choice(WORDS) for _ in range(words)]
+        heard = []
+        for word in expected:
+            roll = rng.random()
+            if roll < 0.1:
+                continue
+            heard.append(garble(word, rng) if roll < 0.3 else word)
+            if roll > 0.95:
+                heard.append(rng.choice(WORDS))
+        pairs.append((' '.join(expected).capitalize() + '.', ' '.join(heard)))
+    return pairs
+
+class Command(BaseCommand):
+    help = 'Time the vectorized pronunciation scorer against the pure-Python baseline'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=500, help='Attempts scored per call')
+        parser.add_argument('--words', type=int, default=12, help='Expected words per attempt')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per scorer; the best is reported')
+        parser.add_argument('--seed', type=int, default=0)
+    
+    def handle(self, *args, **options):
+        if options['attempts'] < 1 or options['words'] < 1 or options['repeat'] < 1:
+            raise CommandError('--attempts, --words and --repeat must be at least 1')
+        pairs = make_pairs(options['attempts'], options['words'], random.Random(options['seed']))
+        
+        timings = {}
+        results = {}
+        for name, scorer in (('python', score_batch_python), ('numpy', score_batch)):
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                results[name] = scorer(pairs)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            self.stdout.write(
+                f'{name:>6}: {best * 1000:8.1f} ms for {len(pairs)} attempts ({len(pairs) / best:,.0f} attempts/s)'
+            )
+        if results['numpy'] != results['python']:
+            raise CommandError('Vectorized and baseline scores differ')
+        self.stdout.write(self.style.SUCCESS(
+            f"Scores match; vectorized scorer is {timings['python'] / timings['numpy']:.1f}x the baseline"
+        ))
\ No newline at end of file
@@ -0,0 +1,13 @@
+from norsklaer_backend.apps.speech.export import (
+    SPEECH_EXPORT_COLUMNS, SpeechExportFilter, export_queryset,
+)
+from norsklaer_backend.export import ExportCommand
+
+class Command(ExportCommand):
+    help = 'Stream every speech attempt as CSV or NDJSON'
+    columns = SPEECH_EXPORT_COLUMNS
+    export_name = 'speech-attempts'
+    filterset_class = SpeechExportFilter
+    
+    def get_queryset(self):
+        return export_queryset()
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.speech.uploads import purge_expired
+
+class Command(BaseCommand):
+    help = 'Delete unfinished speech uploads past their expiry, with their partial files'
+    
+    def handle(self, *args, **options):
+        purged = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired uploads'))
\ No newline at end of file
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from norsklaer_backend.apps.speech.backends import get_backend
+from norsklaer_backend.apps.speech.jobs import requeue_stale
+from norsklaer_backend.apps.speech.worker import POLL_INTERVAL, WorkerPool, drain
+
+class Command(BaseCommand):
+    help = 'Run speech analysis worker processes against the job queue'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            help='Worker processes (default SPEECH_WORKER_CONCURRENCY, or one per core)')
+        parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                            help='Seconds an idle worker waits before checking the queue again')
+        parser.add_argument('--batch-wait-ms', type=int,
+                            help='How long a partial batch keeps collecting jobs (default SPEECH_BATCH_MAX_WAIT_MS)')
+        parser.add_argument('--once', action='store_true',
+                            help='Process the available jobs in this process, then exit')
+    
+    def handle(self, *args, **options):
+        if options['once']:
+            requeued = requeue_stale()
+            processed = drain()
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs, requeued {requeued} stale jobs'))
+            return
+        max_wait = options['batch_wait_ms'] / 1000 if options['batch_wait_ms'] is not None else None
+        pool = WorkerPool(options['concurrency'], options['poll_interval'], max_wait)
+        self.stdout.write(f'Starting {pool.concurrency} speech workers using {get_backend().version}')
+        pool.run()
+        self.stdout.write('Speech workers stopped')
\ No newline at end of file
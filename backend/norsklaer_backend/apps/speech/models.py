@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
 from norsklaer_backend.apps.lessons.models import Quiz
@@ -8,6 +9,7 @@ class SpeechAttempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='speech_attempts')
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='speech_attempts')
     audio_file_path = models.CharField(max_length=500)
+    audio_sha256 = models.CharField(max_length=64, blank=True, help_text="Digest of the recording; see audio.py")
     transcribed_text = models.TextField(null=True, blank=True)
     expected_text = models.TextField()
     accuracy_score = models.IntegerField(null=True, blank=True)
@@ -20,4 +22,79 @@ class SpeechAttempt(models.Model):
             models.Index(fields=['user']),
             models.Index(fields=['quiz']),
             models.Index(fields=['created_at']),
+        ]
+
+class SpeechJob(models.Model):
+    """Queue entry for analysing one SpeechAttempt; see jobs.py"""
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    attempt = models.OneToOneField(SpeechAttempt, on_delete=models.CASCADE, related_name='job')
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued')
+    tries = models.IntegerField(default=0)
+    available_at = models.DateTimeField(help_text="Not claimed before this time (retry backoff)")
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    cache_hit = models.BooleanField(default=False, help_text="Result came from speech_results, not the recognizer")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'speech_jobs'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['status', 'finished_at']),
+        ]
+
+class SpeechResult(models.Model):
+    """Cached analysis of one recording against one expected text; see cache.py"""
+    key = models.CharField(max_length=64, primary_key=True,
+                           help_text="SHA-256 of model version, audio digest and expected text")
+    audio_sha256 = models.CharField(max_length=64)
+    model_version = models.CharField(max_length=100)
+    transcribed_text = models.TextField()
+    accuracy_score = models.IntegerField()
+    feedback_json = models.JSONField()
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'speech_results'
+        indexes = [
+            models.Index(fields=['last_used_at']),
+        ]
+
+class SpeechUpload(models.Model):
+    """A recording uploaded in chunks; becomes a SpeechAttempt when completed; see uploads.py"""
+    STATUSES = [
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='speech_uploads')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='speech_uploads')
+    expected_text = models.TextField()
+    filename = models.CharField(max_length=255, blank=True)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0, help_text="Bytes received and stored so far")
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Expected digest of the whole file, if given")
+    status = models.CharField(max_length=20, choices=STATUSES, default='uploading')
+    attempt = models.OneToOneField(SpeechAttempt, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='upload')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'speech_uploads'
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
         ]
\ No newline at end of file
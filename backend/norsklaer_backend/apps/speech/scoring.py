@@ -0,0 +1,209 @@
+"""
+Pronunciation scoring by word and character alignment
+Expected and transcribed words are aligned with a weighted edit distance
+whose substitution cost is the character edit distance between the two
+words, so a near miss ("heder" for "heter") scores partially instead of
+counting as a missed word plus an extra one. score_batch() fills the
+dynamic-programming tables for a whole batch at once with NumPy: one
+vectorized row update per word (or character) position, covering every
+attempt in the batch, with insertions resolved by a running minimum; each
+distinct pair of words is measured once however often it recurs.
+score_batch_python() is the plain-Python baseline it is benchmarked and
+tested against.
+"""
+import unicodedata
+from functools import lru_cache
+import numpy as np
+from norsklaer_backend.apps.lessons.text import TOKEN_RE
+
+NORWEGIAN_LETTERS = set('æøå')
+# Spellings that recognizers and foreign keyboards produce for æ/ø/å
+LETTER_VARIANTS = {'ä': 'æ', 'ö': 'ø'}
+OLD_SPELLINGS = (('aa', 'å'),)
+TIE_TOLERANCE = 1e-9
+# Part of the result cache key; bump when a change alters scores or feedback
+SCORING_VERSION = 1
+
+WORD_FEEDBACK = ((90, 'Excellent'), (75, 'Good'), (50, 'Needs practice'), (0, 'Try again'))
+OVERALL_FEEDBACK = (
+    (90, 'Excellent pronunciation'),
+    (75, 'Good pronunciation with room for improvement'),
+    (50, 'Understandable, but several words need practice'),
+    (0, 'Hard to recognise; try again slowly'),
+)
+
+@lru_cache(maxsize=65536)
+def normalize_word(word):
+    """Casefold, keep æ/ø/å, map their variants and strip other diacritics (é -> e)"""
+    word = unicodedata.normalize('NFC', word).casefold()
+    letters = []
+    for char in word:
+        char = LETTER_VARIANTS.get(char, char)
+        if char not in NORWEGIAN_LETTERS:
+            char = ''.join(c for c in unicodedata.normalize('NFD', char) if not unicodedata.combining(c))
+        letters.append(char)
+    word = ''.join(letters)
+    for old, new in OLD_SPELLINGS:
+        word = word.replace(old, new)
+    return word
+
+def split_words(text):
+    """(display words, normalized words); punctuation and digits are dropped"""
+    display = TOKEN_RE.findall(text)
+    return display, [normalize_word(word) for word in display]
+
+def label(accuracy, labels):
+    return next(text for threshold, text in labels if accuracy >= threshold)
+
+# Vectorized alignment
+
+def encode(words):
+    """Words as a padded (count, longest) array of code points, plus their lengths"""
+    lengths = np.fromiter((len(word) for word in words), dtype=np.int64, count=len(words))
+    codes = np.full((len(words), max(lengths.max(initial=0), 1)), -1, dtype=np.int32)
+    for row, word in enumerate(words):
+        codes[row, :len(word)] = [ord(char) for char in word]
+    return codes, lengths
+
+def fill_row(previous, substitution, row_index, columns):
+    """
+    One DP row for every table in the batch: deletion and substitution come
+    from the previous row; insertions (unit cost, left to right) become a
+    running minimum of row[k] - k, shifted back by + j
+    """
+    row = np.empty_like(previous)
+    row[:, 0] = row_index
+    row[:, 1:] = np.minimum(previous[:, :-1] + substitution, previous[:, 1:] + 1)
+    return np.minimum.accumulate(row - columns, axis=1) + columns
+
+def char_distances(left_codes, left_lengths, right_codes, right_lengths):
+    """Levenshtein distance of each (left[k], right[k]) pair of encoded words, all pairs in one DP"""
+    distances = np.zeros(len(left_codes), dtype=np.int64)
+    if not len(left_codes):
+        return distances
+    columns = np.arange(right_codes.shape[1] + 1)
+    row = np.tile(columns, (len(left_codes), 1))
+    pairs = np.arange(len(left_codes))
+    distances[left_lengths == 0] = right_lengths[left_lengths == 0]
+    for i in range(1, left_lengths.max() + 1):
+        mismatch = (left_codes[:, i - 1:i] != right_codes).astype(np.int64)
+        row = fill_row(row, mismatch, i, columns)
+        done = left_lengths == i
+        distances[done] = row[pairs[done], right_lengths[done]]
+    return distances
+
+def word_ids(batch):
+    """Each distinct word once, plus padded (attempts, longest) id arrays for both sides (-1 = no word)"""
+    vocabulary = {}
+    sides = []
+    for side in (0, 1):
+        ids = np.full((len(batch), max((len(pair[side]) for pair in batch), default=0)), -1, dtype=np.int64)
+        for attempt, pair in enumerate(batch):
+            ids[attempt, :len(pair[side])] = [vocabulary.setdefault(word, len(vocabulary)) for word in pair[side]]
+        sides.append(ids)
+    return list(vocabulary), sides[0], sides[1]
+
+def substitution_costs(batch):
+    """
+    (attempts, longest expected, longest heard) array of word substitution
+    costs in [0, 1]; each distinct word pair is measured once per batch
+    """
+    words, expected, heard = word_ids(batch)
+    costs = np.ones((len(batch), expected.shape[1], heard.shape[1]))
+    left = np.broadcast_to(expected[:, :, None], costs.shape)
+    right = np.broadcast_to(heard[:, None, :], costs.shape)
+    present = (left >= 0) & (right >= 0)
+    if not present.any():
+        return costs
+    pairs, inverse = np.unique(left[present] * len(words) + right[present], return_inverse=True)
+    codes, lengths = encode(words)
+    left_ids, right_ids = pairs // len(words), pairs % len(words)
+    distances = char_distances(codes[left_ids], lengths[left_ids], codes[right_ids], lengths[right_ids])
+    longest = np.maximum(np.maximum(lengths[left_ids], lengths[right_ids]), 1)
+    costs[present] = (distances / longest)[inverse.reshape(-1)]
+    return costs
+
+def word_tables(batch, costs):
+    """Full (attempts, rows + 1, cols + 1) word-level DP tables for the batch"""
+    rows, cols = costs.shape[1], costs.shape[2]
+    columns = np.arange(cols + 1, dtype=float)
+    tables = np.empty((len(batch), rows + 1, cols + 1))
+    tables[:, 0, :] = columns
+    for i in range(1, rows + 1):
+        tables[:, i, :] = fill_row(tables[:, i - 1, :], costs[:, i - 1, :], i, columns)
+    return tables
+
+def backtrace(table, cost, rows, cols):
+    """Per expected word, the cost of the heard word aligned to it (None when missed), plus extra words"""
+    aligned = [None] * rows
+    extra = 0
+    i, j = rows, cols
+    while i or j:
+        if i and j and abs(table[i][j] - (table[i - 1][j - 1] + cost[i - 1][j - 1])) < TIE_TOLERANCE:
+            aligned[i - 1] = cost[i - 1][j - 1]
+            i, j = i - 1, j - 1
+        elif i and abs(table[i][j] - (table[i - 1][j] + 1)) < TIE_TOLERANCE:
+            i -= 1
+        else:
+            extra += 1
+            j -= 1
+    return aligned, extra
+
+def result(display, aligned, extra):
+    accuracies = [0 if cost is None else round(100 * (1 - cost)) for cost in aligned]
+    # Extra words dilute the score as if they were missed expected words
+    accuracy = round(sum(accuracies) / (len(display) + extra)) if display else 0
+    return accuracy, {
+        'overall': label(accuracy, OVERALL_FEEDBACK),
+        'word_analysis': [
+            {'word': word, 'accuracy': value, 'feedback': label(value, WORD_FEEDBACK)}
+            for word, value in zip(display, accuracies)
+        ],
+        'extra_words': extra,
+    }
+
+def score_batch(pairs):
+    """[(accuracy_score, feedback)] for [(expected_text, transcribed_text)]"""
+    if not pairs:
+        return []
+    split = [(split_words(expected), split_words(heard)[1]) for expected, heard in pairs]
+    batch = [(expected, heard) for (_, expected), heard in split]
+    costs = substitution_costs(batch)
+    tables = word_tables(batch, costs)
+    results = []
+    for attempt, ((display, expected), heard) in enumerate(split):
+        aligned, extra = backtrace(tables[attempt].tolist(), costs[attempt].tolist(), len(expected), len(heard))
+        results.append(result(display, aligned, extra))
+    return results
+
+def score(expected_text, transcribed_text):
+    return score_batch([(expected_text, transcribed_text)])[0]
+
+# Pure-Python baseline
+
+def char_distance_python(left, right):
+    previous = list(range(len(right) + 1))
+    for i, char in enumerate(left, start=1):
+        current = [i]
+        for j, other in enumerate(right, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        previous = current
+    return previous[-1]
+
+def score_python(expected_text, transcribed_text):
+    display, expected = split_words(expected_text)
+    heard = split_words(transcribed_text)[1]
+    cost = [
+        [char_distance_python(word, other) / max(len(word), len(other), 1) for other in heard]
+        for word in expected
+    ]
+    table = [[float(j) for j in range(len(heard) + 1)]]
+    for i in range(1, len(expected) + 1):
+        row = [float(i)]
+        for j in range(1, len(heard) + 1):
+            row.append(min(table[i - 1][j] + 1, row[j - 1] + 1, table[i - 1][j - 1] + cost[i - 1][j - 1]))
+        table.append(row)
+    return result(display, *backtrace(table, cost, len(expected), len(heard)))
+
+def score_batch_python(pairs):
+    return [score_python(expected, heard) for expected, heard in pairs]
\ No newline at end of file
@@ -0,0 +1,59 @@
+from django.conf import settings
+from rest_framework import serializers
+from norsklaer_backend.apps.lessons.models import Quiz
+from norsklaer_backend.cefr import is_available_to
+from .jobs import attempt_status
+from .models import SpeechAttempt, SpeechUpload
+
+class SpeechAnalysisSerializer(serializers.Serializer):
+    audio_file = serializers.FileField()
+    quiz_id = serializers.IntegerField()
+    expected_text = serializers.CharField(required=False, max_length=1000)
+    
+    def validate_audio_file(self, value):
+        if value.size > settings.SPEECH_MAX_AUDIO_BYTES:
+            raise serializers.ValidationError(f'Audio must be at most {settings.SPEECH_MAX_AUDIO_BYTES} bytes')
+        return value
+    
+    def validate(self, data):
+        quiz = Quiz.objects.select_related('lesson').filter(id=data['quiz_id']).first()
+        if quiz is None:
+            raise serializers.ValidationError({'quiz_id': ['Quiz does not exist']})
+        if not is_available_to(self.context['request'].user, quiz.lesson.cefr_level):
+            raise serializers.ValidationError({'quiz_id': ['Quiz not available for your current level']})
+        data['quiz'] = quiz
+        data.setdefault('expected_text', quiz.correct_answer)
+        return data
+
+class SpeechUploadCreateSerializer(SpeechAnalysisSerializer):
+    audio_file = None
+    total_size = serializers.IntegerField(min_value=1)
+    filename = serializers.CharField(max_length=255, required=False, default='')
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, default='')
+    
+    def validate_total_size(self, value):
+        if value > settings.SPEECH_MAX_AUDIO_BYTES:
+            raise serializers.ValidationError(f'Audio must be at most {settings.SPEECH_MAX_AUDIO_BYTES} bytes')
+        return value
+
+class SpeechUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SpeechUpload
+        fields = ['id', 'quiz', 'status', 'filename', 'total_size', 'offset', 'attempt', 'created_at', 'expires_at']
+        read_only_fields = fields
+
+class SpeechAttemptSerializer(serializers.ModelSerializer):
+    status = serializers.SerializerMethodField()
+    finished_at = serializers.DateTimeField(source='job.finished_at', read_only=True)
+    feedback = serializers.JSONField(source='feedback_json', read_only=True)
+    
+    class Meta:
+        model = SpeechAttempt
+        fields = [
+            'id', 'quiz', 'status', 'expected_text', 'transcribed_text', 'accuracy_score', 'feedback',
+            'created_at', 'finished_at',
+        ]
+        read_only_fields = fields
+    
+    def get_status(self, obj):
+        return attempt_status(obj)
\ No newline at end of file
@@ -0,0 +1,429 @@
+import base64
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipIf
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from norsklaer_backend.apps.lessons.models import Lesson, Quiz
+from .audio import audio_name
+from .cache import evict, store_results
+from .jobs import claim_job, requeue_stale
+from .models import SpeechAttempt, SpeechJob, SpeechResult, SpeechUpload
+from .scoring import normalize_word, score, score_batch, score_batch_python
+from .uploads import OffsetConflict, append_chunk, get_store, purge_expired
+from .worker import WorkerPool, available_cores, collect_batch, drain
+
+User = get_user_model()
+
+class StubRecognizer(BaseHTTPRequestHandler):
+    """Recognition service for RemoteBackend: lowercases the expected text, fails on 'stille'"""
+    received = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        StubRecognizer.received.append((self.path, self.headers.get('Authorization'), body))
+        if self.path == '/down':
+            self.send_response(503)
+            self.end_headers()
+            return
+        results = [
+            {'error': 'Too quiet'} if clip['expected_text'] == 'stille' else {'text': clip['expected_text'].lower()}
+            for clip in body['clips']
+        ]
+        payload = json.dumps({'results': results}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+class SpeechJobTest(APITestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(
+            email='speaker@norsklaer.com',
+            username='speaker',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        lesson = Lesson.objects.create(
+            title='Introductions', cefr_level='A1', lesson_type='speaking',
+            estimated_duration=10, content_json={}
+        )
+        self.quiz = Quiz.objects.create(
+            lesson=lesson, question_text='Say your name', question_type='speaking',
+            correct_answer='Hei, jeg heter Kari'
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def submit(self, **data):
+        audio = SimpleUploadedFile('take.webm', b'\x1aE\xdf\xa3 fake audio', content_type='audio/webm')
+        return self.client.post('/api/v1/speech/analyze/', {'audio_file': audio, 'quiz_id': self.quiz.id, **data})
+
+    def test_post_queues_and_worker_stores_result(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        attempt = SpeechAttempt.objects.get(id=response.data['id'])
+        self.assertTrue(default_storage.exists(attempt.audio_file_path))
+        self.assertEqual(attempt.expected_text, 'Hei, jeg heter Kari')
+
+        pending = self.client.get(response['Location'])
+        self.assertEqual(pending['Retry-After'], '1')
+
+        self.assertEqual(drain(), 1)
+        result = self.client.get(response['Location']).data
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(result['accuracy_score'], 100)
+        self.assertEqual(len(result['feedback']['word_analysis']), 4)
+
+    def test_attempts_are_private(self):
+        attempt_id = self.submit().data['id']
+        other = User.objects.create_user(email='other@norsklaer.com', username='other', password='testpass123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(f'/api/v1/speech/attempts/{attempt_id}/').status_code, 404)
+
+    def test_attempt_without_a_job_row(self):
+        attempt = SpeechAttempt.objects.get(id=self.submit().data['id'])
+        attempt.job.delete()
+        response = self.client.get(f'/api/v1/speech/attempts/{attempt.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertIsNone(response.data['finished_at'])
+        self.assertNotIn('Retry-After', response)
+
+        SpeechAttempt.objects.filter(id=attempt.id).update(transcribed_text='hei', accuracy_score=80)
+        self.assertEqual(self.client.get(f'/api/v1/speech/attempts/{attempt.id}/').data['status'], 'completed')
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        attempt = SpeechAttempt.objects.get(id=self.submit().data['id'])
+        default_storage.delete(attempt.audio_file_path)
+
+        with self.settings(SPEECH_JOB_MAX_TRIES=2):
+            drain()
+            job = SpeechJob.objects.get(attempt=attempt)
+            self.assertEqual((job.status, job.tries), ('queued', 1))
+            self.assertIn('FileNotFoundError', job.last_error)
+            self.assertGreater(job.available_at, timezone.now())
+
+            SpeechJob.objects.update(available_at=timezone.now())
+            with self.assertLogs('norsklaer_backend.apps.speech.jobs', 'WARNING'):
+                drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.tries), ('failed', 2))
+
+    def test_abandoned_jobs_are_requeued(self):
+        self.submit()
+        job = claim_job('dead-worker')
+        SpeechJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(SpeechJob.objects.get(id=job.id).status, 'queued')
+
+    def test_pending_recordings_are_limited_per_user(self):
+        with self.settings(SPEECH_MAX_PENDING_PER_USER=1):
+            self.assertEqual(self.submit().status_code, 202)
+            self.assertEqual(self.submit().status_code, 429)
+
+    def test_queue_stats_for_staff(self):
+        self.submit()
+        self.submit()
+        drain(limit=1)
+        self.assertEqual(self.client.get('/api/v1/speech/jobs/stats/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        stats = self.client.get('/api/v1/speech/jobs/stats/').data
+        self.assertEqual((stats['queued'], stats['processing'], stats['sample_size']), (1, 0, 1))
+        self.assertIsNotNone(stats['run_p50_seconds'])
+
+    def test_scores_words_against_the_expected_text(self):
+        accuracy, feedback = score('Hei, jeg heter Kari', 'hei jeg heder Kari og')
+        words = [(item['word'], item['accuracy']) for item in feedback['word_analysis']]
+        self.assertEqual(words[:2], [('Hei', 100), ('jeg', 100)])
+        self.assertEqual(words[3], ('Kari', 100))
+        self.assertLess(words[2][1], 100)
+        self.assertEqual(feedback['extra_words'], 1)
+        self.assertLess(accuracy, 90)
+
+    def test_worker_scores_claimed_jobs_as_a_batch(self):
+        ids = [self.submit().data['id'] for _ in range(3)]
+        self.assertEqual(drain(batch_size=2), 3)
+        attempts = SpeechAttempt.objects.filter(id__in=ids)
+        self.assertEqual({attempt.accuracy_score for attempt in attempts}, {100})
+        self.assertEqual(SpeechJob.objects.filter(status='completed').count(), 3)
+
+    def test_identical_recordings_share_storage_and_cached_results(self):
+        first = SpeechAttempt.objects.get(id=self.submit().data['id'])
+        self.assertEqual(drain(), 1)
+        second = SpeechAttempt.objects.get(id=self.submit().data['id'])
+        self.assertEqual(second.audio_file_path, first.audio_file_path)
+        self.assertEqual(len(second.audio_sha256), 64)
+        renamed = SimpleUploadedFile('Opptak.WEBM', b'\x1aE\xdf\xa3 fake audio', content_type='audio/webm')
+        third = SpeechAttempt.objects.get(id=self.submit(audio_file=renamed).data['id'])
+        self.assertEqual(third.audio_file_path, first.audio_file_path)
+        third.delete()
+        
+        # The recognizer would fail on the missing file, so a completed job proves it was skipped
+        default_storage.delete(second.audio_file_path)
+        self.assertEqual(drain(), 1)
+        second.refresh_from_db()
+        self.assertEqual((second.job.status, second.job.cache_hit), ('completed', True))
+        self.assertEqual(second.accuracy_score, 100)
+        self.assertEqual(SpeechResult.objects.get().hits, 1)
+        
+        other_text = SpeechAttempt.objects.get(id=self.submit(expected_text='Hei, jeg heter Ola').data['id'])
+        drain()
+        self.assertFalse(SpeechJob.objects.get(attempt=other_text).cache_hit)
+        
+        self.user.is_staff = True
+        self.user.save()
+        stats = self.client.get('/api/v1/speech/jobs/stats/').data
+        self.assertEqual((stats['cache_hits'], stats['cache_hit_rate'], stats['cache_entries']), (1, 0.333, 2))
+
+    def test_cache_keeps_the_most_recently_used_results(self):
+        self.submit()
+        self.submit(expected_text='Hei, jeg heter Ola')
+        with self.settings(SPEECH_RESULT_CACHE_MAX_ENTRIES=1, SPEECH_RESULT_CACHE_EVICT_EVERY=1):
+            drain(batch_size=1)
+            self.assertEqual(SpeechResult.objects.count(), 1)
+            drain()
+        self.assertEqual(SpeechResult.objects.count(), 1)
+        self.assertEqual(SpeechResult.objects.get().transcribed_text, 'Hei, jeg heter Ola')
+        self.assertEqual(evict(0), 1)
+
+    def test_eviction_runs_every_few_stored_results(self):
+        fields = {'transcribed_text': 'hei', 'accuracy_score': 100, 'feedback_json': {}}
+        counts = []
+        with self.settings(SPEECH_RESULT_CACHE_MAX_ENTRIES=1, SPEECH_RESULT_CACHE_EVICT_EVERY=3), \
+                mock.patch('norsklaer_backend.apps.speech.cache._stored_since_evict', None):
+            for n in range(5):
+                store_results({f'{n:064d}': ('a' * 64, fields)})
+                counts.append(SpeechResult.objects.count())
+        # The first store evicts, the next two only insert, the third after it evicts again
+        self.assertEqual(counts, [1, 2, 3, 1, 2])
+
+    def start_stub_recognizer(self):
+        StubRecognizer.received = []
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubRecognizer)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    def test_remote_backend_sends_the_batch_in_one_request(self):
+        url = self.start_stub_recognizer()
+        heard = SpeechAttempt.objects.get(id=self.submit().data['id'])
+        quiet = SpeechAttempt.objects.get(id=self.submit(expected_text='stille').data['id'])
+        with self.settings(SPEECH_ASR_BACKEND='norsklaer_backend.apps.speech.backends.RemoteBackend',
+                           SPEECH_ASR_URL=f'{url}/transcribe', SPEECH_ASR_TOKEN='secret'):
+            self.assertEqual(drain(), 2)
+        
+        self.assertEqual(len(StubRecognizer.received), 1)
+        _, authorization, body = StubRecognizer.received[0]
+        self.assertEqual(authorization, 'Bearer secret')
+        self.assertEqual([clip['expected_text'] for clip in body['clips']], ['Hei, jeg heter Kari', 'stille'])
+        self.assertEqual(base64.b64decode(body['clips'][0]['audio']), b'\x1aE\xdf\xa3 fake audio')
+        heard.refresh_from_db()
+        self.assertEqual((heard.transcribed_text, heard.accuracy_score), ('hei, jeg heter kari', 100))
+        quiet.job.refresh_from_db()
+        self.assertEqual(quiet.job.status, 'queued')
+        self.assertIn('Too quiet', quiet.job.last_error)
+
+    def test_remote_backend_splits_batches_over_the_size_budget(self):
+        url = self.start_stub_recognizer()
+        attempts = [
+            SpeechAttempt.objects.get(id=self.submit(expected_text=text).data['id']) for text in ('Hei', 'Takk', 'Ja')
+        ]
+        with self.settings(SPEECH_ASR_BACKEND='norsklaer_backend.apps.speech.backends.RemoteBackend',
+                           SPEECH_ASR_URL=f'{url}/transcribe', SPEECH_ASR_MAX_REQUEST_BYTES=150):
+            self.assertEqual(drain(), 3)
+        
+        self.assertEqual([len(body['clips']) for _, _, body in StubRecognizer.received], [2, 1])
+        for attempt in attempts:
+            attempt.refresh_from_db()
+        self.assertEqual([attempt.transcribed_text for attempt in attempts], ['hei', 'takk', 'ja'])
+
+    def test_unreachable_remote_backend_requeues_the_whole_batch(self):
+        url = self.start_stub_recognizer()
+        self.submit()
+        self.submit(expected_text='Hei')
+        with self.settings(SPEECH_ASR_BACKEND='norsklaer_backend.apps.speech.backends.RemoteBackend',
+                           SPEECH_ASR_URL=f'{url}/down'):
+            drain()
+        self.assertEqual(list(SpeechJob.objects.values_list('status', flat=True)), ['queued', 'queued'])
+        self.assertIn('503', SpeechJob.objects.first().last_error)
+
+    @skipIf(importlib.util.find_spec('faster_whisper'), 'faster-whisper is installed')
+    def test_cpu_backend_without_faster_whisper_retries(self):
+        self.submit()
+        with self.settings(SPEECH_ASR_BACKEND='norsklaer_backend.apps.speech.backends.CPUModelBackend'):
+            drain()
+        job = SpeechJob.objects.get()
+        self.assertEqual(job.status, 'queued')
+        self.assertIn('faster-whisper', job.last_error)
+
+    def test_partial_batches_wait_briefly_for_more_jobs(self):
+        for _ in range(3):
+            self.submit()
+        started = time.monotonic()
+        self.assertEqual(len(collect_batch('batcher', 2, 5)), 2)
+        self.assertLess(time.monotonic() - started, 5)
+        
+        started = time.monotonic()
+        self.assertEqual(len(collect_batch('batcher', 5, 0.05)), 1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        
+        started = time.monotonic()
+        self.assertEqual(collect_batch('batcher', 5, 5), [])
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_pool_defaults_to_one_process_per_core(self):
+        with self.settings(SPEECH_WORKER_CONCURRENCY=0):
+            self.assertEqual(WorkerPool().concurrency, available_cores())
+        with self.settings(SPEECH_WORKER_CONCURRENCY=3):
+            self.assertEqual(WorkerPool().concurrency, 3)
+
+class PronunciationScoringTest(APITestCase):
+    def test_normalizes_norwegian_spellings(self):
+        self.assertEqual(normalize_word('Gaa'), 'gå')
+        self.assertEqual(normalize_word('Kafé'), 'kafe')
+        self.assertEqual(normalize_word('SÖSTER'), 'søster')
+        self.assertEqual(normalize_word('Ærlig'), 'ærlig')
+        accuracy, _ = score('Vi går på kafé', 'vi gaar pa kafe')
+        self.assertLess(accuracy, 100)
+        self.assertEqual(score('Vi går på kafé', 'Vi går på kafe')[0], 100)
+
+    def test_batch_matches_the_python_baseline(self):
+        pairs = [
+            ('Hei, jeg heter Kari', 'hei jeg heder Kari og'),
+            ('Jeg bor i Norge', 'jeg bor Norge'),
+            ('Været er fint i dag', 'været er fin i dag i dag'),
+            ('Hvor kommer du fra?', ''),
+            ('', 'hei'),
+        ]
+        self.assertEqual(score_batch(pairs), score_batch_python(pairs))
+        self.assertEqual(score_batch(pairs)[1], score(*pairs[1]))
+
+class SpeechUploadTest(APITestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media, SPEECH_UPLOAD_CHUNK_MAX=8)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(
+            email='uploader@norsklaer.com',
+            username='uploader',
+            password='testpass123',
+            current_cefr_level='A1'
+        )
+        self.client.force_authenticate(user=self.user)
+        lesson = Lesson.objects.create(
+            title='Numbers', cefr_level='A1', lesson_type='speaking',
+            estimated_duration=10, content_json={}
+        )
+        self.quiz = Quiz.objects.create(
+            lesson=lesson, question_text='Count to three', question_type='speaking',
+            correct_answer='en to tre'
+        )
+        self.audio = b'0123456789abcdefghij'
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def start(self, **data):
+        response = self.client.post('/api/v1/speech/uploads/', {
+            'quiz_id': self.quiz.id, 'total_size': len(self.audio), 'filename': 'take.webm',
+            'sha256': hashlib.sha256(self.audio).hexdigest(), **data,
+        })
+        self.assertEqual(response.status_code, 201)
+        return response['Location']
+
+    def send(self, url, offset, chunk, **headers):
+        return self.client.generic('PATCH', url, chunk, content_type='application/offset+octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    def test_chunks_resume_and_complete_into_an_attempt(self):
+        url = self.start()
+        self.assertEqual(self.send(url, 0, self.audio[:8])['Upload-Offset'], '8')
+
+        # A resend of the first chunk after a lost response is rejected with the offset to resume from
+        retry = self.send(url, 0, self.audio[:8])
+        self.assertEqual((retry.status_code, retry['Upload-Offset']), (409, '8'))
+        self.assertEqual(self.client.get(url).data['offset'], 8)
+
+        self.send(url, 8, self.audio[8:16])
+        self.assertEqual(self.client.post(url + 'complete/').status_code, 409)
+        self.send(url, 16, self.audio[16:])
+        response = self.client.post(url + 'complete/')
+        self.assertEqual(response.status_code, 202)
+
+        attempt = SpeechAttempt.objects.get(id=response.data['id'])
+        with default_storage.open(attempt.audio_file_path) as stored:
+            self.assertEqual(stored.read(), self.audio)
+        self.assertEqual(attempt.audio_file_path, audio_name(hashlib.sha256(self.audio).hexdigest()))
+        self.assertEqual(attempt.expected_text, 'en to tre')
+        self.assertEqual(SpeechJob.objects.get(attempt=attempt).status, 'queued')
+        self.assertEqual(os.listdir(get_store().directory), [])
+        # Completing again returns the same attempt
+        self.assertEqual(self.client.post(url + 'complete/').data['id'], attempt.id)
+
+    def test_chunk_checksums_reject_corrupt_chunks(self):
+        url = self.start()
+        bad = self.send(url, 0, self.audio[:8], HTTP_UPLOAD_CHECKSUM=hashlib.sha256(b'other').hexdigest())
+        self.assertEqual((bad.status_code, bad['Upload-Offset']), (400, '0'))
+        good = self.send(url, 0, self.audio[:8], HTTP_UPLOAD_CHECKSUM=hashlib.sha256(self.audio[:8]).hexdigest())
+        self.assertEqual(good['Upload-Offset'], '8')
+
+    def test_racing_chunk_at_the_same_offset_is_rejected(self):
+        self.start()
+        # Both requests passed the offset check before either wrote
+        first, second = SpeechUpload.objects.get(), SpeechUpload.objects.get()
+        append_chunk(first, 0, io.BytesIO(self.audio[:8]), 8)
+        self.assertEqual(SpeechUpload.objects.get().offset, 8)
+        with self.assertRaises(OffsetConflict):
+            append_chunk(second, 0, io.BytesIO(b'XXXXXXXX'), 8)
+        with open(get_store().path(first.id), 'rb') as partial:
+            self.assertEqual(partial.read(), self.audio[:8])
+
+    def test_file_checksum_is_verified_on_completion(self):
+        url = self.start(sha256=hashlib.sha256(b'something else').hexdigest())
+        for offset in range(0, len(self.audio), 8):
+            self.send(url, offset, self.audio[offset:offset + 8])
+        self.assertEqual(self.client.post(url + 'complete/').status_code, 400)
+        self.assertEqual(SpeechUpload.objects.get().status, 'failed')
+        self.assertFalse(SpeechAttempt.objects.exists())
+
+    def test_rejects_oversized_chunks_and_other_users(self):
+        url = self.start()
+        self.assertEqual(self.send(url, 0, self.audio[:9]).status_code, 400)
+        other = User.objects.create_user(email='other@norsklaer.com', username='other', password='testpass123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.send(url, 0, self.audio[:8]).status_code, 404)
+
+    def test_expired_uploads_are_purged(self):
+        self.start()
+        self.assertEqual(purge_expired(timezone.now() + timedelta(days=2)), 1)
+        self.assertFalse(SpeechUpload.objects.exists())
+        self.assertEqual(os.listdir(get_store().directory), [])
\ No newline at end of file
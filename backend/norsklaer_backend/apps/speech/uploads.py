@@ -0,0 +1,183 @@
+"""
+Resumable chunked uploads for speech recordings
+A client creates an upload with the total size, then sends the file in
+chunks, each tagged with the offset it starts at. Chunks are streamed from
+the request to the partial file in BLOCK_SIZE pieces and hashed as they
+arrive, so memory per upload is one block whatever the recording length.
+After a dropped connection the client asks for the stored offset and sends
+only the rest. Completing an upload checks the whole-file digest, moves the
+file into content-addressed storage (audio.py) and queues the analysis.
+"""
+import fcntl
+import hashlib
+import os
+from datetime import timedelta
+from functools import lru_cache
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .audio import audio_name, save_audio
+from .jobs import submit_attempt
+from .models import SpeechUpload
+
+BLOCK_SIZE = 64 * 1024
+
+class UploadError(Exception):
+    pass
+
+class UploadBusy(UploadError):
+    """Another request is writing to the same upload"""
+
+class ChecksumMismatch(UploadError):
+    pass
+
+class OffsetConflict(UploadError):
+    """The partial file does not end at the offset the chunk starts at"""
+
+class LocalChunkStore:
+    """Partial uploads as files on local disk; finished files are saved to default_storage"""
+    
+    def __init__(self, directory=None):
+        self.configured_directory = directory
+    
+    @property
+    def directory(self):
+        # Read per call so settings overrides apply to the shared instance
+        return self.configured_directory or settings.SPEECH_UPLOAD_DIR or os.path.join(
+            settings.MEDIA_ROOT, 'partial-uploads'
+        )
+    
+    def path(self, upload_id):
+        return os.path.join(self.directory, f'{upload_id}.part')
+    
+    def create(self, upload_id):
+        os.makedirs(self.directory, exist_ok=True)
+        open(self.path(upload_id), 'xb').close()
+    
+    def append(self, upload_id, offset, stream, length, checksum=None, on_written=None):
+        """
+        Write up to length bytes from stream at offset and return the new
+        offset. Bytes from a dropped connection are kept unless a chunk
+        checksum was given, in which case the chunk is all or nothing.
+        on_written(new_offset) runs before the lock is released, so the next
+        writer sees the offset it recorded; if it raises, the chunk is dropped.
+        """
+        with open(self.path(upload_id), 'r+b') as file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadBusy()
+            # A writer that held the lock before us may have moved past the offset we were given
+            if os.fstat(file.fileno()).st_size != offset:
+                raise OffsetConflict()
+            file.seek(offset)
+            digest = hashlib.sha256()
+            remaining = length
+            while remaining:
+                try:
+                    block = stream.read(min(BLOCK_SIZE, remaining))
+                except (OSError, UnreadablePostError):
+                    break
+                if not block:
+                    break
+                file.write(block)
+                digest.update(block)
+                remaining -= len(block)
+            if checksum is not None and (remaining or digest.hexdigest() != checksum):
+                file.truncate(offset)
+                raise ChecksumMismatch()
+            file.flush()
+            os.fsync(file.fileno())
+            new_offset = offset + length - remaining
+            if on_written is not None:
+                try:
+                    on_written(new_offset)
+                except Exception:
+                    file.truncate(offset)
+                    raise
+            return new_offset
+    
+    def digest(self, upload_id):
+        digest = hashlib.sha256()
+        with open(self.path(upload_id), 'rb') as file:
+            for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def finalize(self, upload_id, name):
+        """Save the finished file to default_storage as name, unless those bytes are already there"""
+        with open(self.path(upload_id), 'rb') as file:
+            stored = save_audio(name, File(file))
+        self.discard(upload_id)
+        return stored
+    
+    def discard(self, upload_id):
+        try:
+            os.remove(self.path(upload_id))
+        except FileNotFoundError:
+            pass
+
+@lru_cache(maxsize=None)
+def load_store(path):
+    return import_string(path)()
+
+def get_store():
+    return load_store(settings.SPEECH_UPLOAD_STORE)
+
+def create_upload(user, quiz, expected_text, total_size, filename='', sha256=''):
+    upload = SpeechUpload(
+        user=user, quiz=quiz, expected_text=expected_text, total_size=total_size,
+        filename=filename, sha256=sha256.lower(),
+        expires_at=timezone.now() + timedelta(hours=settings.SPEECH_UPLOAD_TTL_HOURS),
+    )
+    get_store().create(upload.id)
+    upload.save()
+    return upload
+
+def append_chunk(upload, offset, stream, length, checksum=None):
+    """Store one chunk and return the new offset; the caller has checked offset and length"""
+    def record_offset(new_offset):
+        if new_offset == offset:
+            return
+        updated = SpeechUpload.objects.filter(id=upload.id, offset=offset).update(
+            offset=new_offset, updated_at=timezone.now()
+        )
+        if not updated:
+            raise OffsetConflict()
+    
+    new_offset = get_store().append(upload.id, offset, stream, length, checksum, on_written=record_offset)
+    upload.offset = new_offset
+    return new_offset
+
+def complete_upload(upload):
+    """Verify the finished file, move it to storage and queue its analysis; returns the attempt"""
+    store = get_store()
+    digest = store.digest(upload.id)
+    if upload.sha256 and digest != upload.sha256:
+        SpeechUpload.objects.filter(id=upload.id).update(status='failed', updated_at=timezone.now())
+        store.discard(upload.id)
+        raise ChecksumMismatch()
+    path = store.finalize(upload.id, audio_name(digest))
+    with transaction.atomic():
+        attempt = submit_attempt(upload.user, upload.quiz, path, upload.expected_text, digest)
+        upload.status, upload.attempt, upload.sha256 = 'completed', attempt, digest
+        upload.save(update_fields=['status', 'attempt', 'sha256', 'updated_at'])
+    return attempt
+
+def abort_upload(upload):
+    get_store().discard(upload.id)
+    upload.delete()
+
+def purge_expired(now=None):
+    """Delete unfinished uploads past expires_at with their partial files; returns the count"""
+    store = get_store()
+    expired = SpeechUpload.objects.filter(status__in=['uploading', 'failed'], expires_at__lt=now or timezone.now())
+    purged = 0
+    for upload_id in expired.values_list('id', flat=True).iterator():
+        store.discard(upload_id)
+        purged += 1
+    expired.delete()
+    return purged
\ No newline at end of file
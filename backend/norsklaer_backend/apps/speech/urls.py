@@ -1,6 +1,15 @@
 from django.urls import path
-from .views import SpeechAnalysisView
+from .views import (
+    SpeechAnalysisView, SpeechAttemptDetailView, SpeechAttemptExportView, SpeechQueueStatsView,
+    SpeechUploadCompleteView, SpeechUploadCreateView, SpeechUploadDetailView,
+)
 
 urlpatterns = [
     path('analyze/', SpeechAnalysisView.as_view(), name='speech_analysis'),
+    path('uploads/', SpeechUploadCreateView.as_view(), name='speech_upload_create'),
+    path('uploads/<uuid:pk>/', SpeechUploadDetailView.as_view(), name='speech_upload_detail'),
+    path('uploads/<uuid:pk>/complete/', SpeechUploadCompleteView.as_view(), name='speech_upload_complete'),
+    path('attempts/<int:pk>/', SpeechAttemptDetailView.as_view(), name='speech_attempt_detail'),
+    path('jobs/stats/', SpeechQueueStatsView.as_view(), name='speech_queue_stats'),
+    path('export/', SpeechAttemptExportView.as_view(), name='speech_export'),
 ]
\ No newline at end of file
@@ -1,31 +1,182 @@
-from rest_framework import status
+from django.conf import settings
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status
+from rest_framework.exceptions import Throttled, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from norsklaer_backend.export import StreamingExportView
+from .audio import store_audio
+from .export import SPEECH_EXPORT_COLUMNS, SpeechExportFilter, export_queryset
+from .jobs import PENDING_STATUSES, pending_count, queue_stats, submit_attempt
+from .models import SpeechAttempt, SpeechUpload
+from .serializers import (
+    SpeechAnalysisSerializer, SpeechAttemptSerializer, SpeechUploadCreateSerializer, SpeechUploadSerializer,
+)
+from .uploads import (
+    ChecksumMismatch, OffsetConflict, UploadBusy, abort_upload, append_chunk, complete_upload,
+    create_upload,
+)
+
+RETRY_AFTER_SECONDS = 1
+
+def check_pending_limit(user):
+    if pending_count(user) >= settings.SPEECH_MAX_PENDING_PER_USER:
+        raise Throttled(wait=RETRY_AFTER_SECONDS, detail='Too many recordings are still being analysed')
+
+def attempt_accepted(attempt):
+    response = Response(SpeechAttemptSerializer(attempt).data, status=status.HTTP_202_ACCEPTED)
+    response['Location'] = f'/api/v1/speech/attempts/{attempt.id}/'
+    return response
+
+def offset_response(data, offset, status_code):
+    response = Response(data, status=status_code)
+    response['Upload-Offset'] = str(offset)
+    return response
 
 class SpeechAnalysisView(APIView):
     """
-    Portfolio demonstration of speech analysis endpoint
-    In production, this would integrate with OpenAI Whisper or similar
+    Store a recording and queue it for analysis; answers 202 straight away
+    Transcription and scoring happen in run_speech_worker processes, and the
+    result is read from /speech/attempts/{id}/
     """
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
-        # Simulate speech analysis for portfolio demonstration
-        expected_text = request.data.get('expected_text', '')
+        serializer = SpeechAnalysisSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        check_pending_limit(request.user)
         
-        # Mock analysis results
-        mock_response = {
-            'transcribed_text': expected_text,  # Perfect transcription for demo
-            'accuracy_score': 88,
-            'feedback': {
-                'overall': 'Good pronunciation with room for improvement',
-                'word_analysis': [
-                    {'word': word, 'accuracy': 85 + (i % 15), 'feedback': 'Good effort'} 
-                    for i, word in enumerate(expected_text.split())
-                ]
-            },
-            'note': 'This is a portfolio demonstration. Production version would use OpenAI Whisper API.'
-        }
+        data = serializer.validated_data
+        path, digest = store_audio(data['audio_file'])
+        attempt = submit_attempt(request.user, data['quiz'], path, data['expected_text'], digest)
+        return attempt_accepted(attempt)
+
+class SpeechUploadCreateView(APIView):
+    """Start a resumable upload; the recording is then sent with PATCH in chunks"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = SpeechUploadCreateSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        check_pending_limit(request.user)
+        data = serializer.validated_data
+        upload = create_upload(request.user, data['quiz'], data['expected_text'], data['total_size'],
+                               data['filename'], data['sha256'])
+        response = Response(dict(SpeechUploadSerializer(upload).data, chunk_size=settings.SPEECH_UPLOAD_CHUNK_MAX),
+                            status=status.HTTP_201_CREATED)
+        response['Location'] = f'/api/v1/speech/uploads/{upload.id}/'
+        return response
+
+class SpeechUploadDetailView(APIView):
+    """
+    GET reports the stored offset to resume from. PATCH appends the raw
+    request body at the Upload-Offset header, optionally verified against
+    Upload-Checksum (hex SHA-256 of the chunk). DELETE abandons the upload.
+    The body is never parsed by DRF, only streamed to the chunk store.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get_upload(self, request, pk):
+        return get_object_or_404(SpeechUpload, pk=pk, user=request.user)
+    
+    def get(self, request, pk):
+        response = Response(SpeechUploadSerializer(self.get_upload(request, pk)).data)
+        response['Cache-Control'] = 'no-store'
+        return response
+    
+    def patch(self, request, pk):
+        upload = self.get_upload(request, pk)
+        if upload.status != 'uploading':
+            return Response({'detail': f'Upload is {upload.status}'}, status=status.HTTP_409_CONFLICT)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': 'Upload-Offset and Content-Length headers are required'})
+        if offset != upload.offset:
+            return offset_response({'detail': 'Offset does not match the stored offset'}, upload.offset,
+                                   status.HTTP_409_CONFLICT)
+        if not 0 < length <= settings.SPEECH_UPLOAD_CHUNK_MAX or offset + length > upload.total_size:
+            raise ValidationError({'detail': 'Chunk is empty, too large, or runs past total_size'})
+        checksum = request.headers.get('Upload-Checksum')
         
-        return Response(mock_response, status=status.HTTP_200_OK)
\ No newline at end of file
+        try:
+            new_offset = append_chunk(upload, offset, request.stream, length,
+                                      checksum.lower() if checksum else None)
+        except UploadBusy:
+            return offset_response({'detail': 'Another chunk is being written'}, upload.offset,
+                                   status.HTTP_409_CONFLICT)
+        except OffsetConflict:
+            upload.refresh_from_db(fields=['offset'])
+            return offset_response({'detail': 'Offset does not match the stored offset'}, upload.offset,
+                                   status.HTTP_409_CONFLICT)
+        except ChecksumMismatch:
+            return offset_response({'detail': 'Chunk checksum does not match'}, upload.offset,
+                                   status.HTTP_400_BAD_REQUEST)
+        return offset_response(SpeechUploadSerializer(upload).data, new_offset, status.HTTP_200_OK)
+    
+    def delete(self, request, pk):
+        upload = self.get_upload(request, pk)
+        if upload.status == 'completed':
+            return Response({'detail': 'Upload is completed'}, status=status.HTTP_409_CONFLICT)
+        abort_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class SpeechUploadCompleteView(APIView):
+    """Verify a fully received upload and queue it for analysis like POST /speech/analyze/"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, pk):
+        with transaction.atomic():
+            upload = get_object_or_404(SpeechUpload.objects.select_for_update(), pk=pk, user=request.user)
+            if upload.status == 'completed':
+                # A retried completion after a lost response
+                return attempt_accepted(upload.attempt)
+            if upload.status != 'uploading' or upload.offset != upload.total_size:
+                return offset_response({'detail': 'Upload is not complete'}, upload.offset,
+                                       status.HTTP_409_CONFLICT)
+            check_pending_limit(request.user)
+            try:
+                attempt = complete_upload(upload)
+            except ChecksumMismatch:
+                return Response({'detail': 'File checksum does not match; start a new upload'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return attempt_accepted(attempt)
+
+class SpeechAttemptDetailView(generics.GenericAPIView):
+    """
+    One of the user's attempts with its analysis status. Answers at once; while
+    the analysis is pending, Retry-After tells the client when to poll again,
+    so no request thread is held waiting on a worker.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = SpeechAttemptSerializer
+    
+    def get_queryset(self):
+        return SpeechAttempt.objects.filter(user=self.request.user).select_related('job')
+    
+    def get(self, request, pk):
+        attempt = get_object_or_404(self.get_queryset(), pk=pk)
+        data = self.get_serializer(attempt).data
+        response = Response(data)
+        if data['status'] in PENDING_STATUSES:
+            response['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response
+
+class SpeechQueueStatsView(generics.GenericAPIView):
+    """Queue depth and analysis latency, for staff"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(queue_stats())
+
+class SpeechAttemptExportView(StreamingExportView):
+    """Every stored speech attempt as CSV or NDJSON, for staff reporting"""
+    filterset_class = SpeechExportFilter
+    columns = SPEECH_EXPORT_COLUMNS
+    export_name = 'speech-attempts'
+    
+    def get_queryset(self):
+        return export_queryset()
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Process pool that drains the speech job queue
+Analysis is CPU and I/O heavy, so it runs in separate worker processes
+rather than in request threads, one per available core unless configured.
+Each process micro-batches: it claims up to SPEECH_WORKER_BATCH_SIZE jobs,
+and while the batch is short keeps claiming for up to
+SPEECH_BATCH_MAX_WAIT_MS, so jobs arriving close together reach the
+recognizer and the scorer as one call. The parent process restarts crashed
+workers and periodically requeues jobs abandoned by a dead worker.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from django.conf import settings
+from django.db import close_old_connections, connections
+from .jobs import claim_jobs, process_jobs, requeue_stale
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0
+SUPERVISE_INTERVAL = 5.0
+SIGNAL_CHECK_INTERVAL = 0.2
+COLLECT_INTERVAL = 0.01
+
+def worker_name(index):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+def available_cores():
+    # Honours CPU affinity (taskset, container cpusets) where the platform reports it
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def collect_batch(worker, max_items, max_wait):
+    """
+    Claim up to max_items jobs; once the first is claimed, keep claiming
+    until the batch is full or max_wait seconds have passed
+    """
+    jobs = claim_jobs(worker, max_items)
+    if not jobs:
+        return jobs
+    deadline = time.monotonic() + max_wait
+    while len(jobs) < max_items:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(COLLECT_INTERVAL, remaining))
+        jobs += claim_jobs(worker, max_items - len(jobs))
+    return jobs
+
+def drain(worker='inline', limit=None, batch_size=None):
+    """Process available jobs in this process until the queue is empty; returns jobs processed"""
+    batch_size = batch_size or settings.SPEECH_WORKER_BATCH_SIZE
+    processed = 0
+    while limit is None or processed < limit:
+        jobs = claim_jobs(worker, batch_size if limit is None else min(batch_size, limit - processed))
+        if not jobs:
+            break
+        process_jobs(jobs)
+        processed += len(jobs)
+    return processed
+
+def work(index, stop, poll_interval, max_wait):
+    # The parent handles shutdown and sets stop, so a running job can finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    name = worker_name(index)
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            jobs = collect_batch(name, settings.SPEECH_WORKER_BATCH_SIZE, max_wait)
+            if jobs:
+                process_jobs(jobs)
+            else:
+                stop.wait(poll_interval)
+        except Exception:
+            logger.exception('Speech worker %s failed', name)
+            stop.wait(poll_interval)
+    connections.close_all()
+
+class WorkerPool:
+    def __init__(self, concurrency=None, poll_interval=POLL_INTERVAL, max_wait=None):
+        self.concurrency = concurrency or settings.SPEECH_WORKER_CONCURRENCY or available_cores()
+        self.poll_interval = poll_interval
+        self.max_wait = settings.SPEECH_BATCH_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        self.context = multiprocessing.get_context('fork')
+        self.stop = self.context.Event()
+        self.stopping = False
+        self.processes = {}
+    
+    def spawn(self, index):
+        # Children must not share the parent's database connection
+        connections.close_all()
+        process = self.context.Process(target=work, args=(index, self.stop, self.poll_interval, self.max_wait), daemon=True)
+        process.start()
+        self.processes[index] = process
+    
+    def shutdown(self, *args):
+        # Setting the multiprocessing Event from a signal handler can deadlock
+        self.stopping = True
+    
+    def supervise(self):
+        for index, process in list(self.processes.items()):
+            if not process.is_alive():
+                logger.warning('Speech worker %s exited with %s; restarting', index, process.exitcode)
+                self.spawn(index)
+        requeue_stale()
+        connections.close_all()
+    
+    def run(self):
+        signal.signal(signal.SIGTERM, self.shutdown)
+        signal.signal(signal.SIGINT, self.shutdown)
+        for index in range(self.concurrency):
+            self.spawn(index)
+        next_check = 0
+        while not self.stopping:
+            if time.monotonic() >= next_check:
+                self.supervise()
+                next_check = time.monotonic() + SUPERVISE_INTERVAL
+            time.sleep(SIGNAL_CHECK_INTERVAL)
+        self.stop.set()
+        for process in self.processes.values():
+            process.join(settings.SPEECH_JOB_TIMEOUT)
\ No newline at end of file
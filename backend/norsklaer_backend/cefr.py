@@ -0,0 +1,31 @@
+"""
+CEFR level ordering shared by users, lessons and progress
+Levels are stored alongside an integer rank so gating is a single
+indexed range predicate instead of a list of level strings
+"""
+from django.db.models import Q
+
+CEFR_ORDER = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+CEFR_RANKS = {level: rank for rank, level in enumerate(CEFR_ORDER, start=1)}
+
+def cefr_rank(level):
+    return CEFR_RANKS[level]
+
+def available_to(user, prefix=''):
+    """Lessons at the user's current level and below"""
+    return Q(**{f'{prefix}cefr_rank__lte': user.cefr_rank})
+
+def is_available_to(user, level):
+    return cefr_rank(level) <= user.cefr_rank
+
+def sync_cefr_rank(instance, level_field, update_fields):
+    """Keep instance.cefr_rank in step with its level; returns update_fields to save"""
+    instance.cefr_rank = cefr_rank(getattr(instance, level_field))
+    if update_fields is not None and level_field in update_fields:
+        update_fields = set(update_fields) | {'cefr_rank'}
+    return update_fields
+
+def backfill_cefr_ranks(model, level_field, using='default'):
+    """Fix rows whose rank is out of step, e.g. rows written before the column existed"""
+    for level, rank in CEFR_RANKS.items():
+        model.objects.using(using).filter(**{level_field: level}).exclude(cefr_rank=rank).update(cefr_rank=rank)
\ No newline at end of file
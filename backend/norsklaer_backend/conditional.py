@@ -0,0 +1,51 @@
+"""
+Conditional GET support for read-heavy API views
+Validators are built from version data (max updated_at, cache version tokens)
+so a matching If-None-Match is answered before any serializer runs
+"""
+import hashlib
+import math
+import time
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+class ConditionalGetMixin:
+    """
+    Adds strong ETag and Last-Modified headers to a DRF GET view
+    Subclasses implement get_validators() returning (etag_parts, last_modified)
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    @staticmethod
+    def last_modified_seconds(last_modified):
+        """
+        Whole seconds for Last-Modified, rounded up so a sub-second change is
+        never dated before itself. While that second is still running another
+        change could share it, so no Last-Modified is sent and only the ETag
+        validates the response.
+        """
+        if not last_modified:
+            return None
+        seconds = math.ceil(last_modified.timestamp())
+        return seconds if seconds <= time.time() else None
+
+    def get(self, request, *args, **kwargs):
+        etag_parts, last_modified = self.get_validators(request, *args, **kwargs)
+        etag = quote_etag(hashlib.sha1(
+            ':'.join(str(part) for part in etag_parts).encode()
+        ).hexdigest())
+        last_modified = self.last_modified_seconds(last_modified)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Responses are per user, so shared caches must not reuse them across tokens
+        patch_vary_headers(response, ['Authorization'])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
\ No newline at end of file
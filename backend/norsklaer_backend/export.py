@@ -0,0 +1,164 @@
+"""
+Streaming CSV/NDJSON exports for staff
+Rows are read with values_list(...).iterator(chunk_size=...), which uses a
+server-side cursor on PostgreSQL, then encoded (and optionally gzipped) into
+fixed-size chunks as the client reads them, so memory stays constant
+whatever the row count. Shared by the export endpoints and commands.
+"""
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+
+FETCH_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+FILTER_OPTIONS = ['level', 'cohort', 'since', 'until', 'user']
+# Spreadsheets run cells starting with these as formulas; user text (usernames,
+# transcripts) is quoted so opening an export cannot execute it
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def csv_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+def csv_lines(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow([csv_value(value) for value in row])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def ndjson_lines(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+def encoded_chunks(lines):
+    """Group text into roughly FLUSH_BYTES pieces of UTF-8"""
+    pending = []
+    size = 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(pending).encode()
+            pending = []
+            size = 0
+    if pending:
+        yield ''.join(pending).encode()
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(queryset, columns, file_format, compress=False, fetch_size=FETCH_SIZE):
+    """
+    Bytes of queryset exported as columns [(header, field lookup)], produced
+    lazily; nothing is read from the database until the first chunk is asked for
+    """
+    headers = [header for header, _ in columns]
+    rows = queryset.values_list(*[field for _, field in columns]).iterator(chunk_size=fetch_size)
+    lines = csv_lines(headers, rows) if file_format == 'csv' else ndjson_lines(headers, rows)
+    chunks = encoded_chunks(lines)
+    return gzip_chunks(chunks) if compress else chunks
+
+def export_filename(name, file_format, compress):
+    return f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{file_format}{'.gz' if compress else ''}"
+
+class StreamingExportView(generics.GenericAPIView):
+    """
+    Staff-only streamed download of get_queryset() filtered by filterset_class
+    Query parameters: output=csv|ndjson, gzip=1, plus the filterset's filters
+    """
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    columns = None
+    export_name = None
+    
+    def get(self, request):
+        # Not ?format=, which DRF reserves for picking a renderer
+        file_format = request.query_params.get('output', 'csv')
+        if file_format not in FORMATS:
+            raise ValidationError({'output': [f"Must be one of: {', '.join(FORMATS)}"]})
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        response = StreamingHttpResponse(
+            export_stream(queryset, self.columns, file_format, compress),
+            content_type='application/gzip' if compress else FORMATS[file_format],
+        )
+        filename = export_filename(self.export_name, file_format, compress)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class ExportCommand(BaseCommand):
+    """Writes the same stream as a StreamingExportView to a file or stdout"""
+    columns = None
+    export_name = None
+    filterset_class = None
+    
+    def get_queryset(self):
+        raise NotImplementedError
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help="File to write, or '-' for stdout")
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output')
+        parser.add_argument('--fetch-size', type=int, default=FETCH_SIZE,
+                            help='Rows fetched from the database cursor at a time')
+        parser.add_argument('--level', help="Lesson CEFR level")
+        parser.add_argument('--cohort', help="Learner's current CEFR level")
+        parser.add_argument('--since', help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--user', type=int, help='Only this user id')
+    
+    def handle(self, *args, **options):
+        filters = {name: options[name] for name in FILTER_OPTIONS if options[name] is not None}
+        filterset = self.filterset_class(data=filters, queryset=self.get_queryset())
+        if not filterset.is_valid():
+            raise CommandError(f'Invalid filters: {dict(filterset.errors)}')
+        
+        chunks = export_stream(filterset.qs, self.columns, options['format'], options['gzip'],
+                               options['fetch_size'])
+        written = 0
+        if options['output'] == '-':
+            stream = sys.stdout.buffer
+            for chunk in chunks:
+                stream.write(chunk)
+                written += len(chunk)
+            stream.flush()
+        else:
+            with open(options['output'], 'wb') as stream:
+                for chunk in chunks:
+                    stream.write(chunk)
+                    written += len(chunk)
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written} bytes of {self.export_name} to {options['output']}"
+            ))
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Keyset (cursor) pagination
+Pages are selected by comparing the ordering columns with the last row seen
+instead of OFFSET, and no COUNT(*) is issued. Since columns may sort in
+different directions, the comparison is expanded into OR terms; a redundant
+bound on the leading column lets the planner start an index range scan at
+the cursor, so a deep page costs about the same as the first.
+"""
+import base64
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates on the queryset's ordering plus a primary key tiebreaker
+    Ordering fields must be non-null and backed by a matching composite index
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = [self.flip(field) for field in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        # One extra row tells us whether another page exists without a COUNT
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_ordering(self, queryset):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        if not ordering:
+            ordering = ['pk']
+        if ordering[-1].lstrip('-') not in ('pk', 'id'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, obj, reverse):
+        position = [self.field_value(obj, field) for field in self.ordering]
+        cursor = json.dumps({'p': position, 'r': reverse}, default=str, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            raw_position = cursor['p']
+            if len(raw_position) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.model_field(model, field).to_python(value)
+                for field, value in zip(self.ordering, raw_position)
+            ]
+            return position, bool(cursor.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def after(self, ordering, position):
+        """
+        Rows after position in ordering, honouring each field's direction:
+        a >= x AND ((a > x) OR (a = x AND b > y) OR (a = x AND b = y AND id > z))
+        The OR expansion alone is not an index bound; the leading a >= x is
+        """
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {ordering[j].lstrip('-'): position[j] for j in range(i)}
+            condition |= Q(**equal, **{f'{name}__{lookup}': position[i]})
+        leading = ordering[0]
+        bound = 'lte' if leading.startswith('-') else 'gte'
+        return Q(**{f'{leading.lstrip("-")}__{bound}': position[0]}) & condition
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def field_value(obj, field):
+        name = field.lstrip('-')
+        value = obj.pk if name == 'pk' else getattr(obj, name)
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    @staticmethod
+    def model_field(model, field):
+        name = field.lstrip('-')
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
\ No newline at end of file
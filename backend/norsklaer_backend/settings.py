@@ -79,6 +79,69 @@ DATABASES = {
     }
 }
 
+# Cache Configuration
+# LocMemCache is per-process; point CACHE_BACKEND at a shared cache in production
+# so lesson content invalidation reaches every worker and management command
+# (docker-compose.prod.yml uses Redis, sized by its maxmemory setting)
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='norsklaer'),
+    }
+}
+
+# RedisCache hands OPTIONS to its connection pool, which rejects MAX_ENTRIES
+if not CACHE_BACKEND.endswith('RedisCache'):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)}
+
+LESSON_CONTENT_CACHE_TIMEOUT = config('LESSON_CONTENT_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Upper bound on updates accepted by one POST /progress/update/batch/
+PROGRESS_BATCH_MAX_SIZE = config('PROGRESS_BATCH_MAX_SIZE', default=100, cast=int)
+
+# Time-on-lesson heartbeats are buffered per worker and written in batches
+PROGRESS_HEARTBEAT_FLUSH_INTERVAL = config('PROGRESS_HEARTBEAT_FLUSH_INTERVAL', default=10.0, cast=float)
+PROGRESS_HEARTBEAT_FLUSH_SIZE = config('PROGRESS_HEARTBEAT_FLUSH_SIZE', default=500, cast=int)
+PROGRESS_HEARTBEAT_MAX_SECONDS = config('PROGRESS_HEARTBEAT_MAX_SECONDS', default=60, cast=int)
+
+# Scales every spaced-repetition interval; run reschedule_reviews after changing it
+REVIEW_INTERVAL_MODIFIER = config('REVIEW_INTERVAL_MODIFIER', default=1.0, cast=float)
+
+# Speech analysis runs in run_speech_worker processes fed from an in-database queue;
+# concurrency 0 starts one process per available core
+SPEECH_WORKER_CONCURRENCY = config('SPEECH_WORKER_CONCURRENCY', default=0, cast=int)
+SPEECH_WORKER_BATCH_SIZE = config('SPEECH_WORKER_BATCH_SIZE', default=32, cast=int)
+# A worker holding a partial batch keeps collecting jobs this long before running it
+SPEECH_BATCH_MAX_WAIT_MS = config('SPEECH_BATCH_MAX_WAIT_MS', default=50, cast=int)
+SPEECH_JOB_MAX_TRIES = config('SPEECH_JOB_MAX_TRIES', default=3, cast=int)
+SPEECH_JOB_RETRY_DELAY = config('SPEECH_JOB_RETRY_DELAY', default=5.0, cast=float)
+SPEECH_JOB_TIMEOUT = config('SPEECH_JOB_TIMEOUT', default=120, cast=int)
+SPEECH_MAX_PENDING_PER_USER = config('SPEECH_MAX_PENDING_PER_USER', default=5, cast=int)
+SPEECH_MAX_AUDIO_BYTES = config('SPEECH_MAX_AUDIO_BYTES', default=10 * 1024 * 1024, cast=int)
+SPEECH_RESULT_CACHE_MAX_ENTRIES = config('SPEECH_RESULT_CACHE_MAX_ENTRIES', default=100000, cast=int)
+SPEECH_RESULT_CACHE_EVICT_EVERY = config('SPEECH_RESULT_CACHE_EVICT_EVERY', default=1000, cast=int)
+
+# Speech recognizer, see apps/speech/backends.py; CPUModelBackend needs faster-whisper installed.
+# One CPU thread per model suits a pool with one worker process per core.
+SPEECH_ASR_BACKEND = config('SPEECH_ASR_BACKEND', default='norsklaer_backend.apps.speech.backends.FakeBackend')
+SPEECH_ASR_MODEL = config('SPEECH_ASR_MODEL', default='small')
+SPEECH_ASR_LANGUAGE = config('SPEECH_ASR_LANGUAGE', default='no')
+SPEECH_ASR_COMPUTE_TYPE = config('SPEECH_ASR_COMPUTE_TYPE', default='int8')
+SPEECH_ASR_CPU_THREADS = config('SPEECH_ASR_CPU_THREADS', default=1, cast=int)
+SPEECH_ASR_URL = config('SPEECH_ASR_URL', default='')
+SPEECH_ASR_TOKEN = config('SPEECH_ASR_TOKEN', default='')
+SPEECH_ASR_TIMEOUT = config('SPEECH_ASR_TIMEOUT', default=60.0, cast=float)
+# RemoteBackend splits a batch so no request body (base64 audio) is larger than this
+SPEECH_ASR_MAX_REQUEST_BYTES = config('SPEECH_ASR_MAX_REQUEST_BYTES', default=16 * 1024 * 1024, cast=int)
+
+# Resumable chunked uploads; partial files live in SPEECH_UPLOAD_DIR (default MEDIA_ROOT/partial-uploads)
+SPEECH_UPLOAD_STORE = config('SPEECH_UPLOAD_STORE', default='norsklaer_backend.apps.speech.uploads.LocalChunkStore')
+SPEECH_UPLOAD_DIR = config('SPEECH_UPLOAD_DIR', default='')
+SPEECH_UPLOAD_CHUNK_MAX = config('SPEECH_UPLOAD_CHUNK_MAX', default=4 * 1024 * 1024, cast=int)
+SPEECH_UPLOAD_TTL_HOURS = config('SPEECH_UPLOAD_TTL_HOURS', default=24, cast=int)
+
 # Password Validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -97,6 +160,10 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Uploaded Files
+MEDIA_URL = '/media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
 # Default Primary Key Field Type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
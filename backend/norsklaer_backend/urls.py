@@ -6,5 +6,8 @@ urlpatterns = [
     path('api/v1/auth/', include('norsklaer_backend.apps.authentication.urls')),
     path('api/v1/lessons/', include('norsklaer_backend.apps.lessons.urls')),
     path('api/v1/progress/', include('norsklaer_backend.apps.progress.urls')),
+    path('api/v1/analytics/', include('norsklaer_backend.apps.progress.analytics_urls')),
+    path('api/v1/leaderboards/', include('norsklaer_backend.apps.progress.leaderboard_urls')),
+    path('api/v1/recommendations/', include('norsklaer_backend.apps.progress.recommendation_urls')),
     path('api/v1/speech/', include('norsklaer_backend.apps.speech.urls')),
 ]
\ No newline at end of file
@@ -10,6 +10,7 @@ CREATE TABLE users (
     last_name VARCHAR(100) NOT NULL,
     current_cefr_level VARCHAR(2) CHECK (current_cefr_level IN ('A1', 'A2', 'B1', 'B2', 'C1', 'C2')),
     target_cefr_level VARCHAR(2) CHECK (target_cefr_level IN ('A1', 'A2', 'B1', 'B2', 'C1', 'C2')),
+    cefr_rank SMALLINT NOT NULL DEFAULT 1, -- ordinal of current_cefr_level (A1=1 .. C2=6)
     is_active BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -20,15 +21,43 @@ CREATE TABLE lessons (
     id SERIAL PRIMARY KEY,
     title VARCHAR(255) NOT NULL,
     cefr_level VARCHAR(2) NOT NULL CHECK (cefr_level IN ('A1', 'A2', 'B1', 'B2', 'C1', 'C2')),
+    cefr_rank SMALLINT NOT NULL DEFAULT 1, -- ordinal of cefr_level (A1=1 .. C2=6)
     lesson_type VARCHAR(50) NOT NULL CHECK (lesson_type IN ('vocabulary', 'grammar', 'listening', 'speaking')),
     content_json JSONB NOT NULL,
     difficulty_score INTEGER CHECK (difficulty_score BETWEEN 1 AND 10),
     estimated_duration INTEGER NOT NULL, -- minutes
     prerequisites JSONB DEFAULT '[]', -- array of lesson IDs
+    search_document TEXT NOT NULL DEFAULT '', -- all strings from content_json
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('norwegian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('norwegian', coalesce(search_document, '')), 'B')
+    ) STORED,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Transitive closure of lessons.prerequisites (maintained by the application)
+CREATE TABLE lesson_prerequisite_closure (
+    id SERIAL PRIMARY KEY,
+    ancestor_id INTEGER REFERENCES lessons(id) ON DELETE CASCADE,
+    descendant_id INTEGER REFERENCES lessons(id) ON DELETE CASCADE,
+    depth SMALLINT NOT NULL, -- shortest prerequisite path length
+    UNIQUE(descendant_id, ancestor_id)
+);
+
+-- Vocabulary materialized from lessons.content_json->'vocabulary'
+CREATE TABLE vocabulary_items (
+    id SERIAL PRIMARY KEY,
+    lesson_id INTEGER REFERENCES lessons(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    norwegian VARCHAR(255) NOT NULL,
+    english VARCHAR(255) NOT NULL DEFAULT '',
+    pronunciation VARCHAR(255) NOT NULL DEFAULT '',
+    norwegian_normalized VARCHAR(255) NOT NULL,
+    english_normalized VARCHAR(255) NOT NULL DEFAULT '',
+    UNIQUE(lesson_id, position)
+);
+
 -- User progress tracking
 CREATE TABLE user_progress (
     id SERIAL PRIMARY KEY,
@@ -44,17 +73,108 @@ CREATE TABLE user_progress (
     UNIQUE(user_id, lesson_id)
 );
 
+-- Per-user progress totals maintained on every progress write
+CREATE TABLE user_progress_summaries (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    not_started_count INTEGER DEFAULT 0,
+    in_progress_count INTEGER DEFAULT 0,
+    completed_count INTEGER DEFAULT 0,
+    mastered_count INTEGER DEFAULT 0,
+    total_time_spent BIGINT DEFAULT 0, -- seconds
+    score_total BIGINT DEFAULT 0,
+    scored_lessons INTEGER DEFAULT 0,
+    finished_by_level JSONB DEFAULT '{}', -- completed or mastered lessons per CEFR level
+    last_active_day DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Spaced-repetition state per finished lesson
+CREATE TABLE review_schedules (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    lesson_id INTEGER REFERENCES lessons(id) ON DELETE CASCADE,
+    ease_factor DOUBLE PRECISION DEFAULT 2.5,
+    interval_days DOUBLE PRECISION DEFAULT 0,
+    repetitions INTEGER DEFAULT 0,
+    lapses INTEGER DEFAULT 0,
+    last_reviewed_at TIMESTAMP NOT NULL,
+    due_at TIMESTAMP NOT NULL,
+    UNIQUE(user_id, lesson_id)
+);
+
+-- Leaderboard points per user and window (current week from Monday, or all time)
+CREATE TABLE leaderboard_entries (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    period VARCHAR(4) NOT NULL CHECK (period IN ('week', 'all')),
+    window_start DATE NOT NULL,
+    cefr_level VARCHAR(2) NOT NULL,
+    points BIGINT DEFAULT 0,
+    reached_at TIMESTAMP NOT NULL,
+    UNIQUE(user_id, period, window_start)
+);
+
+-- Learners per leaderboard cohort and window, maintained with leaderboard_entries
+CREATE TABLE leaderboard_cohorts (
+    id SERIAL PRIMARY KEY,
+    period VARCHAR(4) NOT NULL CHECK (period IN ('week', 'all')),
+    window_start DATE NOT NULL,
+    cefr_level VARCHAR(2) NOT NULL,
+    learners INTEGER DEFAULT 0,
+    UNIQUE(period, window_start, cefr_level)
+);
+
+-- Daily activity rollups; every metric column is additive
+CREATE TABLE progress_daily_users (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    time_spent BIGINT DEFAULT 0,
+    attempts INTEGER DEFAULT 0,
+    completions INTEGER DEFAULT 0,
+    scored_attempts INTEGER DEFAULT 0,
+    score_total BIGINT DEFAULT 0,
+    scores_0_19 INTEGER DEFAULT 0,
+    scores_20_39 INTEGER DEFAULT 0,
+    scores_40_59 INTEGER DEFAULT 0,
+    scores_60_79 INTEGER DEFAULT 0,
+    scores_80_100 INTEGER DEFAULT 0,
+    UNIQUE(user_id, day)
+);
+
+-- progress_daily_lessons (lesson_id) and progress_daily_cohorts (cefr_level,
+-- plus a learners count) have the same metric columns, unique per key and day
+
+-- Append-only log of progress changes, one partition per month
+-- (progress_events_YYYY_MM, created ahead by maintain_progress_events)
+CREATE TABLE progress_events (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    user_id BIGINT NOT NULL,
+    lesson_id BIGINT NOT NULL,
+    kind VARCHAR(10) NOT NULL CHECK (kind IN ('update', 'time', 'set', 'delete', 'snapshot')),
+    occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    status VARCHAR(20),
+    score INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    time_spent INTEGER NOT NULL DEFAULT 0,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
+CREATE TABLE progress_events_default PARTITION OF progress_events DEFAULT;
+
 -- Quiz questions for assessments
 CREATE TABLE quizzes (
     id SERIAL PRIMARY KEY,
     lesson_id INTEGER REFERENCES lessons(id) ON DELETE CASCADE,
+    external_key VARCHAR(120), -- catalog import key, unique within the lesson
     question_text TEXT NOT NULL,
     question_type VARCHAR(20) NOT NULL CHECK (question_type IN ('multiple_choice', 'fill_blank', 'speaking', 'listening')),
     correct_answer TEXT NOT NULL,
     options_json JSONB, -- for multiple choice options
     audio_file_url VARCHAR(500), -- for listening exercises
     difficulty_weight DECIMAL(3,2) DEFAULT 1.0,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(lesson_id, external_key)
 );
 
 -- Speech recognition attempts
@@ -62,7 +182,8 @@ CREATE TABLE speech_attempts (
     id SERIAL PRIMARY KEY,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
     quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
-    audio_file_path VARCHAR(500) NOT NULL,
+    audio_file_path VARCHAR(500) NOT NULL, -- content-addressed, shared by identical recordings
+    audio_sha256 VARCHAR(64) DEFAULT '',
     transcribed_text TEXT,
     expected_text TEXT NOT NULL,
     accuracy_score INTEGER CHECK (accuracy_score BETWEEN 0 AND 100),
@@ -70,13 +191,76 @@ CREATE TABLE speech_attempts (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Analysis queue, one job per speech attempt (claimed by run_speech_worker)
+CREATE TABLE speech_jobs (
+    id SERIAL PRIMARY KEY,
+    attempt_id INTEGER UNIQUE REFERENCES speech_attempts(id) ON DELETE CASCADE,
+    status VARCHAR(20) DEFAULT 'queued' CHECK (status IN ('queued', 'processing', 'completed', 'failed')),
+    tries INTEGER DEFAULT 0,
+    available_at TIMESTAMP NOT NULL,
+    worker VARCHAR(100) DEFAULT '',
+    last_error TEXT DEFAULT '',
+    cache_hit BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Analysis results cached by model version, audio digest and expected text (LRU-bounded)
+CREATE TABLE speech_results (
+    key VARCHAR(64) PRIMARY KEY,
+    audio_sha256 VARCHAR(64) NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    transcribed_text TEXT NOT NULL,
+    accuracy_score INTEGER NOT NULL,
+    feedback_json JSONB NOT NULL,
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP NOT NULL
+);
+
+-- Resumable chunked uploads; a completed upload points at its attempt
+CREATE TABLE speech_uploads (
+    id UUID PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
+    expected_text TEXT NOT NULL,
+    filename VARCHAR(255) DEFAULT '',
+    total_size BIGINT NOT NULL,
+    "offset" BIGINT DEFAULT 0,
+    sha256 VARCHAR(64) DEFAULT '',
+    status VARCHAR(20) DEFAULT 'uploading' CHECK (status IN ('uploading', 'completed', 'failed')),
+    attempt_id INTEGER UNIQUE REFERENCES speech_attempts(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
 -- Indexes for performance optimization
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_lessons_cefr_level ON lessons(cefr_level);
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX lessons_search_vector_gin ON lessons USING gin (search_vector);
+CREATE INDEX lessons_search_trgm_gin ON lessons USING gin ((title || ' ' || search_document) gin_trgm_ops);
+CREATE INDEX idx_closure_ancestor ON lesson_prerequisite_closure(ancestor_id, descendant_id);
+CREATE INDEX idx_vocabulary_norwegian ON vocabulary_items(norwegian_normalized);
+CREATE INDEX idx_vocabulary_english ON vocabulary_items(english_normalized);
+CREATE INDEX vocabulary_norwegian_prefix ON vocabulary_items(norwegian_normalized varchar_pattern_ops);
+CREATE INDEX vocabulary_english_prefix ON vocabulary_items(english_normalized varchar_pattern_ops);
+CREATE INDEX idx_users_cefr_rank ON users(cefr_rank);
+CREATE INDEX idx_lessons_cefr_rank_difficulty ON lessons(cefr_rank, difficulty_score, id);
 CREATE INDEX idx_user_progress_user_id ON user_progress(user_id);
 CREATE INDEX idx_user_progress_lesson_id ON user_progress(lesson_id);
+CREATE INDEX idx_review_schedules_user_due ON review_schedules(user_id, due_at);
+CREATE INDEX idx_user_progress_user_updated ON user_progress(user_id, updated_at, id);
+CREATE INDEX leaderboard_rank ON leaderboard_entries(period, window_start, cefr_level, points DESC, reached_at, user_id);
+CREATE INDEX progress_events_user_lesson ON progress_events(user_id, lesson_id, occurred_at);
 CREATE INDEX idx_quizzes_lesson_id ON quizzes(lesson_id);
 CREATE INDEX idx_speech_attempts_user_id ON speech_attempts(user_id);
+CREATE INDEX idx_speech_jobs_status_available ON speech_jobs(status, available_at);
+CREATE INDEX idx_speech_jobs_status_finished ON speech_jobs(status, finished_at);
+CREATE INDEX idx_speech_results_last_used ON speech_results(last_used_at);
+CREATE INDEX idx_speech_uploads_status_expires ON speech_uploads(status, expires_at);
 
 -- Triggers for updated_at timestamps
 CREATE OR REPLACE FUNCTION update_updated_at_column()